@@ -0,0 +1,122 @@
+# Admission control for serving the agent over HTTP: bounded queue, concurrency limit, deadlines
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+
+class Overloaded(Exception):
+    """Queue is full; the request was shed without being queued"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Service overloaded, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed while it was queued or running"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded while {stage}")
+        self.stage = stage
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 4)
+
+
+class AdmissionController:
+    """Runs at most max_concurrency requests at once with at most max_queue waiting.
+
+    A request arriving to a full queue is rejected immediately (Overloaded) so
+    the service sheds load instead of building an unbounded backlog. Every
+    admitted request carries a deadline covering both queue wait and work.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, max_queue: Optional[int] = None,
+                 default_timeout: Optional[float] = None, window: int = 1000):
+        self.max_concurrency = max_concurrency or int(os.getenv("AGENT_MAX_CONCURRENCY", "8"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("AGENT_MAX_QUEUE", "32"))
+        self.default_timeout = default_timeout or float(os.getenv("AGENT_REQUEST_TIMEOUT", "60"))
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.queued = 0
+        self.in_flight = 0
+        self.counts = {"accepted": 0, "completed": 0, "failed": 0, "shed": 0, "timed_out": 0}
+        self._latencies = deque(maxlen=window)
+        self._queue_waits = deque(maxlen=window)
+
+    @asynccontextmanager
+    async def admit(self, timeout: Optional[float] = None):
+        """Wait for a slot within the deadline; yields the seconds left for the work itself"""
+        if not self.has_capacity():
+            self.counts["shed"] += 1
+            raise Overloaded(self.retry_after())
+        deadline = time.monotonic() + min(timeout or self.default_timeout, self.default_timeout)
+        arrived = time.monotonic()
+        self.counts["accepted"] += 1
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.counts["timed_out"] += 1
+            raise DeadlineExceeded("queued")
+        finally:
+            self.queued -= 1
+        self._queue_waits.append(time.monotonic() - arrived)
+        self.in_flight += 1
+        try:
+            yield max(0.0, deadline - time.monotonic())
+            self.counts["completed"] += 1
+        except DeadlineExceeded:
+            self.counts["timed_out"] += 1
+            raise
+        except Exception:
+            self.counts["failed"] += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            self._latencies.append(time.monotonic() - arrived)
+
+    async def run(self, coroutine_factory, timeout: Optional[float] = None):
+        """Admit, then await coroutine_factory() under the remaining deadline (cancelled when it passes)"""
+        async with self.admit(timeout) as remaining:
+            try:
+                return await asyncio.wait_for(coroutine_factory(), timeout=remaining)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded("running")
+
+    def has_capacity(self) -> bool:
+        """Whether a new request would be admitted (a free slot or room in the queue)"""
+        return self.queued + self.in_flight < self.max_concurrency + self.max_queue
+
+    def retry_after(self) -> int:
+        """Seconds until the backlog should have drained at the recent median latency"""
+        median = percentile(self._latencies, 0.5) or 1.0
+        return max(1, math.ceil(median * (self.queued + self.in_flight) / self.max_concurrency))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "max_queue": self.max_queue,
+            "max_concurrency": self.max_concurrency,
+            "default_timeout": self.default_timeout,
+            **self.counts,
+            "latency": {
+                "p50": percentile(self._latencies, 0.5),
+                "p95": percentile(self._latencies, 0.95),
+                "p99": percentile(self._latencies, 0.99),
+            },
+            "queue_wait": {
+                "p50": percentile(self._queue_waits, 0.5),
+                "p95": percentile(self._queue_waits, 0.95),
+            },
+        }
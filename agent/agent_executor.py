@@ -1,11 +1,16 @@
 # Fixed agent_executor.py with simplified MCP integration and flexible API support
 
+import asyncio
 import os
+import re
 import sys
+import time
+import threading
+import httpx
 import requests
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
-from langchain.agents import initialize_agent, AgentType
+from langchain.agents import AgentType, ZeroShotAgent
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.tools import Tool
 
@@ -15,204 +20,428 @@ sys.path.insert(0, PROJECT_ROOT)
 
 load_dotenv()
 
-from models.model_provider import get_llm
-from rag.rag_pipeline import setup_rag_pipeline, search_financial_documents
+from models.model_provider import get_llm, model_provider
+from models.model_router import MODEL_TIERS
+from models.rate_limiter import rate_limit_summary
+from models.usage_tracker import usage_tracker
+from rag.rag_pipeline import setup_rag_pipeline, search_financial_documents, asearch_financial_documents
+from agent.api_discovery import LOCALHOST_URL, discover_api_url
+from agent.fast_path import FastPathDispatcher
+from agent.loop_guard import LoopGuardAgentExecutor, current_guard, loop_guard
+from agent.parallel_agent import ParallelToolAgent
+from agent.plan_execute import PlanExecuteAgent
+from agent.summary_memory import RollingSummaryMemory
+from agent.tool_cache import ToolResultCache
+from agent.tracing import tracer
+from tools.entities import count_entities
+from tools.http_client import http_client
+
+# ZeroShotAgent's default suffix plus the conversation so far, so ReAct mode sees the chat history too
+REACT_SUFFIX = """Begin!
+
+Previous conversation:
+{chat_history}
+
+Question: {input}
+Thought:{agent_scratchpad}"""
+
+# Prefixes of tool results that signal a failed lookup
+TOOL_ERROR_PREFIXES = ("Could not", "API server not available", "API Error", "RAG search error")
+
+API_UNAVAILABLE = "API server not available. Please start the API server with: python launch_api.py"
+
+# api_server already retries its upstreams and answers 429 with a quota-window Retry-After,
+# so only gateway failures are worth retrying from the agent
+API_RETRY_STATUSES = (502, 503, 504)
 
 class FinancialAgentExecutor:
     """Enhanced Financial Agent with flexible API integration"""
     
-    def __init__(self):
-        self.llm_backend = os.getenv("LLM_BACKEND", "gemini")
+    def __init__(self, warm_up: Optional[bool] = None):
+        init_start = time.perf_counter()
+        self.llm_backend = os.getenv("LLM_BACKEND", "gemini").strip().lower()
+        self.model_routing = os.getenv("MODEL_ROUTING", "true").lower() == "true"
+        # "react", "parallel", "plan", or "auto" (parallel tool calls for multi-entity queries)
+        self.agent_mode = os.getenv("AGENT_MODE", "auto").lower()
+        self.fast_path = FastPathDispatcher() if os.getenv("FAST_PATH", "true").lower() == "true" else None
+        self.startup_timings = {}
         
         # Flexible API URL - try ngrok first, fallback to localhost
+        step_start = time.perf_counter()
         self.external_api_url = self._get_api_url()
+        self.startup_timings["api_probe"] = round(time.perf_counter() - step_start, 3)
         
         # Initialize components
+        step_start = time.perf_counter()
         self.llm = get_llm()
-        self.memory = ConversationBufferWindowMemory(
-            k=5,  # Keep last 5 interactions
-            memory_key="chat_history",
-            return_messages=True
-        )
+        self.startup_timings["llm_client"] = round(time.perf_counter() - step_start, 3)
+        self.memory = self.create_memory()
         
         # Setup tools
+        step_start = time.perf_counter()
+        self.tool_cache = None
+        if os.getenv("TOOL_CACHE", "true").lower() == "true":
+            self.tool_cache = ToolResultCache(max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "512")))
+        self.qa_chain = None
+        self._rag_lock = threading.Lock()
         self.tools = self._setup_tools()
         self.agent = self._initialize_agent()
+        self._tier_agents = {}
+        self._agents_lock = threading.Lock()
+        self.loop_stats = {"queries": 0, "wasted_iterations": 0, "forced_final_answers": 0}
+        self.startup_timings["tools_and_agent"] = round(time.perf_counter() - step_start, 3)
         
-        print(f"✅ Financial Agent initialized with {self.llm_backend} backend")
+        # Optionally load the RAG index and routed LLM clients before the first query needs them
+        if warm_up is None:
+            warm_up = os.getenv("AGENT_WARMUP", "true").lower() == "true"
+        self.warmup_status = "disabled"
+        if warm_up:
+            self.warmup_status = "running"
+            threading.Thread(target=self._warm_up, name="agent-warmup", daemon=True).start()
+        
+        self.startup_timings["total"] = round(time.perf_counter() - init_start, 3)
+        print(f"✅ Financial Agent initialized with {self.llm_backend} backend in {self.startup_timings['total']:.2f}s")
         print(f"🌐 Using API URL: {self.external_api_url}")
 
+    def create_memory(self):
+        """New conversation memory; also used by SessionManager for per-session memory"""
+        if os.getenv("MEMORY_MODE", "window").lower() == "summary":
+            # Older turns are summarized in the background; history stays under a token budget
+            return RollingSummaryMemory(
+                llm=self.llm,
+                memory_key="chat_history",
+                recent_turns=int(os.getenv("MEMORY_RECENT_TURNS", "2")),
+                max_history_tokens=int(os.getenv("MEMORY_TOKEN_BUDGET", "1500")),
+            )
+        return ConversationBufferWindowMemory(
+            k=5,  # Keep last 5 interactions
+            memory_key="chat_history",
+            return_messages=True
+        )
+
     def _get_api_url(self) -> str:
         """Get the best available API URL"""
-        # Priority order: env variable -> ngrok -> localhost
+        # Priority order: env variable -> last known good -> ngrok -> localhost, probed concurrently
         env_url = os.getenv("EXTERNAL_API_URL")
         if env_url:
             return env_url
         
-        # Try common ngrok URLs
-        ngrok_urls = [
-            "https://rat-expert-amazingly.ngrok-free.app",
-            "https://financial-copilot.ngrok-free.app"
-        ]
-        
-        for url in ngrok_urls:
-            try:
-                response = requests.get(f"{url}/", timeout=3)
-                if response.status_code == 200:
-                    print(f"✅ Found working ngrok URL: {url}")
-                    return url
-            except:
-                continue
-        
-        # Fallback to localhost
-        localhost_url = "http://localhost:8000"
-        try:
-            response = requests.get(f"{localhost_url}/", timeout=3)
-            if response.status_code == 200:
-                print(f"✅ Using localhost API: {localhost_url}")
-                return localhost_url
-        except:
-            print(f"⚠️ Warning: No API server found. Some features may not work.")
-            print(f"💡 Start the API server with: python launch_api.py")
+        url = discover_api_url()
+        if url:
+            print(f"✅ Found working API URL: {url}")
+            return url
         
+        print(f"⚠️ Warning: No API server found. Some features may not work.")
+        print(f"💡 Start the API server with: python launch_api.py")
         # Return localhost as default (will fail gracefully)
-        return localhost_url
+        return LOCALHOST_URL
+
+    def _get_qa_chain(self):
+        """Load the RAG pipeline once, shared by the tool and the warm-up thread"""
+        with self._rag_lock:
+            if self.qa_chain is None:
+                print("🔧 Initializing RAG pipeline...")
+                self.qa_chain = setup_rag_pipeline()
+            return self.qa_chain
+
+    def _warm_up(self):
+        """Background warm-up of the RAG index and the strong-tier LLM client"""
+        start_time = time.perf_counter()
+        try:
+            if self.model_routing:
+                strong_model = MODEL_TIERS.get(self.llm_backend, {}).get("strong")
+                if strong_model:
+                    model_provider.get_cached_llm(self.llm_backend, strong_model)
+            self._get_qa_chain()
+            self.warmup_status = "ready"
+        except Exception as e:
+            self.warmup_status = f"failed: {e}"
+        self.startup_timings["warmup"] = round(time.perf_counter() - start_time, 3)
+        print(f"🔥 Agent warm-up {self.warmup_status} in {self.startup_timings['warmup']:.2f}s")
+
+    async def _aget_qa_chain(self):
+        """_get_qa_chain() for coroutines: the one-off index load runs in a worker thread"""
+        if self.qa_chain is not None:
+            return self.qa_chain
+        return await asyncio.to_thread(self._get_qa_chain)
+
+    def _api_get(self, path: str, timeout: float = 10):
+        """GET from the external API over the shared keep-alive pool, traced as an HTTP span"""
+        with tracer.span(f"GET {path}", "http") as span:
+            response = http_client.get(f"{self.external_api_url}{path}", timeout=timeout,
+                                       retry_statuses=API_RETRY_STATUSES)
+            span["status"] = response.status_code
+            return response
+
+    async def _aapi_get(self, path: str, timeout: float = 10):
+        """Async GET from the external API over the shared async pool, traced as an HTTP span"""
+        with tracer.span(f"GET {path}", "http") as span:
+            response = await http_client.aget(f"{self.external_api_url}{path}", timeout=timeout,
+                                              retry_statuses=API_RETRY_STATUSES)
+            span["status"] = response.status_code
+            return response
+
+    async def aclose(self):
+        """Close the shared async HTTP client (call before the event loop shuts down)"""
+        await http_client.aclose()
 
-    def create_mcp_tool_from_function(self, func, name, description):
+    def create_mcp_tool_from_function(self, func, name, description, coroutine=None):
         """Create a tool with better output formatting and input validation"""
-        def wrapped_tool(input_str):
+        def check_input(input_str):
             # Input validation
             if not input_str or input_str.strip() in ["N/A", "None", ""]:
                 return f"Error: Invalid input '{input_str}'. Please provide a valid input."
-            
+            # Repeated calls within one run are answered from memory, without re-running the tool
+            guard = current_guard()
+            if guard:
+                return guard.lookup(name, input_str.strip())
+            return None
+        
+        def format_output(input_str, result):
+            # Format output to indicate completion
+            if name in ("StockPrice", "EarningsReport", "CompanyNews", "DocumentSearch"):
+                output = f"SUCCESS: {result}. Task completed - no further action needed."
+            else:
+                output = f"SUCCESS: {result}. Task completed."
+            guard = current_guard()
+            if guard:
+                guard.remember(name, input_str.strip(), output)
+            return output
+        
+        def wrapped_tool(input_str):
+            early = check_input(input_str)
+            if early is not None:
+                return early
             try:
                 result = func(input_str.strip())
-                # Format output to indicate completion
-                if name == "StockPrice":
-                    return f"SUCCESS: {result}. Task completed - no further action needed."
-                elif name == "EarningsReport":
-                    return f"SUCCESS: {result}. Task completed - no further action needed."
-                elif name == "CompanyNews":
-                    return f"SUCCESS: {result}. Task completed - no further action needed."
-                elif name == "DocumentSearch":
-                    return f"SUCCESS: {result}. Task completed - no further action needed."
-                else:
-                    return f"SUCCESS: {result}. Task completed."
             except Exception as e:
                 return f"Error executing {name}: {str(e)}"
+            return format_output(input_str, result)
+        
+        async def awrapped_tool(input_str):
+            early = check_input(input_str)
+            if early is not None:
+                return early
+            try:
+                result = await coroutine(input_str.strip())
+            except Exception as e:
+                return f"Error executing {name}: {str(e)}"
+            return format_output(input_str, result)
         
         return Tool(
             name=name,
             description=description,
-            func=wrapped_tool
+            func=wrapped_tool,
+            coroutine=awrapped_tool if coroutine else None
         )
 
-    def _setup_tools(self):
-        """Setup simplified tools with flexible API support"""
-        tools = []
-        
-        # RAG Tool - Use your existing RAG function directly
-        def rag_search_tool(query: str) -> str:
-            """Your existing RAG function as a tool"""
-            try:
-                if not hasattr(self, 'qa_chain'):
-                    print("🔧 Initializing RAG pipeline...")
-                    self.qa_chain = setup_rag_pipeline()
-                
-                answer, sources = search_financial_documents(query, self.qa_chain)
-                
-                # Format response with sources
-                formatted_answer = f"{answer}\n\nSources:\n"
-                for i, doc in enumerate(sources[:3], 1):
-                    source_name = os.path.basename(doc.metadata.get('source', 'Unknown'))
-                    page = doc.metadata.get('page', 'Unknown')
-                    formatted_answer += f"{i}. {source_name} (Page {page})\n"
-                
-                return formatted_answer
-                
-            except Exception as e:
-                return f"RAG search error: {str(e)}"
+    def _api_tool(self, path: str, label: str, format_data):
+        """Sync and async functions for one external API tool.
+
+        `path` has a {} for the tool input (or is a function of it) and
+        `format_data(input, json)` words a 200 response.
+        """
+        def target(value: str) -> str:
+            return path(value) if callable(path) else path.format(value)
         
-        # External API Tools - Flexible API support
-        def external_stock_price(symbol: str) -> str:
-            """Call external API for stock price"""
+        def call(value: str) -> str:
             try:
-                response = requests.get(f"{self.external_api_url}/stock/{symbol}", timeout=10)
+                response = self._api_get(target(value))
                 if response.status_code == 200:
-                    data = response.json()
-                    return f"Current price of {symbol}: ${data.get('price', 'N/A')}"
+                    return format_data(value, response.json())
                 else:
-                    return f"Could not fetch price for {symbol} (Status: {response.status_code})"
+                    return f"Could not fetch {label} for {value} (Status: {response.status_code})"
             except requests.exceptions.ConnectionError:
-                return f"API server not available. Please start the API server with: python launch_api.py"
+                return API_UNAVAILABLE
             except Exception as e:
                 return f"API Error: {str(e)}"
         
-        def external_earnings(symbol: str) -> str:
-            """Get earnings from external API"""
+        async def acall(value: str) -> str:
             try:
-                response = requests.get(f"{self.external_api_url}/earnings/{symbol}", timeout=10)
+                response = await self._aapi_get(target(value))
                 if response.status_code == 200:
-                    data = response.json()
-                    return f"Earnings for {symbol}: Revenue: ${data.get('revenue', 'N/A')}, Net Income: ${data.get('net_income', 'N/A')}"
+                    return format_data(value, response.json())
                 else:
-                    return f"Could not fetch earnings for {symbol} (Status: {response.status_code})"
-            except requests.exceptions.ConnectionError:
-                return f"API server not available. Please start the API server with: python launch_api.py"
+                    return f"Could not fetch {label} for {value} (Status: {response.status_code})"
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                return API_UNAVAILABLE
             except Exception as e:
                 return f"API Error: {str(e)}"
         
-        def external_news(company: str) -> str:
-            """Get news from external API"""
+        return call, acall
+
+    def _setup_tools(self):
+        """Setup simplified tools with flexible API support"""
+        tools = []
+        
+        def format_rag_answer(answer, sources) -> str:
+            # Format response with sources
+            formatted_answer = f"{answer}\n\nSources:\n"
+            for i, doc in enumerate(sources[:3], 1):
+                source_name = os.path.basename(doc.metadata.get('source', 'Unknown'))
+                page = doc.metadata.get('page', 'Unknown')
+                formatted_answer += f"{i}. {source_name} (Page {page})\n"
+            return formatted_answer
+        
+        # RAG Tool - Use your existing RAG function directly
+        def rag_search_tool(query: str) -> str:
+            """Your existing RAG function as a tool"""
+            try:
+                with tracer.span("DocumentSearch", "retrieval", query=query[:200]):
+                    answer, sources = search_financial_documents(query, self._get_qa_chain(), callbacks=[tracer.handler])
+                return format_rag_answer(answer, sources)
+            except Exception as e:
+                return f"RAG search error: {str(e)}"
+        
+        async def arag_search_tool(query: str) -> str:
             try:
-                response = requests.get(f"{self.external_api_url}/news/{company}?limit=3", timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    articles = data.get('articles', [])
-                    news_text = f"Latest news for {company}:\n"
-                    for i, article in enumerate(articles[:3], 1):
-                        news_text += f"{i}. {article.get('title', 'No title')}\n"
-                    return news_text
-                else:
-                    return f"Could not fetch news for {company} (Status: {response.status_code})"
-            except requests.exceptions.ConnectionError:
-                return f"API server not available. Please start the API server with: python launch_api.py"
+                with tracer.span("DocumentSearch", "retrieval", query=query[:200]):
+                    answer, sources = await asearch_financial_documents(
+                        query, await self._aget_qa_chain(), callbacks=[tracer.handler]
+                    )
+                return format_rag_answer(answer, sources)
             except Exception as e:
-                return f"API Error: {str(e)}"
+                return f"RAG search error: {str(e)}"
+        
+        # External API Tools - Flexible API support
+        def format_news(company: str, data: Dict[str, Any]) -> str:
+            articles = data.get('articles', [])
+            news_text = f"Latest news for {company}:\n"
+            for i, article in enumerate(articles[:3], 1):
+                news_text += f"{i}. {article.get('title', 'No title')}\n"
+            return news_text
+        
+        def price_path(value: str) -> str:
+            # Several symbols go to the batch endpoint in one request
+            symbols = [s for s in re.split(r"[,\s]+", value) if s]
+            if len(symbols) > 1:
+                return f"/stocks?symbols={','.join(symbols)}"
+            return f"/stock/{value}"
+        
+        def format_prices(value: str, data: Dict[str, Any]) -> str:
+            if "prices" not in data:
+                return f"Current price of {value}: ${data.get('price', 'N/A')}"
+            parts = [f"{symbol}: ${price}" for symbol, price in data["prices"].items()]
+            parts += [f"{symbol}: could not fetch ({error})" for symbol, error in data.get("errors", {}).items()]
+            return "Current prices - " + ", ".join(parts)
+        
+        def indicators_path(value: str) -> str:
+            # "AAPL,MSFT" or "AAPL,MSFT: rsi, sma_50" (server defaults when no indicators are named)
+            symbols, _, names = value.partition(":")
+            symbols = [s for s in re.split(r"[,\s]+", symbols) if s]
+            names = [n for n in re.split(r"[,\s]+", names) if n]
+            path = f"/indicators?symbols={','.join(symbols)}"
+            return path + (f"&indicators={','.join(names)}" if names else "")
+        
+        def format_indicators(value: str, data: Dict[str, Any]) -> str:
+            if not data.get("dates"):
+                return f"Could not compute technical indicators for {value}: no price history"
+            lines = [f"Technical indicators (daily, as of {data['dates'][-1]}):"]
+            for symbol, series in data.get("values", {}).items():
+                parts = [f"{name} {values[-1]:.2f}" for name, values in series.items() if values[-1] is not None]
+                lines.append(f"{symbol}: " + ", ".join(parts))
+            lines += [f"{symbol}: could not fetch ({error})" for symbol, error in data.get("errors", {}).items()]
+            return "\n".join(lines)
+        
+        external_stock_price, aexternal_stock_price = self._api_tool(price_path, "price", format_prices)
+        external_earnings, aexternal_earnings = self._api_tool(
+            "/earnings/{}", "earnings",
+            lambda symbol, data: f"Earnings for {symbol}: Revenue: ${data.get('revenue', 'N/A')}, Net Income: ${data.get('net_income', 'N/A')}"
+        )
+        external_news, aexternal_news = self._api_tool("/news/{}?limit=3", "news", format_news)
+        external_dividend, aexternal_dividend = self._api_tool(
+            "/dividend/{}", "dividend yield",
+            lambda symbol, data: f"Dividend yield of {symbol}: {data.get('dividend_yield', 'N/A')}%"
+        )
+        external_indicators, aexternal_indicators = self._api_tool(
+            indicators_path, "technical indicators", format_indicators
+        )
+        
+        # Raw functions, used by the fast path to skip the agent entirely
+        self._tool_functions = {
+            "DocumentSearch": rag_search_tool,
+            "StockPrice": external_stock_price,
+            "EarningsReport": external_earnings,
+            "CompanyNews": external_news,
+            "DividendYield": external_dividend,
+            "TechnicalIndicators": external_indicators,
+        }
+        self._async_tool_functions = {
+            "DocumentSearch": arag_search_tool,
+            "StockPrice": aexternal_stock_price,
+            "EarningsReport": aexternal_earnings,
+            "CompanyNews": aexternal_news,
+            "DividendYield": aexternal_dividend,
+            "TechnicalIndicators": aexternal_indicators,
+        }
+        if self.tool_cache:
+            cacheable = lambda result: not result.startswith(TOOL_ERROR_PREFIXES)
+            self._tool_functions = {
+                name: self.tool_cache.wrap(name, func, cacheable)
+                for name, func in self._tool_functions.items()
+            }
+            self._async_tool_functions = {
+                name: self.tool_cache.awrap(name, func, cacheable)
+                for name, func in self._async_tool_functions.items()
+            }
         
         # Add all tools using the simple wrapper
         tools.append(self.create_mcp_tool_from_function(
-            rag_search_tool,
+            self._tool_functions["DocumentSearch"],
             "DocumentSearch",
-            "Search financial documents and reports for specific information. Use this ONLY for questions about company financials, earnings, reports, or document-based analysis. DO NOT use for general definitions or explanations. Input: search query string."
+            "Search financial documents and reports for specific information. Use this ONLY for questions about company financials, earnings, reports, or document-based analysis. DO NOT use for general definitions or explanations. Input: search query string.",
+            coroutine=self._async_tool_functions["DocumentSearch"]
         ))
         
         tools.append(self.create_mcp_tool_from_function(
-            external_stock_price,
+            self._tool_functions["StockPrice"],
             "StockPrice", 
-            "Get current stock price from external API. Use ONLY for requests asking for current/latest stock prices. Input: stock symbol (e.g., TSLA, AAPL). Returns: current price in USD."
+            "Get current stock price from external API. Use ONLY for requests asking for current/latest stock prices. Input: stock symbol (e.g., TSLA), or several comma-separated symbols (e.g., AAPL,MSFT,GOOGL) to get all their prices in one call. Returns: current price in USD.",
+            coroutine=self._async_tool_functions["StockPrice"]
         ))
         
         tools.append(self.create_mcp_tool_from_function(
-            external_earnings,
+            self._tool_functions["EarningsReport"],
             "EarningsReport",
-            "Get earnings report from external API. Use for company earnings data and financial metrics. Input: stock symbol (e.g., TSLA, AAPL). Returns: earnings data and key metrics."
+            "Get earnings report from external API. Use for company earnings data and financial metrics. Input: stock symbol (e.g., TSLA, AAPL). Returns: earnings data and key metrics.",
+            coroutine=self._async_tool_functions["EarningsReport"]
         ))
         
         tools.append(self.create_mcp_tool_from_function(
-            external_news,
+            self._tool_functions["CompanyNews"],
             "CompanyNews",
-            "Get company news from external API. Use for latest company news and market updates. Input: company name or stock symbol. Returns: recent news articles."
+            "Get company news from external API. Use for latest company news and market updates. Input: company name or stock symbol. Returns: recent news articles.",
+            coroutine=self._async_tool_functions["CompanyNews"]
+        ))
+        
+        tools.append(self.create_mcp_tool_from_function(
+            self._tool_functions["DividendYield"],
+            "DividendYield",
+            "Get dividend yield from external API. Use for questions about dividends or dividend yield. Input: stock symbol (e.g., KO, AAPL). Returns: dividend yield in percent.",
+            coroutine=self._async_tool_functions["DividendYield"]
+        ))
+        
+        tools.append(self.create_mcp_tool_from_function(
+            self._tool_functions["TechnicalIndicators"],
+            "TechnicalIndicators",
+            "Get technical indicators computed from daily prices: moving averages (sma, ema), RSI, MACD, Bollinger bands, ATR and annualized volatility. Use for questions about momentum, overbought/oversold levels or moving averages. Input: stock symbol or comma-separated symbols, optionally followed by a colon and indicators with periods (e.g., AAPL,MSFT: rsi, sma_50, macd). Returns: latest value of each indicator.",
+            coroutine=self._async_tool_functions["TechnicalIndicators"]
         ))
         
         return tools
 
-    def _initialize_agent(self):
+    def _initialize_agent(self, llm=None):
         """Initialize the LangChain agent with fixed configuration"""
-        return initialize_agent(
+        # Same agent initialize_agent() builds for ZERO_SHOT_REACT_DESCRIPTION, with a loop-aware executor
+        # and the chat history in the prompt
+        react_agent = ZeroShotAgent.from_llm_and_tools(
+            llm or self.llm, self.tools, suffix=REACT_SUFFIX,
+            input_variables=["input", "chat_history", "agent_scratchpad"]
+        )
+        return LoopGuardAgentExecutor.from_agent_and_tools(
+            agent=react_agent,
             tools=self.tools,
-            llm=self.llm,
-            agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+            tags=[AgentType.ZERO_SHOT_REACT_DESCRIPTION.value],
             memory=self.memory,
             handle_parsing_errors=True,
             verbose=True,
@@ -221,41 +450,209 @@ class FinancialAgentExecutor:
             # Removed return_intermediate_steps=True to fix the run() issue
         )
 
-    def process_query(self, user_query: str) -> Dict[str, Any]:
-        """Process user query through the agent"""
+    def process_query(self, user_query: str, mode: Optional[str] = None, memory=None) -> Dict[str, Any]:
+        """Process user query through the agent (mode overrides AGENT_MODE for this query).
+
+        `memory` replaces the agent's own conversation memory for this query, which is
+        how SessionManager serves many conversations from one set of components.
+        """
         print(f"\n🤖 Processing query with {self.llm_backend} backend...")
         print(f"📝 Query: {user_query}")
         
+        with usage_tracker.track_query(user_query) as query_id, tracer.trace(user_query) as trace, \
+                loop_guard() as guard:
+            result = self._run_query(user_query, mode, memory if memory is not None else self.memory)
+        return self._finish_query(result, query_id, trace, guard)
+
+    async def aprocess_query(self, user_query: str, mode: Optional[str] = None, memory=None) -> Dict[str, Any]:
+        """Async process_query: LLM calls, API tools and RAG are awaited, so many queries
+        can run concurrently on one event loop (each keeps its own usage, trace and loop guard).
+        """
+        print(f"\n🤖 Processing query with {self.llm_backend} backend (async)...")
+        print(f"📝 Query: {user_query}")
+        
+        with usage_tracker.track_query(user_query) as query_id, tracer.trace(user_query) as trace, \
+                loop_guard() as guard:
+            result = await self._arun_query(user_query, mode, memory if memory is not None else self.memory)
+        return self._finish_query(result, query_id, trace, guard)
+
+    def _finish_query(self, result: Dict[str, Any], query_id: str, trace, guard) -> Dict[str, Any]:
+        """Attach loop, usage and timing details to a query result"""
+        self.loop_stats["queries"] += 1
+        self.loop_stats["wasted_iterations"] += guard.repeats
+        self.loop_stats["forced_final_answers"] += 1 if guard.stop else 0
+        if guard.repeats:
+            print(f"🔁 {guard.repeats} wasted iteration(s) on repeated tool calls")
+        result["wasted_iterations"] = guard.repeats
+        result["usage"] = usage_tracker.query_usage(query_id)
+        result["trace_id"] = trace.trace_id
+        result["timings"] = {"total": trace.duration, **trace.breakdown()}
+        return result
+
+    def _run_query(self, user_query: str, mode: Optional[str], memory) -> Dict[str, Any]:
+        """Route the query to the agent or the direct LLM; an explicit mode always uses the agent"""
+        decision = None
+        start_time = time.time()
         try:
+            # An explicit mode always goes to the agent
+            fast_result = None if mode is not None else self._try_fast_path(user_query, memory)
+            if fast_result:
+                return fast_result
+            
             # Check if query needs tool use
-            if self._needs_tool_use(user_query):
-                print("🔧 Using agentic workflow (tools enabled)")
+            needs_tools = mode is not None or self._needs_tool_use(user_query)
+            llm, decision = self._route_query(user_query, needs_tools)
+            if needs_tools:
+                mode = self._resolve_mode(user_query, mode or self.agent_mode)
+                print(f"🔧 Using agentic workflow (tools enabled, {mode} mode)")
                 # Use invoke instead of run to avoid the output key issue
-                response = self.agent.invoke({"input": user_query})
-                if isinstance(response, dict) and "output" in response:
-                    response = response["output"]
-                elif hasattr(response, 'content'):
-                    response = response.content
+                response = self._get_agent(llm, decision, mode, memory).invoke(
+                    {"input": user_query}, config={"callbacks": [tracer.handler]}
+                )
             else:
                 print("💬 Using direct LLM response")
-                response = self.llm.invoke(user_query)
-                if hasattr(response, 'content'):
-                    response = response.content
+                response = llm.invoke(user_query, config={"callbacks": [tracer.handler]})
+            return self._success_result(self._response_text(response), decision, start_time)
             
-            return {
-                "answer": response,
-                "backend": self.llm_backend,
-                "status": "success"
-            }
+        except Exception as e:
+            return self._error_result(e, decision, start_time)
+
+    async def _arun_query(self, user_query: str, mode: Optional[str], memory) -> Dict[str, Any]:
+        """Async _run_query with the same routing"""
+        decision = None
+        start_time = time.time()
+        try:
+            # An explicit mode always goes to the agent
+            fast_result = None if mode is not None else await self._atry_fast_path(user_query, memory)
+            if fast_result:
+                return fast_result
+            
+            needs_tools = mode is not None or self._needs_tool_use(user_query)
+            llm, decision = self._route_query(user_query, needs_tools)
+            if needs_tools:
+                mode = self._resolve_mode(user_query, mode or self.agent_mode)
+                print(f"🔧 Using agentic workflow (tools enabled, {mode} mode)")
+                response = await self._get_agent(llm, decision, mode, memory).ainvoke(
+                    {"input": user_query}, config={"callbacks": [tracer.handler]}
+                )
+            else:
+                print("💬 Using direct LLM response")
+                response = await llm.ainvoke(user_query, config={"callbacks": [tracer.handler]})
+            return self._success_result(self._response_text(response), decision, start_time)
             
         except Exception as e:
-            error_msg = f"Error processing query: {str(e)}"
-            print(f"❌ {error_msg}")
-            return {
-                "answer": error_msg,
-                "backend": self.llm_backend,
-                "status": "error"
-            }
+            return self._error_result(e, decision, start_time)
+
+    @staticmethod
+    def _response_text(response):
+        """Answer text from an agent result dict or an LLM message"""
+        if isinstance(response, dict) and "output" in response:
+            return response["output"]
+        elif hasattr(response, 'content'):
+            return response.content
+        return response
+
+    def _success_result(self, response, decision, start_time: float) -> Dict[str, Any]:
+        if decision:
+            model_provider.router.record_outcome(decision, time.time() - start_time, True, response)
+        return {
+            "answer": response,
+            "backend": self.llm_backend,
+            "model": decision.model if decision else None,
+            "status": "success"
+        }
+
+    def _error_result(self, error: Exception, decision, start_time: float) -> Dict[str, Any]:
+        error_msg = f"Error processing query: {str(error)}"
+        print(f"❌ {error_msg}")
+        if decision:
+            model_provider.router.record_outcome(decision, time.time() - start_time, False)
+        return {
+            "answer": error_msg,
+            "backend": self.llm_backend,
+            "status": "error"
+        }
+
+    def _try_fast_path(self, user_query: str, memory) -> Optional[Dict[str, Any]]:
+        """Answer simple single-ticker lookups by calling the tool directly, without any LLM"""
+        if self.fast_path is None:
+            return None
+        match = self.fast_path.match(user_query)
+        if match is None:
+            return None
+        intent, tool_name, tool_input = match
+        start_time = time.perf_counter()
+        with tracer.span(f"fast_path:{tool_name}", "fast_path", input=tool_input):
+            answer = self._tool_functions[tool_name](tool_input)
+        return self._fast_path_result(user_query, memory, intent, tool_name, tool_input, answer, start_time)
+
+    async def _atry_fast_path(self, user_query: str, memory) -> Optional[Dict[str, Any]]:
+        if self.fast_path is None:
+            return None
+        match = self.fast_path.match(user_query)
+        if match is None:
+            return None
+        intent, tool_name, tool_input = match
+        start_time = time.perf_counter()
+        with tracer.span(f"fast_path:{tool_name}", "fast_path", input=tool_input):
+            answer = await self._async_tool_functions[tool_name](tool_input)
+        return self._fast_path_result(user_query, memory, intent, tool_name, tool_input, answer, start_time)
+
+    def _fast_path_result(self, user_query: str, memory, intent: str, tool_name: str, tool_input: str,
+                          answer: str, start_time: float) -> Optional[Dict[str, Any]]:
+        """Fast path answer as a query result, or None to fall back to the agent"""
+        if answer.startswith(TOOL_ERROR_PREFIXES):
+            print(f"↩️ Fast path {tool_name}({tool_input}) failed, falling back to the agent")
+            return None
+        print(f"⚡ Fast path: {tool_name}({tool_input}) in {(time.perf_counter() - start_time) * 1000:.0f}ms")
+        memory.save_context({"input": user_query}, {"output": answer})
+        return {
+            "answer": answer,
+            "backend": self.llm_backend,
+            "model": None,
+            "fast_path": intent,
+            "status": "success"
+        }
+
+    def _route_query(self, user_query: str, needs_tools: bool):
+        """Pick the fast or strong model tier for this query"""
+        if not self.model_routing:
+            return self.llm, None
+        decision = model_provider.router.route(user_query, self.llm_backend, needs_tools)
+        if decision.tier == "fast":
+            # The fast tier is the default client this agent was built with
+            return self.llm, decision
+        return model_provider.get_cached_llm(self.llm_backend, decision.model), decision
+
+    def _resolve_mode(self, user_query: str, mode: str) -> str:
+        """Pick the agent mode; "auto" uses parallel tool calls when several entities are named"""
+        if mode == "auto":
+            return "parallel" if count_entities(user_query) > 1 else "react"
+        if mode not in ("react", "parallel", "plan"):
+            raise ValueError(f"Unsupported agent mode: {mode}. Use 'react', 'parallel', 'plan' or 'auto'")
+        return mode
+
+    def _get_agent(self, llm, decision=None, mode: str = "react", memory=None):
+        """Reuse one agent per model tier and mode; all share tools, and memory unless one is given"""
+        if mode == "react" and (decision is None or llm is self.llm):
+            agent = self.agent
+        else:
+            key = (decision.model if decision else None, mode)
+            with self._agents_lock:
+                if key not in self._tier_agents:
+                    if mode == "parallel":
+                        self._tier_agents[key] = ParallelToolAgent(llm, self.tools, memory=self.memory)
+                    elif mode == "plan":
+                        self._tier_agents[key] = PlanExecuteAgent(llm, self.tools, memory=self.memory)
+                    else:
+                        self._tier_agents[key] = self._initialize_agent(llm)
+                agent = self._tier_agents[key]
+        if memory is None or memory is self.memory:
+            return agent
+        # Shallow per-query copy bound to another conversation's memory
+        if isinstance(agent, (ParallelToolAgent, PlanExecuteAgent)):
+            return agent.with_memory(memory)
+        return agent.model_copy(update={"memory": memory})
 
     def _needs_tool_use(self, query: str) -> bool:
         """Determine if query needs tool usage"""
@@ -290,7 +687,7 @@ class FinancialAgentExecutor:
         # Check external API status
         api_status = "unknown"
         try:
-            response = requests.get(f"{self.external_api_url}/", timeout=5)
+            response = http_client.get(f"{self.external_api_url}/", timeout=5)
             if response.status_code == 200:
                 api_status = "connected"
             else:
@@ -303,9 +700,28 @@ class FinancialAgentExecutor:
             "external_api_status": api_status,
             "external_api_url": self.external_api_url,
             "tools_available": len(self.tools),
-            "memory_size": len(self.memory.chat_memory.messages)
+            "memory_size": len(self.memory.chat_memory.messages),
+            "memory_savings": self.memory.stats() if isinstance(self.memory, RollingSummaryMemory) else None,
+            "usage": usage_tracker.summary(),
+            "rate_limits": rate_limit_summary(),
+            "model_routing": model_provider.router.summary() if self.model_routing else "disabled",
+            "tool_cache": self.tool_cache.stats() if self.tool_cache else "disabled",
+            "http_pool": http_client.stats(),
+            "startup_timings": self.startup_timings,
+            "loop_detection": self.loop_stats,
+            "warmup_status": self.warmup_status
         }
 
+    def export_trace(self, path: str, trace_id: Optional[str] = None, chrome: bool = False) -> int:
+        """Export one query's trace (or all retained traces) as JSON or Chrome trace format"""
+        if chrome:
+            return tracer.export_chrome_trace(path, trace_id)
+        return tracer.export_json(path, trace_id)
+
+    def export_usage(self, path: str) -> int:
+        """Export per-call LLM usage records as JSON lines"""
+        return usage_tracker.export_jsonl(path)
+
 # Convenience function for quick usage
 def create_agent() -> FinancialAgentExecutor:
     """Create and return a configured financial agent"""
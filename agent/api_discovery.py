@@ -0,0 +1,93 @@
+# Concurrent discovery of the financial API server URL with a last-known-good cache
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional
+
+import requests
+
+NGROK_URLS = [
+    "https://rat-expert-amazingly.ngrok-free.app",
+    "https://financial-copilot.ngrok-free.app",
+]
+LOCALHOST_URL = "http://localhost:8000"
+
+CACHE_FILE = os.path.expanduser(os.getenv("API_URL_CACHE_FILE", "~/.financial_copilot_api_url"))
+PROBE_DEADLINE = float(os.getenv("API_PROBE_DEADLINE", "1.5"))
+# Within one process a discovered URL is trusted for this long without re-probing
+IN_PROCESS_TTL = float(os.getenv("API_URL_CACHE_TTL", "300"))
+
+_last_good = {"url": None, "at": 0.0}
+
+
+def _probe(url: str, timeout: float) -> bool:
+    try:
+        return requests.get(f"{url}/", timeout=timeout).status_code == 200
+    except Exception:
+        return False
+
+
+def read_cached_url() -> Optional[str]:
+    try:
+        with open(CACHE_FILE, encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def write_cached_url(url: str):
+    try:
+        with open(CACHE_FILE, "w", encoding="utf-8") as f:
+            f.write(url)
+    except OSError:
+        pass
+
+
+def remember_url(url: str):
+    """Record a URL that just answered, in process and on disk"""
+    _last_good.update(url=url, at=time.monotonic())
+    write_cached_url(url)
+
+
+def discover_api_url(candidates: Optional[List[str]] = None, deadline: float = PROBE_DEADLINE) -> Optional[str]:
+    """Probe candidates concurrently; return the highest-priority one that answers before the deadline.
+
+    Returns as soon as no pending higher-priority candidate could still win, so a
+    responsive localhost does not wait out a slow ngrok probe.
+    """
+    if _last_good["url"] and time.monotonic() - _last_good["at"] < IN_PROCESS_TTL:
+        return _last_good["url"]
+
+    if candidates is None:
+        candidates = NGROK_URLS + [LOCALHOST_URL]
+        cached = read_cached_url()
+        if cached:
+            candidates = [cached] + [url for url in candidates if url != cached]
+
+    pool = ThreadPoolExecutor(max_workers=len(candidates))
+    futures = {pool.submit(_probe, url, deadline): index for index, url in enumerate(candidates)}
+    results = {}
+    pending = set(futures)
+    end = time.monotonic() + deadline
+    try:
+        while pending:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+            winners = [index for index, ok in results.items() if ok]
+            if winners and all(futures[f] > min(winners) for f in pending):
+                break
+    finally:
+        # Don't wait for stragglers; their sockets time out on their own
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    winners = sorted(index for index, ok in results.items() if ok)
+    if not winners:
+        return None
+    url = candidates[winners[0]]
+    remember_url(url)
+    return url
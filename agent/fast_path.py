@@ -0,0 +1,66 @@
+# Deterministic dispatcher for simple single-intent lookups that don't need an LLM
+
+import re
+from typing import Optional, Tuple
+
+from tools.entities import find_entities
+
+# Intent -> (tool name, trigger pattern)
+INTENTS = {
+    "price": ("StockPrice", re.compile(r"\b(price|quote|trading at|share value)\b")),
+    "earnings": ("EarningsReport", re.compile(r"\b(earnings|revenue|net income|eps|income statement)\b")),
+    "news": ("CompanyNews", re.compile(r"\b(news|headlines)\b")),
+    "dividend": ("DividendYield", re.compile(r"\bdividends?\b")),
+    "indicators": ("TechnicalIndicators", re.compile(
+        r"\b(rsi|macd|moving averages?|sma|ema|bollinger|atr|volatility|overbought|oversold)\b")),
+}
+
+# Anything that asks for reasoning or about the future rather than a lookup goes to the agent
+DISQUALIFIERS = re.compile(
+    r"\b(why|how|should|compare|comparison|versus|vs|analy[sz]e|analysis|explain|predict|forecast|"
+    r"trend|history|historical|expect|impact|affect|recommend|better|worse|risk|if|"
+    r"will|targets?|next|tomorrow|outlook|estimates?|future|projected|projections?)\b"
+)
+
+# Questions about a past point in time: the tools only return current values
+TIME_QUALIFIERS = re.compile(
+    r"\b(yesterday|last|ago|previous|prior|past|earlier|historic(al)?|was|were|"
+    r"january|february|march|april|june|july|august|september|october|november|december)\b|"
+    r"\b(19|20)\d{2}\b|\b\d{1,2}/\d{1,2}(/\d{2,4})?\b"
+)
+
+MAX_WORDS = 12
+
+
+class FastPathDispatcher:
+    """Recognizes high-confidence single-intent queries about one ticker"""
+
+    def match(self, query: str) -> Optional[Tuple[str, str, str]]:
+        """Return (intent, tool name, tool input) or None when the agent should handle it"""
+        query_lower = query.lower()
+        if len(query.split()) > MAX_WORDS or DISQUALIFIERS.search(query_lower) \
+                or TIME_QUALIFIERS.search(query_lower):
+            return None
+
+        intents = [name for name, (_, pattern) in INTENTS.items() if pattern.search(query_lower)]
+        if len(intents) != 1:
+            return None
+
+        entity = self._single_entity(query)
+        if entity is None:
+            return None
+        ticker, company = entity
+
+        intent = intents[0]
+        tool_name = INTENTS[intent][0]
+        # NewsAPI searches text, so a company name finds more than a ticker
+        tool_input = company if intent == "news" and company else ticker
+        return intent, tool_name, tool_input
+
+    @staticmethod
+    def _single_entity(query: str) -> Optional[Tuple[str, Optional[str]]]:
+        """The one (ticker, company name) the query refers to, if exactly one"""
+        entities = find_entities(query)
+        if len(entities) != 1:
+            return None
+        return entities.popitem()
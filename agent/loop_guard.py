@@ -0,0 +1,84 @@
+# Per-run memoization of tool calls and early exit when the agent starts repeating itself
+
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from langchain.agents import AgentExecutor
+from langchain_core.messages import BaseMessage, get_buffer_string
+
+REPEAT_NOTICE = (
+    "NOTE: you already called {tool} with this input; the result is repeated above. "
+    "Do not call it again - give your Final Answer now."
+)
+
+_current_guard: ContextVar[Optional["LoopGuard"]] = ContextVar("current_loop_guard", default=None)
+
+
+class LoopGuard:
+    """Remembers every (tool, input) observation in one agent run and counts repeats"""
+
+    def __init__(self, max_repeats: int = 2):
+        self.max_repeats = max_repeats
+        self.observations: Dict[Tuple[str, str], str] = {}
+        self.repeats = 0
+        self.stop = False
+        self._lock = threading.Lock()
+
+    def lookup(self, tool: str, tool_input: str) -> Optional[str]:
+        """Cached observation for a repeated call (with a nudge to finish), else None"""
+        key = (tool, " ".join(tool_input.split()).lower())
+        with self._lock:
+            observation = self.observations.get(key)
+            if observation is None:
+                return None
+            self.repeats += 1
+            if self.repeats >= self.max_repeats:
+                self.stop = True
+        print(f"🔁 Repeated {tool}({tool_input}) - returning cached observation")
+        return f"{observation}\n{REPEAT_NOTICE.format(tool=tool)}"
+
+    def remember(self, tool: str, tool_input: str, observation: str):
+        key = (tool, " ".join(tool_input.split()).lower())
+        with self._lock:
+            self.observations[key] = observation
+
+
+def current_guard() -> Optional[LoopGuard]:
+    return _current_guard.get()
+
+
+@contextmanager
+def loop_guard(max_repeats: Optional[int] = None):
+    """Make a fresh LoopGuard current for one query"""
+    guard = LoopGuard(max_repeats or int(os.getenv("LOOP_MAX_REPEATS", "2")))
+    token = _current_guard.set(guard)
+    try:
+        yield guard
+    finally:
+        _current_guard.reset(token)
+
+
+class LoopGuardAgentExecutor(AgentExecutor):
+    """AgentExecutor that stops iterating once the current LoopGuard detects a repeat cycle.
+
+    Stopping hands over to early_stopping_method ("generate"), which asks the LLM
+    for a final answer from the observations gathered so far.
+    """
+
+    def _should_continue(self, iterations: int, time_elapsed: float) -> bool:
+        guard = current_guard()
+        if guard is not None and guard.stop:
+            print("🛑 Repeat cycle detected - forcing a final answer")
+            return False
+        return super()._should_continue(iterations, time_elapsed)
+
+    def prep_inputs(self, inputs):
+        """Memory returns message objects; the ReAct prompt is plain text, so render them as lines"""
+        inputs = super().prep_inputs(inputs)
+        for key, value in inputs.items():
+            if isinstance(value, list) and all(isinstance(m, BaseMessage) for m in value):
+                inputs[key] = get_buffer_string(value)
+        return inputs
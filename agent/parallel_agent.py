@@ -0,0 +1,229 @@
+# Agent mode that lets the model request several tool calls per step and runs them concurrently
+
+import asyncio
+import contextvars
+import copy
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from agent.loop_guard import current_guard
+
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompt_templates")
+
+
+def load_prompt(filename: str) -> str:
+    """Read a prompt template from prompt_templates/"""
+    with open(os.path.join(PROMPT_DIR, filename), encoding="utf-8") as f:
+        return f.read()
+
+
+def message_text(message) -> str:
+    """Plain text of an LLM response (Gemini may return a list of content parts)"""
+    content = getattr(message, "content", message)
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+
+def parse_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """First {...} block in an LLM reply, or None if there is no valid JSON object"""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+
+
+def json_tool_calls(plan: Dict[str, Any]) -> List[Tuple[Any, Any]]:
+    """(tool, input) pairs from a JSON fallback reply, skipping entries that are not call objects"""
+    calls = plan.get("tool_calls")
+    if not isinstance(calls, list):
+        return []
+    return [(call.get("tool"), call.get("input", "")) for call in calls if isinstance(call, dict) and call.get("tool")]
+
+
+class ParallelToolAgent:
+    """Tool-calling agent: one LLM step may emit many tool calls, executed concurrently.
+
+    Uses the backend's native tool calling when available and falls back to a
+    JSON protocol otherwise. Exposes the same invoke({"input": ...}) -> {"output": ...}
+    interface as LangChain's AgentExecutor.
+    """
+
+    def __init__(self, llm, tools, memory=None, max_rounds: int = 3, max_workers: int = 8):
+        self.llm = llm
+        self.tools = {tool.name: tool for tool in tools}
+        self.memory = memory
+        self.max_rounds = max_rounds
+        self.max_workers = max_workers
+        self.system_prompt = load_prompt("parallel_agent_prompt.txt")
+        try:
+            self.bound_llm = llm.bind_tools(list(tools))
+        except (NotImplementedError, AttributeError):
+            self.bound_llm = None
+
+    def with_memory(self, memory) -> "ParallelToolAgent":
+        """Shallow copy sharing the LLM and tools but bound to another memory"""
+        agent = copy.copy(self)
+        agent.memory = memory
+        return agent
+
+    def invoke(self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        query = inputs["input"]
+        messages = [SystemMessage(content=self.system_prompt), *self._history(), HumanMessage(content=query)]
+        if self.bound_llm is not None:
+            answer, tool_calls = self._run_native(messages, config)
+        else:
+            answer, tool_calls = self._run_json(messages, config)
+        if self.memory is not None:
+            self.memory.save_context({"input": query}, {"output": answer})
+        return {"input": query, "output": answer, "tool_calls": tool_calls}
+
+    async def ainvoke(self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Async invoke: LLM calls are awaited and each round's tool calls are gathered on the event loop"""
+        query = inputs["input"]
+        messages = [SystemMessage(content=self.system_prompt), *self._history(), HumanMessage(content=query)]
+        if self.bound_llm is not None:
+            answer, tool_calls = await self._arun_native(messages, config)
+        else:
+            answer, tool_calls = await self._arun_json(messages, config)
+        if self.memory is not None:
+            self.memory.save_context({"input": query}, {"output": answer})
+        return {"input": query, "output": answer, "tool_calls": tool_calls}
+
+    def _run_native(self, messages: List, config: Optional[Dict[str, Any]] = None) -> Tuple[str, int]:
+        """Native tool calling: each round executes every requested call in parallel"""
+        tool_calls = 0
+        response = self.bound_llm.invoke(messages, config=config)
+        for _ in range(self.max_rounds):
+            if not response.tool_calls:
+                break
+            print(f"⚡ Running {len(response.tool_calls)} tool call(s) concurrently")
+            results = self._execute([(call["name"], call["args"]) for call in response.tool_calls], config)
+            tool_calls += len(results)
+            messages.append(response)
+            messages.extend(
+                ToolMessage(content=result, tool_call_id=call["id"])
+                for call, result in zip(response.tool_calls, results)
+            )
+            guard = current_guard()
+            if guard is not None and guard.stop:
+                # Repeat cycle: stop offering tools and ask for the answer from what we have
+                print("🛑 Repeat cycle detected - forcing a final answer")
+                break
+            response = self.bound_llm.invoke(messages, config=config)
+        if response.tool_calls:
+            # Out of rounds (or cut short) with calls still pending: answer without tools
+            messages.append(HumanMessage(content="Use the tool results above to give your final answer now."))
+            response = self.llm.invoke(messages, config=config)
+        return message_text(response), tool_calls
+
+    def _run_json(self, messages: List, config: Optional[Dict[str, Any]] = None) -> Tuple[str, int]:
+        """Fallback for backends without tool calling: one JSON plan, then one answer"""
+        descriptions = "\n".join(f"- {name}: {tool.description}" for name, tool in self.tools.items())
+        instructions = load_prompt("parallel_agent_fallback_prompt.txt").format(tool_descriptions=descriptions)
+        messages[0] = SystemMessage(content=f"{self.system_prompt}\n{instructions}")
+        reply = message_text(self.llm.invoke(messages, config=config))
+        plan = parse_json_object(reply) or {"answer": reply}
+        calls = json_tool_calls(plan)
+        if not calls:
+            return plan.get("answer") or reply, 0
+
+        print(f"⚡ Running {len(calls)} tool call(s) concurrently")
+        results = self._execute(calls, config)
+        observations = "\n".join(
+            f"{name}({tool_input}) -> {result}" for (name, tool_input), result in zip(calls, results)
+        )
+        messages[0] = SystemMessage(content=self.system_prompt)
+        messages.append(AIMessage(content=reply))
+        messages.append(HumanMessage(content=f"Tool results:\n{observations}\n\nNow answer the original question."))
+        return message_text(self.llm.invoke(messages, config=config)), len(calls)
+
+    async def _arun_native(self, messages: List, config: Optional[Dict[str, Any]] = None) -> Tuple[str, int]:
+        tool_calls = 0
+        response = await self.bound_llm.ainvoke(messages, config=config)
+        for _ in range(self.max_rounds):
+            if not response.tool_calls:
+                break
+            print(f"⚡ Running {len(response.tool_calls)} tool call(s) concurrently")
+            results = await self._aexecute([(call["name"], call["args"]) for call in response.tool_calls], config)
+            tool_calls += len(results)
+            messages.append(response)
+            messages.extend(
+                ToolMessage(content=result, tool_call_id=call["id"])
+                for call, result in zip(response.tool_calls, results)
+            )
+            guard = current_guard()
+            if guard is not None and guard.stop:
+                print("🛑 Repeat cycle detected - forcing a final answer")
+                break
+            response = await self.bound_llm.ainvoke(messages, config=config)
+        if response.tool_calls:
+            messages.append(HumanMessage(content="Use the tool results above to give your final answer now."))
+            response = await self.llm.ainvoke(messages, config=config)
+        return message_text(response), tool_calls
+
+    async def _arun_json(self, messages: List, config: Optional[Dict[str, Any]] = None) -> Tuple[str, int]:
+        descriptions = "\n".join(f"- {name}: {tool.description}" for name, tool in self.tools.items())
+        instructions = load_prompt("parallel_agent_fallback_prompt.txt").format(tool_descriptions=descriptions)
+        messages[0] = SystemMessage(content=f"{self.system_prompt}\n{instructions}")
+        reply = message_text(await self.llm.ainvoke(messages, config=config))
+        plan = parse_json_object(reply) or {"answer": reply}
+        calls = json_tool_calls(plan)
+        if not calls:
+            return plan.get("answer") or reply, 0
+
+        print(f"⚡ Running {len(calls)} tool call(s) concurrently")
+        results = await self._aexecute(calls, config)
+        observations = "\n".join(
+            f"{name}({tool_input}) -> {result}" for (name, tool_input), result in zip(calls, results)
+        )
+        messages[0] = SystemMessage(content=self.system_prompt)
+        messages.append(AIMessage(content=reply))
+        messages.append(HumanMessage(content=f"Tool results:\n{observations}\n\nNow answer the original question."))
+        return message_text(await self.llm.ainvoke(messages, config=config)), len(calls)
+
+    def _execute(self, calls: List, config: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Run (tool name, args) pairs concurrently, preserving order"""
+        def run(call):
+            name, args = call
+            tool = self.tools.get(name)
+            if tool is None:
+                return f"Error: unknown tool '{name}'"
+            try:
+                return str(tool.invoke(args, config=config))
+            except Exception as e:
+                return f"Error executing {name}: {str(e)}"
+
+        if len(calls) == 1:
+            return [run(calls[0])]
+        with ThreadPoolExecutor(max_workers=min(len(calls), self.max_workers)) as pool:
+            # Copy the context so per-query accounting follows each call into its thread
+            futures = [pool.submit(contextvars.copy_context().run, run, call) for call in calls]
+            return [future.result() for future in futures]
+
+    async def _aexecute(self, calls: List, config: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Run (tool name, args) pairs concurrently as tasks on the current event loop, preserving order"""
+        async def run(call):
+            name, args = call
+            tool = self.tools.get(name)
+            if tool is None:
+                return f"Error: unknown tool '{name}'"
+            try:
+                return str(await tool.ainvoke(args, config=config))
+            except Exception as e:
+                return f"Error executing {name}: {str(e)}"
+
+        return list(await asyncio.gather(*(run(call) for call in calls)))
+
+    def _history(self) -> List:
+        if self.memory is None:
+            return []
+        return self.memory.load_memory_variables({}).get(self.memory.memory_key, [])
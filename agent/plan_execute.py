@@ -0,0 +1,185 @@
+# Plan-and-execute agent mode: one planning call, a concurrent tool DAG, one synthesis call
+
+import asyncio
+import contextvars
+import copy
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from agent.parallel_agent import load_prompt, message_text, parse_json_object
+
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+class PlanExecuteAgent:
+    """Plans every tool call up front as a dependency graph, runs independent steps
+    concurrently, then writes the answer in a single synthesis call.
+
+    A query costs exactly two LLM calls regardless of how many tools it needs.
+    Exposes the same invoke({"input": ...}) -> {"output": ...} interface as AgentExecutor.
+    """
+
+    def __init__(self, llm, tools, memory=None, max_steps: int = 12, max_workers: int = 8):
+        self.llm = llm
+        self.tools = {tool.name: tool for tool in tools}
+        self.memory = memory
+        self.max_steps = max_steps
+        self.max_workers = max_workers
+        self.tool_descriptions = "\n".join(f"- {tool.name}: {tool.description}" for tool in tools)
+
+    def with_memory(self, memory) -> "PlanExecuteAgent":
+        """Shallow copy sharing the LLM and tools but bound to another memory"""
+        agent = copy.copy(self)
+        agent.memory = memory
+        return agent
+
+    def invoke(self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        query = inputs["input"]
+        steps = self.plan(query, config)
+        print(f"🗺️ Plan: {len(steps)} step(s) - " + ", ".join(f"{s['id']}={s['tool']}({s['input']})" for s in steps))
+        results = self.execute(steps, config)
+        answer = self.synthesize(query, steps, results, config)
+        if self.memory is not None:
+            self.memory.save_context({"input": query}, {"output": answer})
+        return {"input": query, "output": answer, "plan": steps, "results": results}
+
+    async def ainvoke(self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Async invoke: the DAG runs as tasks on the current event loop"""
+        query = inputs["input"]
+        steps = await self.aplan(query, config)
+        print(f"🗺️ Plan: {len(steps)} step(s) - " + ", ".join(f"{s['id']}={s['tool']}({s['input']})" for s in steps))
+        results = await self.aexecute(steps, config)
+        answer = await self.asynthesize(query, steps, results, config)
+        if self.memory is not None:
+            self.memory.save_context({"input": query}, {"output": answer})
+        return {"input": query, "output": answer, "plan": steps, "results": results}
+
+    def plan(self, query: str, config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """One LLM call that returns the validated list of steps"""
+        reply = message_text(self.llm.invoke(self._plan_messages(query), config=config))
+        return self._parse_plan(reply)
+
+    async def aplan(self, query: str, config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        reply = message_text(await self.llm.ainvoke(self._plan_messages(query), config=config))
+        return self._parse_plan(reply)
+
+    def _plan_messages(self, query: str) -> List:
+        prompt = load_prompt("plan_execute_prompt.txt").format(
+            tool_descriptions=self.tool_descriptions, question=query
+        )
+        return [*self._history(), HumanMessage(content=prompt)]
+
+    def _parse_plan(self, reply: str) -> List[Dict[str, Any]]:
+        plan = parse_json_object(reply) or {}
+        raw_steps = plan.get("steps")
+
+        steps, used = [], set()
+        for index, step in enumerate(raw_steps[:self.max_steps] if isinstance(raw_steps, list) else [], 1):
+            if not isinstance(step, dict) or step.get("tool") not in self.tools:
+                continue
+            # Results are keyed by id, so a repeated id would hide one step's result behind another's
+            step_id = str(step.get("id") or "")
+            if not step_id or step_id in used:
+                step_id = f"s{index}"
+                while step_id in used:
+                    step_id += "_"
+            used.add(step_id)
+            tool_input = str(step.get("input", ""))
+            depends_on = step.get("depends_on") or []
+            if not isinstance(depends_on, list):
+                depends_on = [depends_on]
+            # A step whose input uses another step's result depends on it, listed or not
+            depends_on = [str(d) for d in depends_on if d] + PLACEHOLDER.findall(tool_input)
+            steps.append({
+                "id": step_id,
+                "tool": step["tool"],
+                "input": tool_input,
+                "depends_on": list(dict.fromkeys(depends_on)),
+            })
+        for step in steps:
+            # Unknown dependencies would block forever; drop them
+            step["depends_on"] = [d for d in step["depends_on"] if d in used and d != step["id"]]
+        return steps
+
+    def execute(self, steps: List[Dict[str, Any]], config: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """Run the DAG: every step starts as soon as all of its dependencies have finished"""
+        results: Dict[str, str] = {}
+        if not steps:
+            return results
+        pending = {step["id"]: step for step in steps}
+        running = {}
+        with ThreadPoolExecutor(max_workers=min(len(steps), self.max_workers)) as pool:
+            while pending or running:
+                ready = [s for s in pending.values() if all(d in results for d in s["depends_on"])]
+                for step in ready:
+                    del pending[step["id"]]
+                    tool_input = PLACEHOLDER.sub(lambda m: results.get(m.group(1), m.group(0)), step["input"])
+                    future = pool.submit(contextvars.copy_context().run, self._run_tool, step["tool"], tool_input, config)
+                    running[future] = step["id"]
+                if not running:
+                    # Whatever is left waits on a cycle
+                    for step_id in pending:
+                        results[step_id] = "Error: step skipped because of a dependency cycle"
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        return results
+
+    async def aexecute(self, steps: List[Dict[str, Any]], config: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """Async DAG execution with the same scheduling as execute()"""
+        results: Dict[str, str] = {}
+        pending = {step["id"]: step for step in steps}
+        running = {}
+        while pending or running:
+            ready = [s for s in pending.values() if all(d in results for d in s["depends_on"])]
+            for step in ready:
+                del pending[step["id"]]
+                tool_input = PLACEHOLDER.sub(lambda m: results.get(m.group(1), m.group(0)), step["input"])
+                task = asyncio.ensure_future(self._arun_tool(step["tool"], tool_input, config))
+                running[task] = step["id"]
+            if not running:
+                for step_id in pending:
+                    results[step_id] = "Error: step skipped because of a dependency cycle"
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[running.pop(task)] = task.result()
+        return results
+
+    def synthesize(self, query: str, steps: List[Dict[str, Any]], results: Dict[str, str],
+                   config: Optional[Dict[str, Any]] = None) -> str:
+        """One LLM call that writes the final answer from the collected results"""
+        return message_text(self.llm.invoke(self._synthesis_messages(query, steps, results), config=config))
+
+    async def asynthesize(self, query: str, steps: List[Dict[str, Any]], results: Dict[str, str],
+                          config: Optional[Dict[str, Any]] = None) -> str:
+        return message_text(await self.llm.ainvoke(self._synthesis_messages(query, steps, results), config=config))
+
+    def _synthesis_messages(self, query: str, steps: List[Dict[str, Any]], results: Dict[str, str]) -> List:
+        formatted = "\n".join(
+            f"[{s['id']}] {s['tool']}({s['input']}): {results.get(s['id'], 'no result')}" for s in steps
+        ) or "(no tools were needed)"
+        prompt = load_prompt("plan_execute_synthesis_prompt.txt").format(question=query, results=formatted)
+        return [SystemMessage(content="You are a precise financial analyst."), *self._history(),
+                HumanMessage(content=prompt)]
+
+    def _run_tool(self, name: str, tool_input: str, config: Optional[Dict[str, Any]]) -> str:
+        try:
+            return str(self.tools[name].invoke(tool_input, config=config))
+        except Exception as e:
+            return f"Error executing {name}: {str(e)}"
+
+    async def _arun_tool(self, name: str, tool_input: str, config: Optional[Dict[str, Any]]) -> str:
+        try:
+            return str(await self.tools[name].ainvoke(tool_input, config=config))
+        except Exception as e:
+            return f"Error executing {name}: {str(e)}"
+
+    def _history(self) -> List:
+        if self.memory is None:
+            return []
+        return self.memory.load_memory_variables({}).get(self.memory.memory_key, [])
@@ -0,0 +1,134 @@
+# Many conversations on one set of heavy components (LLM clients, tools, RAG index)
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class Session:
+    """Per-conversation state: just memory, a lock and bookkeeping"""
+
+    __slots__ = ("session_id", "memory", "lock", "alock", "created_at", "last_used", "queries", "size")
+
+    def __init__(self, session_id: str, memory):
+        self.session_id = session_id
+        self.memory = memory
+        self.lock = threading.Lock()
+        self.alock = asyncio.Lock()
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.queries = 0
+        self.size = 0
+
+
+def memory_size(memory) -> int:
+    """Approximate memory footprint of a conversation in characters"""
+    messages = sum(len(str(message.content)) for message in memory.chat_memory.messages)
+    return messages + len(getattr(memory, "summary", ""))
+
+
+class SessionManager:
+    """Routes queries from many sessions through one shared FinancialAgentExecutor.
+
+    Each session only owns its conversation memory. Sessions are kept in LRU order
+    and evicted when idle for too long, when there are too many, or when their
+    combined history exceeds the memory cap.
+    """
+
+    def __init__(self, executor=None, max_sessions: Optional[int] = None,
+                 idle_timeout: Optional[float] = None, max_total_chars: Optional[int] = None):
+        if executor is None:
+            from agent.agent_executor import FinancialAgentExecutor
+            executor = FinancialAgentExecutor()
+        self.executor = executor
+        self.max_sessions = max_sessions or int(os.getenv("MAX_SESSIONS", "10000"))
+        self.idle_timeout = idle_timeout or float(os.getenv("SESSION_IDLE_TIMEOUT", "1800"))
+        self.max_total_chars = max_total_chars or int(os.getenv("SESSION_MEMORY_CAP_CHARS", "50000000"))
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_chars = 0
+        self.evictions = {"idle": 0, "lru": 0, "memory_cap": 0, "closed": 0}
+
+    def process_query(self, session_id: str, user_query: str, mode: Optional[str] = None) -> Dict[str, Any]:
+        """Answer a query in the context of one session's conversation"""
+        session = self._get_session(session_id)
+        # Queries within one session run in order; different sessions run concurrently
+        with session.lock:
+            result = self.executor.process_query(user_query, mode=mode, memory=session.memory)
+            new_size = memory_size(session.memory)
+        return self._record_query(session, session_id, new_size, result)
+
+    async def aprocess_query(self, session_id: str, user_query: str, mode: Optional[str] = None) -> Dict[str, Any]:
+        """process_query for coroutines, via the executor's aprocess_query"""
+        session = self._get_session(session_id)
+        async with session.alock:
+            result = await self.executor.aprocess_query(user_query, mode=mode, memory=session.memory)
+            new_size = memory_size(session.memory)
+        return self._record_query(session, session_id, new_size, result)
+
+    def _record_query(self, session: Session, session_id: str, new_size: int, result: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            session.queries += 1
+            session.last_used = time.monotonic()
+            if self._sessions.get(session_id) is session:
+                self.total_chars += new_size - session.size
+            session.size = new_size
+            self._enforce_limits()
+        result["session_id"] = session_id
+        return result
+
+    def get_memory(self, session_id: str):
+        return self._get_session(session_id).memory
+
+    def end_session(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self.total_chars -= session.size
+            self.evictions["closed"] += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "history_chars": self.total_chars,
+                "history_chars_cap": self.max_total_chars,
+                "idle_timeout": self.idle_timeout,
+                "evictions": dict(self.evictions),
+            }
+
+    def _get_session(self, session_id: str) -> Session:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, self.executor.create_memory())
+                self._sessions[session_id] = session
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            self._enforce_limits()
+            return session
+
+    def _enforce_limits(self):
+        """Evict idle sessions, then least recently used ones over the count or memory cap"""
+        now = time.monotonic()
+        # OrderedDict is in LRU order, so idle sessions are at the front
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.idle_timeout:
+                break
+            self._evict(oldest, "idle")
+        while len(self._sessions) > self.max_sessions:
+            self._evict(next(iter(self._sessions.values())), "lru")
+        while self.total_chars > self.max_total_chars and len(self._sessions) > 1:
+            self._evict(next(iter(self._sessions.values())), "memory_cap")
+
+    def _evict(self, session: Session, reason: str):
+        del self._sessions[session.session_id]
+        self.total_chars -= session.size
+        self.evictions[reason] += 1
@@ -0,0 +1,157 @@
+# Conversation memory that compacts older turns into a running summary under a token budget
+
+import threading
+from collections import deque
+from typing import Any, Dict, List
+
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string
+from pydantic import PrivateAttr
+
+from models.usage_tracker import estimate_tokens
+
+SUMMARY_PROMPT = """Progressively summarize the conversation between a user and a financial assistant.
+Keep tickers, figures, dates and the user's goals; drop tool chatter and source lists.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:"""
+
+# Window size of the memory this replaces, used as the baseline for savings
+BASELINE_TURNS = 5
+
+
+class RollingSummaryMemory(BaseChatMemory):
+    """Keeps the last `recent_turns` exchanges verbatim and folds older ones into a summary.
+
+    Compaction runs in a background thread after save_context, so it never adds
+    latency to the turn that triggered it. load_memory_variables always fits the
+    history within `max_history_tokens`, truncating if compaction hasn't caught up.
+    """
+
+    llm: Any
+    memory_key: str = "chat_history"
+    return_messages: bool = True
+    recent_turns: int = 2
+    max_history_tokens: int = 1500
+    background: bool = True
+    summary: str = ""
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _compacting: bool = PrivateAttr(default=False)
+    # Bumped by clear(), so a compaction started on the previous conversation is discarded
+    _generation: int = PrivateAttr(default=0)
+    _baseline: Any = PrivateAttr(default_factory=lambda: deque(maxlen=BASELINE_TURNS * 2))
+    _savings: Any = PrivateAttr(default_factory=lambda: deque(maxlen=100))
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            summary = self.summary
+            messages = list(self.chat_memory.messages[-self.recent_turns * 2:]) if self.recent_turns > 0 else []
+            baseline_tokens = sum(self._baseline)
+
+        history = self._fit_budget(summary, messages)
+        history_tokens = sum(estimate_tokens(str(m.content)) for m in history)
+        with self._lock:
+            self._savings.append({
+                "history_tokens": history_tokens,
+                "baseline_tokens": baseline_tokens,
+                "saved_tokens": max(0, baseline_tokens - history_tokens),
+            })
+        if self.return_messages:
+            return {self.memory_key: history}
+        return {self.memory_key: get_buffer_string(history)}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        input_str, output_str = self._get_input_output(inputs, outputs)
+        with self._lock:
+            super().save_context(inputs, outputs)
+            self._baseline.extend([estimate_tokens(input_str), estimate_tokens(output_str)])
+            needs_compaction = len(self.chat_memory.messages) > self.recent_turns * 2 and not self._compacting
+            if needs_compaction:
+                self._compacting = True
+        if needs_compaction:
+            if self.background:
+                threading.Thread(target=self._compact, name="memory-compaction", daemon=True).start()
+            else:
+                self._compact()
+
+    def clear(self) -> None:
+        with self._lock:
+            super().clear()
+            self.summary = ""
+            self._generation += 1
+            self._baseline.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Prompt-token savings per turn versus replaying the last five exchanges verbatim"""
+        with self._lock:
+            savings = list(self._savings)
+            summary_tokens = estimate_tokens(self.summary)
+        return {
+            "summary_tokens": summary_tokens,
+            "last_turn": savings[-1] if savings else None,
+            "total_saved_tokens": sum(s["saved_tokens"] for s in savings),
+            "turns": len(savings),
+        }
+
+    def _compact(self):
+        """Fold everything older than the recent turns into the summary"""
+        try:
+            with self._lock:
+                cutoff = len(self.chat_memory.messages) - self.recent_turns * 2
+                older = list(self.chat_memory.messages[:cutoff])
+                summary = self.summary
+                generation = self._generation
+            if not older:
+                return
+            prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", new_lines=get_buffer_string(older))
+            response = self.llm.invoke(prompt)
+            new_summary = getattr(response, "content", response)
+            if isinstance(new_summary, list):
+                new_summary = "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in new_summary)
+            with self._lock:
+                if self._generation != generation:
+                    # Cleared while summarizing: the summary and cutoff belong to a conversation that is gone
+                    return
+                # Otherwise only appends happen meanwhile, so the summarized messages are still at the front
+                remaining = self.chat_memory.messages[len(older):]
+                self.chat_memory.clear()
+                self.chat_memory.add_messages(remaining)
+                self.summary = str(new_summary).strip()
+        except Exception as e:
+            print(f"⚠️ Memory compaction failed: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _fit_budget(self, summary: str, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Hard cap: trim long messages, drop the oldest verbatim turns, then trim the summary"""
+        budget_chars = self.max_history_tokens * 4
+        per_message_chars = budget_chars // max(len(messages) + 1, 2)
+        trimmed = [self._truncate(m, per_message_chars) for m in messages]
+
+        used = sum(len(str(m.content)) for m in trimmed)
+        while trimmed and used > budget_chars:
+            used -= len(str(trimmed.pop(0).content))
+
+        history = []
+        room = budget_chars - used
+        if summary and room > 0:
+            history.append(SystemMessage(content=f"Summary of earlier conversation: {summary[:room]}"))
+        return history + trimmed
+
+    @staticmethod
+    def _truncate(message: BaseMessage, max_chars: int) -> BaseMessage:
+        content = str(message.content)
+        if len(content) <= max_chars:
+            return message
+        return message.model_copy(update={"content": content[:max_chars] + " …[truncated]"})
@@ -0,0 +1,115 @@
+# In-process TTL + LRU cache for agent tool results
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Freshness per tool in seconds: prices move fast, filings don't
+DEFAULT_TOOL_TTLS = {
+    "StockPrice": 15,
+    "DividendYield": 6 * 3600,
+    "EarningsReport": 6 * 3600,
+    "CompanyNews": 300,
+    "DocumentSearch": 3600,
+    "TechnicalIndicators": 900,
+}
+
+
+def tool_ttls_from_env() -> Dict[str, float]:
+    """Default TTLs, overridable per tool with e.g. TOOL_CACHE_TTL_STOCKPRICE=30"""
+    return {
+        name: float(os.getenv(f"TOOL_CACHE_TTL_{name.upper()}", str(ttl)))
+        for name, ttl in DEFAULT_TOOL_TTLS.items()
+    }
+
+
+class ToolResultCache:
+    """Thread-safe result cache keyed by (tool, input) with per-tool TTLs and LRU eviction"""
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 512):
+        self.ttls = ttls if ttls is not None else tool_ttls_from_env()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+
+    def get(self, tool: str, tool_input: str) -> Optional[Any]:
+        key = (tool, self._normalize(tool_input))
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.setdefault(tool, {"hits": 0, "misses": 0})
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                stats["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            stats["misses"] += 1
+            return None
+
+    def set(self, tool: str, tool_input: str, value: Any):
+        ttl = self.ttls.get(tool, 0)
+        if ttl <= 0:
+            return
+        key = (tool, self._normalize(tool_input))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def wrap(self, tool: str, func: Callable[[str], Any],
+             should_cache: Callable[[Any], bool] = lambda result: True) -> Callable[[str], Any]:
+        """Cache a single-input tool function; results failing should_cache are not stored"""
+        @wraps(func)
+        def cached(tool_input: str):
+            result = self.get(tool, tool_input)
+            if result is not None:
+                return result
+            result = func(tool_input)
+            if should_cache(result):
+                self.set(tool, tool_input, result)
+            return result
+        return cached
+
+    def awrap(self, tool: str, func: Callable[[str], Awaitable[Any]],
+              should_cache: Callable[[Any], bool] = lambda result: True) -> Callable[[str], Awaitable[Any]]:
+        """Async counterpart of wrap(); sync and async callers share the same entries"""
+        @wraps(func)
+        async def cached(tool_input: str):
+            result = self.get(tool, tool_input)
+            if result is not None:
+                return result
+            result = await func(tool_input)
+            if should_cache(result):
+                self.set(tool, tool_input, result)
+            return result
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, evictions and hit rate per tool"""
+        with self._lock:
+            per_tool = {}
+            for tool, counts in self._stats.items():
+                lookups = counts["hits"] + counts["misses"]
+                per_tool[tool] = {**counts, "hit_rate": round(counts["hits"] / lookups, 3) if lookups else 0.0}
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "tools": per_tool,
+            }
+
+    @staticmethod
+    def _normalize(tool_input: str) -> str:
+        return " ".join(str(tool_input).split()).lower()
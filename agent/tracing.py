@@ -0,0 +1,241 @@
+# Structured per-query tracing of LLM calls, tool calls, retrieval and HTTP requests
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from models.usage_tracker import estimate_tokens
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """All spans recorded while answering one query"""
+
+    def __init__(self, query: str):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.duration: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, span: Dict[str, Any]):
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self) -> Dict[str, float]:
+        """Seconds spent per span category (nested spans overlap their parents)"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span["category"]] = round(totals.get(span["category"], 0.0) + span["duration"], 4)
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start"])
+        return {
+            "trace_id": self.trace_id,
+            "query": self.query,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "breakdown": self.breakdown(),
+            "spans": spans,
+        }
+
+    def to_chrome_events(self, pid: int = 1) -> List[Dict[str, Any]]:
+        """Complete ("X") events for chrome://tracing / Perfetto"""
+        base_us = self.started_at * 1_000_000
+        with self._lock:
+            spans = list(self.spans)
+        events = [{
+            "name": f"query: {self.query[:60]}", "cat": "query", "ph": "X", "pid": pid, "tid": "query",
+            "ts": base_us, "dur": (self.duration or 0) * 1_000_000, "args": {"trace_id": self.trace_id},
+        }]
+        for span in spans:
+            events.append({
+                "name": span["name"], "cat": span["category"], "ph": "X", "pid": pid, "tid": span["thread"],
+                "ts": base_us + span["start"] * 1_000_000, "dur": span["duration"] * 1_000_000,
+                "args": span["attributes"],
+            })
+        return events
+
+
+class Tracer:
+    """Keeps the most recent traces and records spans into the active one"""
+
+    def __init__(self, max_traces: int = 50):
+        self.max_traces = max_traces
+        self.traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.handler = TracingCallbackHandler(self)
+
+    @contextmanager
+    def trace(self, query: str):
+        """Make a new trace current for everything run inside the block"""
+        trace = Trace(query)
+        with self._lock:
+            self.traces[trace.trace_id] = trace
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            trace.duration = round(time.perf_counter() - trace.start, 4)
+            _current_trace.reset(token)
+
+    @contextmanager
+    def span(self, name: str, category: str, **attributes):
+        """Manually timed span (HTTP requests, fast path, ...); no-op outside a trace"""
+        trace = _current_trace.get()
+        if trace is None:
+            yield attributes
+            return
+        span_id = uuid.uuid4().hex[:8]
+        parent = _current_span.get()
+        token = _current_span.set(span_id)
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except Exception as e:
+            attributes["error"] = str(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.record(trace, span_id, parent, name, category, start, time.perf_counter(), attributes)
+
+    def record(self, trace: Trace, span_id: str, parent: Optional[str], name: str, category: str,
+               start: float, end: float, attributes: Dict[str, Any]):
+        trace.add_span({
+            "span_id": span_id,
+            "parent_id": parent,
+            "name": name,
+            "category": category,
+            "start": round(start - trace.start, 6),
+            "duration": round(end - start, 6),
+            "thread": threading.current_thread().name,
+            "attributes": attributes,
+        })
+
+    def get(self, trace_id: Optional[str] = None) -> Optional[Trace]:
+        """A trace by id, or the most recent one"""
+        with self._lock:
+            if trace_id:
+                return self.traces.get(trace_id)
+            return next(reversed(self.traces.values()), None)
+
+    def export_json(self, path: str, trace_id: Optional[str] = None) -> int:
+        """Write one trace (or all retained traces) as JSON; returns the number written"""
+        traces = self._select(trace_id)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([t.to_dict() for t in traces], f, indent=2, default=str)
+        return len(traces)
+
+    def export_chrome_trace(self, path: str, trace_id: Optional[str] = None) -> int:
+        """Write traces in Chrome trace-event format (open in chrome://tracing or Perfetto)"""
+        traces = self._select(trace_id)
+        events = [event for t in traces for event in t.to_chrome_events()]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+        return len(traces)
+
+    def _select(self, trace_id: Optional[str]) -> List[Trace]:
+        if trace_id:
+            trace = self.get(trace_id)
+            return [trace] if trace else []
+        with self._lock:
+            return list(self.traces.values())
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain run events into spans of the active trace"""
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._runs: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, parent_run_id, name: str, category: str, **attributes):
+        trace = _current_trace.get()
+        if trace is None:
+            return
+        with self._lock:
+            self._runs[run_id] = {
+                "trace": trace, "name": name, "category": category, "start": time.perf_counter(),
+                "parent": str(parent_run_id)[:8] if parent_run_id else _current_span.get(),
+                "attributes": attributes,
+            }
+
+    def _end(self, run_id, **attributes):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        run["attributes"].update(attributes)
+        self.tracer.record(run["trace"], str(run_id)[:8], run["parent"], run["name"], run["category"],
+                           run["start"], time.perf_counter(), run["attributes"])
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        prompt = "\n".join(str(m.content) for batch in messages for m in batch)
+        self._start(run_id, parent_run_id, self._model_name(serialized, kwargs), "llm",
+                    prompt_tokens=estimate_tokens(prompt))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, self._model_name(serialized, kwargs), "llm",
+                    prompt_tokens=estimate_tokens("\n".join(prompts)))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        completion = "".join(g.text for generations in response.generations for g in generations)
+        attributes = {"completion_tokens": estimate_tokens(completion)}
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    attributes = {"prompt_tokens": usage.get("input_tokens", 0),
+                                  "completion_tokens": usage.get("output_tokens", 0)}
+        self._end(run_id, **attributes)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name", "tool")
+        # handle_parsing_errors feeds unparseable LLM output back through an "_Exception" tool
+        category = "parse_retry" if name == "_Exception" else "tool"
+        self._start(run_id, parent_run_id, name, category, input=str(input_str)[:200])
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, output_chars=len(str(output)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "retriever", "retrieval", query=str(query)[:200])
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    @staticmethod
+    def _model_name(serialized, kwargs) -> str:
+        params = kwargs.get("invocation_params") or {}
+        return params.get("model") or params.get("model_name") or (serialized or {}).get("name", "llm")
+
+
+# Global tracer shared by all agents in the process
+tracer = Tracer(max_traces=int(os.getenv("TRACE_HISTORY", "50")))
@@ -0,0 +1,121 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
+from dotenv import load_dotenv
+from typing import Optional
+import os
+import uuid
+import uvicorn
+from contextlib import asynccontextmanager
+
+# Load environment variables
+load_dotenv()
+
+from agent.admission import AdmissionController, DeadlineExceeded, Overloaded
+from agent.agent_executor import FinancialAgentExecutor
+from agent.session_manager import SessionManager
+from tools.http_client import http_client
+
+# Application settings
+SERVICE_PORT = int(os.getenv("AGENT_SERVICE_PORT", "8100"))
+HOST = os.getenv("AGENT_SERVICE_HOST", "0.0.0.0")
+AGENT_MODES = ("auto", "react", "parallel", "plan")
+
+class QueryRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None
+    mode: Optional[str] = None
+    timeout: Optional[float] = None  # Seconds; can shorten but not extend AGENT_REQUEST_TIMEOUT
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the shared agent once; every request reuses it"""
+    print("🚀 Starting Financial Agent Service...")
+    app.state.sessions = SessionManager(FinancialAgentExecutor())
+    app.state.admission = AdmissionController()
+    print(f"🚦 Admission: {app.state.admission.max_concurrency} concurrent, "
+          f"{app.state.admission.max_queue} queued, {app.state.admission.default_timeout:.0f}s deadline")
+
+    yield
+
+    # Cleanup
+    await http_client.aclose()
+
+# Create FastAPI app with lifecycle management
+app = FastAPI(
+    title="Financial Copilot Agent Service",
+    description="FinancialAgentExecutor over HTTP with admission control and load shedding",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.post("/query")
+async def query(request: QueryRequest):
+    """Answer a query; 503 when the queue is full, 504 when the deadline passes"""
+    if request.mode and request.mode not in AGENT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported mode {request.mode}. Use one of {', '.join(AGENT_MODES)}")
+    session_id = request.session_id or uuid.uuid4().hex
+    admission = app.state.admission
+
+    try:
+        result = await admission.run(
+            lambda: app.state.sessions.aprocess_query(session_id, request.query, mode=request.mode),
+            timeout=request.timeout
+        )
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+    if result.get("status") == "error":
+        raise HTTPException(status_code=500, detail=result.get("answer"))
+    return result
+
+@app.delete("/sessions/{session_id}")
+async def end_session(session_id: str):
+    """Drop a conversation's memory"""
+    if not app.state.sessions.end_session(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown session {session_id}")
+    return {"session_id": session_id, "status": "closed"}
+
+@app.get("/stats")
+async def stats():
+    """Queue depth, in-flight count, shed/timeout counts, latency percentiles and sessions"""
+    return {
+        "admission": app.state.admission.stats(),
+        "sessions": app.state.sessions.stats(),
+    }
+
+# Health check endpoint for the load balancer
+@app.get("/")
+async def root():
+    """Service health check"""
+    admission = app.state.admission
+    return {
+        "message": "Financial Copilot Agent Service is running",
+        "status": "healthy",
+        "warmup_status": app.state.sessions.executor.warmup_status,
+        "accepting": admission.has_capacity(),
+        "version": "1.0.0"
+    }
+
+if __name__ == "__main__":
+    print("🚀 Starting Financial Copilot Agent Service...")
+    print(f"📍 Service will run on: http://localhost:{SERVICE_PORT}")
+    print(f"📚 API docs will be at: http://localhost:{SERVICE_PORT}/docs")
+
+    # Run the server
+    uvicorn.run(
+        app,
+        host=HOST,
+        port=SERVICE_PORT,
+        log_level="info"
+    )
@@ -0,0 +1,221 @@
+# Vectorized technical indicators over (symbols x days) price matrices
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Default lookback in bars for indicators named without one (e.g. "rsi" means "rsi_14")
+DEFAULT_PERIODS = {"sma": 20, "ema": 20, "rsi": 14, "bollinger": 20, "atr": 14, "volatility": 20}
+TRADING_DAYS_PER_YEAR = 252
+
+INDICATOR_NAME = re.compile(r"^(sma|ema|rsi|macd|bollinger|atr|volatility)(?:_(\d+))?$")
+
+
+def _shift(x: np.ndarray, bars: int = 1) -> np.ndarray:
+    """x moved `bars` steps later along the time axis, NaN-filled at the start"""
+    shifted = np.empty_like(x)
+    shifted[..., :bars] = np.nan
+    shifted[..., bars:] = x[..., :-bars]
+    return shifted
+
+
+def _diff(x: np.ndarray) -> np.ndarray:
+    """Change from the previous bar, NaN at the start"""
+    change = np.empty_like(x)
+    change[..., :1] = np.nan
+    np.subtract(x[..., 1:], x[..., :-1], out=change[..., 1:])
+    return change
+
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """Sum over the trailing `window` bars; NaN where the window is incomplete or holds a NaN"""
+    if window > x.shape[-1]:
+        return np.full_like(x, np.nan)
+    valid = ~np.isnan(x)
+    complete = valid.all()
+    sums = np.cumsum(x if complete else np.where(valid, x, 0.0), axis=-1)
+    result = np.empty_like(x)
+    result[..., :window - 1] = np.nan
+    result[..., window - 1] = sums[..., window - 1]
+    np.subtract(sums[..., window:], sums[..., :-window], out=result[..., window:])
+    if complete:
+        return result
+    if (valid[..., 1:] >= valid[..., :-1]).all():
+        # NaNs only before each row's first bar (shorter histories): blank a prefix per row
+        ready = np.asarray(np.argmax(valid, axis=-1) + window - 1)
+        ready[~valid[..., -1]] = x.shape[-1]
+        limit = int(ready.max())
+        result[..., :limit][np.arange(limit) < ready[..., None]] = np.nan
+    else:
+        counts = np.cumsum(valid, axis=-1, dtype=np.int32)
+        window_counts = counts[..., window - 1:].copy()
+        window_counts[..., 1:] -= counts[..., :-window]
+        result[..., window - 1:][window_counts < window] = np.nan
+    return result
+
+
+def _ewm_time_major(series: np.ndarray, alpha: float, warmup: int) -> np.ndarray:
+    """Exponentially weighted mean down axis 0 of a C-contiguous (time, ...) array.
+
+    Each row starts at its first valid value; the first `warmup` - 1 values
+    after that are NaN because the average has not settled yet. Every step
+    reads and writes one contiguous slice, and once all rows have warmed up a
+    step without gaps is three in-place array ops.
+    """
+    steps_with_gaps = np.isnan(series).any(axis=tuple(range(1, series.ndim))).tolist()
+    result = np.empty_like(series)
+    state = np.full(series.shape[1:], np.nan)
+    seen = np.zeros(series.shape[1:], dtype=np.int64)
+    warm = False
+    for t in range(len(series)):
+        value = series[t]
+        if warm and not steps_with_gaps[t]:
+            out = result[t, ...]
+            np.subtract(value, state, out=out)
+            out *= alpha
+            out += state
+            state = out
+            continue
+        # Rows start at their first valid value; gaps carry the previous state forward
+        valid = ~np.isnan(value)
+        updated = np.where(np.isnan(state), value, state + alpha * (value - state))
+        state = np.where(valid, updated, state)
+        if warm:
+            result[t] = state
+        else:
+            seen += valid
+            result[t] = np.where(seen >= warmup, state, np.nan)
+            warm = bool((seen >= warmup).all())
+    return result
+
+
+def _ewm(x: np.ndarray, alpha: float, warmup: int) -> np.ndarray:
+    """Exponentially weighted mean along the last axis (returned as a view of a time-major array)"""
+    series = np.ascontiguousarray(np.moveaxis(x, -1, 0))
+    return np.moveaxis(_ewm_time_major(series, alpha, warmup), 0, -1)
+
+
+def sma(close: np.ndarray, period: int = 20) -> np.ndarray:
+    result = _rolling_sum(close, period)
+    result /= period
+    return result
+
+
+def ema(close: np.ndarray, period: int = 20) -> np.ndarray:
+    return _ewm(close, 2.0 / (period + 1), period)
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Wilder's RSI (0-100)"""
+    change = np.moveaxis(_diff(close), -1, 0)
+    # Gains and losses go straight into one time-major array and share a pass through the loop
+    moves = np.empty((change.shape[0], 2) + change.shape[1:])
+    np.maximum(change, 0.0, out=moves[:, 0])
+    np.minimum(change, 0.0, out=moves[:, 1])
+    np.negative(moves[:, 1], out=moves[:, 1])
+    averages = _ewm_time_major(moves, 1.0 / period, period)
+    average_gain, average_loss = np.moveaxis(averages[:, 0], 0, -1), np.moveaxis(averages[:, 1], 0, -1)
+    total = average_gain + average_loss
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = np.divide(average_gain, total)
+    value *= 100
+    # Neither gains nor losses (a flat series) is neutral, not overbought
+    value[total == 0] = 50.0
+    return value
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    line = ema(close, fast)
+    line -= ema(close, slow)
+    signal_line = _ewm(line, 2.0 / (signal + 1), signal)
+    return {"macd": line, "macd_signal": signal_line, "macd_hist": line - signal_line}
+
+
+def bollinger(close: np.ndarray, period: int = 20, width: float = 2.0) -> Dict[str, np.ndarray]:
+    middle = sma(close, period)
+    deviation = _rolling_sum(close * close, period)
+    deviation /= period
+    deviation -= middle * middle
+    np.maximum(deviation, 0.0, out=deviation)
+    np.sqrt(deviation, out=deviation)
+    deviation *= width
+    return {"bb_middle": middle, "bb_upper": middle + deviation, "bb_lower": middle - deviation}
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Wilder's average true range"""
+    previous = _shift(close)
+    true_range = high - low
+    np.fmax(true_range, np.abs(high - previous), out=true_range)
+    np.fmax(true_range, np.abs(low - previous), out=true_range)
+    return _ewm(true_range, 1.0 / period, period)
+
+
+def volatility(close: np.ndarray, period: int = 20) -> np.ndarray:
+    """Annualized standard deviation of daily log returns over the trailing `period` bars"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = _diff(np.log(close))
+    mean = _rolling_sum(returns, period)
+    mean /= period
+    variance = _rolling_sum(returns * returns, period)
+    variance /= period
+    mean *= mean
+    variance -= mean
+    np.maximum(variance, 0.0, out=variance)
+    variance *= TRADING_DAYS_PER_YEAR * period / (period - 1)
+    return np.sqrt(variance, out=variance)
+
+
+def parse_indicators(names: List[str]) -> List[Tuple[str, str, Optional[int]]]:
+    """["rsi", "sma_50", "macd"] -> [(label, kind, period)]; raises ValueError for unknown names"""
+    parsed = []
+    for name in names:
+        match = INDICATOR_NAME.match(name.strip().lower())
+        if match is None:
+            raise ValueError(f"Unknown indicator '{name}' (use sma, ema, rsi, macd, bollinger, atr or volatility, "
+                             f"optionally with a period such as sma_50)")
+        kind = match.group(1)
+        period = int(match.group(2)) if match.group(2) else DEFAULT_PERIODS.get(kind)
+        if period is not None and period < 2:
+            raise ValueError(f"Period of '{name}' must be at least 2")
+        parsed.append((kind if kind == "macd" else f"{kind}_{period}", kind, period))
+    return parsed
+
+
+def compute(bars: Dict[str, np.ndarray], names: List[str]) -> Dict[str, np.ndarray]:
+    """Indicators for every row of `bars` (close, plus high/low for ATR), each shaped like bars["close"].
+
+    Multi-line indicators expand into several outputs (macd, macd_signal,
+    macd_hist; bb_middle, bb_upper, bb_lower suffixed with the period).
+    """
+    close = np.asarray(bars["close"], dtype=np.float64)
+    single: Dict[str, Callable[[int], np.ndarray]] = {
+        "sma": lambda period: sma(close, period),
+        "ema": lambda period: ema(close, period),
+        "rsi": lambda period: rsi(close, period),
+        "volatility": lambda period: volatility(close, period),
+        "atr": lambda period: atr(np.asarray(bars["high"], dtype=np.float64),
+                                  np.asarray(bars["low"], dtype=np.float64), close, period),
+    }
+    results = {}
+    for label, kind, period in parse_indicators(names):
+        if kind == "macd":
+            results.update(macd(close))
+        elif kind == "bollinger":
+            results.update({f"{name}_{period}": values for name, values in bollinger(close, period).items()})
+        else:
+            results[label] = single[kind](period)
+    return results
+
+
+def align(series: Dict[str, Dict[str, np.ndarray]], columns=("high", "low", "close")) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Stack per-symbol columns onto one shared date axis: (dates, {column: symbols x dates}), NaN where missing"""
+    dates = np.unique(np.concatenate([bars["date"] for bars in series.values()])) if series else \
+        np.array([], dtype="datetime64[D]")
+    stacked = {name: np.full((len(series), len(dates)), np.nan) for name in columns}
+    for row, bars in enumerate(series.values()):
+        positions = np.searchsorted(dates, bars["date"])
+        for name in columns:
+            stacked[name][row, positions] = bars[name]
+    return dates, stacked
@@ -0,0 +1,120 @@
+# In-process TTL cache in front of the API server's upstream calls, with single-flight coalescing
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Freshness per endpoint in seconds
+DEFAULT_ENDPOINT_TTLS = {
+    "stock": 15,
+    "earnings": 6 * 3600,
+    "news": 300,
+    "dividend": 6 * 3600,
+}
+
+
+def endpoint_ttls_from_env() -> Dict[str, float]:
+    """Default TTLs, overridable per endpoint with e.g. API_CACHE_TTL_STOCK=30"""
+    return {
+        name: float(os.getenv(f"API_CACHE_TTL_{name.upper()}", str(ttl)))
+        for name, ttl in DEFAULT_ENDPOINT_TTLS.items()
+    }
+
+
+class UpstreamCache:
+    """TTL + LRU cache of upstream responses keyed by (endpoint, key).
+
+    Concurrent misses for the same key share one in-flight fetch instead of each
+    calling the upstream API. The fetch runs as its own task, so a client that
+    disconnects does not cancel it for the others. Meant for a single event loop.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 2048):
+        self.ttls = ttls if ttls is not None else endpoint_ttls_from_env()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+
+    async def get_or_fetch(self, endpoint: str, key: str, fetch: Callable[[], Awaitable[Any]],
+                           should_cache: Callable[[Any], bool] = lambda value: True) -> Any:
+        """Cached value, the result of an identical fetch already in flight, or a new fetch"""
+        value = self.peek(endpoint, key)
+        if value is not None:
+            return value
+        cache_key = (endpoint, key)
+        task = self._inflight.get(cache_key)
+        if task is not None:
+            self._stat(endpoint)["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(fetch())
+        self._inflight[cache_key] = task
+        task.add_done_callback(lambda done: self._finish(endpoint, key, done, should_cache))
+        return await asyncio.shield(task)
+
+    def peek(self, endpoint: str, key: str) -> Optional[Any]:
+        """Fresh cached value or None; counts as a hit or a miss"""
+        cache_key = (endpoint, key)
+        stats = self._stat(endpoint)
+        entry = self._entries.get(cache_key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(cache_key)
+            stats["hits"] += 1
+            return entry[1]
+        if entry is not None:
+            del self._entries[cache_key]
+        stats["misses"] += 1
+        return None
+
+    def put(self, endpoint: str, key: str, value: Any):
+        ttl = self.ttls.get(endpoint, 0)
+        if ttl <= 0:
+            return
+        cache_key = (endpoint, key)
+        now = time.monotonic()
+        self._entries[cache_key] = (now + ttl, value, now)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def age(self, endpoint: str, key: str) -> float:
+        """Seconds since the cached value was fetched (0 when it is not cached)"""
+        entry = self._entries.get((endpoint, key))
+        return time.monotonic() - entry[2] if entry is not None else 0.0
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, evictions, and hit ratio and coalesced requests per endpoint"""
+        per_endpoint = {}
+        for endpoint, counts in self._stats.items():
+            lookups = counts["hits"] + counts["misses"]
+            per_endpoint[endpoint] = {
+                **counts,
+                "fetched": counts["misses"] - counts["coalesced"],
+                "hit_ratio": round(counts["hits"] / lookups, 3) if lookups else 0.0,
+            }
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "in_flight": len(self._inflight),
+            "evictions": self.evictions,
+            "endpoints": per_endpoint,
+        }
+
+    def _finish(self, endpoint: str, key: str, task: asyncio.Task, should_cache: Callable[[Any], bool]):
+        self._inflight.pop((endpoint, key), None)
+        # Reading the exception marks it retrieved even if every waiter went away
+        if task.cancelled() or task.exception() is not None:
+            return
+        if should_cache(task.result()):
+            self.put(endpoint, key, task.result())
+
+    def _stat(self, endpoint: str) -> Dict[str, int]:
+        return self._stats.setdefault(endpoint, {"hits": 0, "misses": 0, "coalesced": 0})
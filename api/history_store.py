@@ -0,0 +1,238 @@
+# Local columnar store of daily OHLCV bars: one memory-mapped NumPy array per column per symbol
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import time
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+INTERVALS = ("1day", "1week", "1month")
+
+# Symbols become directory names, so only ticker characters are allowed (BRK.B, RDS-A)
+SYMBOL_PATTERN = re.compile(r"[A-Z0-9.\-]{1,10}")
+
+# Fetches daily bars for [start, end]: rows of {"datetime": "YYYY-MM-DD", "open": ..., ..., "volume": ...}
+FetchBars = Callable[[str, date, date], Awaitable[List[Dict[str, Any]]]]
+
+
+class InvalidSymbol(ValueError):
+    """A symbol that is not a ticker and would not name a directory under the store root"""
+
+
+def validate_symbol(symbol: str) -> str:
+    """The symbol itself if it is a ticker; raises InvalidSymbol otherwise (including "." and "..")"""
+    if not SYMBOL_PATTERN.fullmatch(symbol) or symbol in (".", ".."):
+        raise InvalidSymbol(f"Invalid ticker symbol: {symbol!r}")
+    return symbol
+
+
+def _day(value: date) -> np.datetime64:
+    return np.datetime64(value.isoformat(), "D")
+
+
+def _rows_to_columns(rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    columns = {"date": np.array([row["datetime"][:10] for row in rows], dtype="datetime64[D]")}
+    for name in COLUMNS:
+        columns[name] = np.array([float(row.get(name) or 0.0) for row in rows], dtype=np.float64)
+    return columns
+
+
+def resample(columns: Dict[str, np.ndarray], interval: str) -> Dict[str, np.ndarray]:
+    """Aggregate daily bars into weekly (Monday-start) or monthly bars, labelled by period start"""
+    if interval == "1day" or len(columns["date"]) == 0:
+        return columns
+    days = columns["date"].astype(np.int64)
+    if interval == "1week":
+        # 1970-01-01 was a Thursday: shifting by 3 days makes each group run Monday to Sunday
+        keys = (days + 3) // 7
+        labels = (keys * 7 - 3).astype("datetime64[D]")
+    else:
+        keys = columns["date"].astype("datetime64[M]").astype(np.int64)
+        labels = keys.astype("datetime64[M]").astype("datetime64[D]")
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    ends = np.append(starts[1:], len(keys)) - 1
+    return {
+        "date": labels[starts],
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends],
+        "volume": np.add.reduceat(columns["volume"], starts),
+    }
+
+
+class HistoryStore:
+    """Daily bars per symbol under root/SYMBOL/, one .npy file per column plus meta.json.
+
+    meta.json records the calendar range already fetched (weekends and holidays
+    included), so a request only goes upstream for dates outside that range.
+    Today is never marked covered because its bar is still changing; it is
+    refetched at most every tail_ttl seconds. Reads are memory-mapped and
+    sliced with a binary search on the date column.
+    """
+
+    def __init__(self, root: str, fetch: FetchBars, tail_ttl: float = 900, max_span_days: int = 7000):
+        self.root = root
+        self.fetch = fetch
+        self.tail_ttl = tail_ttl
+        self.max_span_days = max_span_days
+        self._columns: Dict[str, Dict[str, np.ndarray]] = {}
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.counts = {"queries": 0, "backfills": 0, "upstream_requests": 0, "bars_fetched": 0}
+        self.query_seconds = 0.0
+
+    async def ensure(self, symbol: str, start: date, end: date) -> int:
+        """Fetch whatever part of [start, end] is not stored yet; returns the number of new bars"""
+        validate_symbol(symbol)
+        # There are no bars after today, and recording a range that starts later would invert the coverage
+        end = min(end, date.today())
+        if start > end:
+            return 0
+        lock = self._locks.setdefault(symbol, asyncio.Lock())
+        async with lock:
+            missing = self.missing_ranges(symbol, start, end)
+            if not missing:
+                return 0
+            fetched = []
+            for span_start, span_end in missing:
+                for chunk_start, chunk_end in self._spans(span_start, span_end):
+                    self.counts["upstream_requests"] += 1
+                    fetched.extend(await self.fetch(symbol, chunk_start, chunk_end))
+            meta = self.meta(symbol)
+            covered_start = min([start] + ([date.fromisoformat(meta["start"])] if meta else []))
+            covered_end = max([min(end, date.today() - timedelta(days=1))] +
+                              ([date.fromisoformat(meta["end"])] if meta else []))
+            self._write(symbol, _rows_to_columns(fetched) if fetched else None, covered_start, covered_end)
+            self.counts["backfills"] += 1
+            self.counts["bars_fetched"] += len(fetched)
+            print(f"📥 History {symbol}: fetched {len(fetched)} bars for "
+                  f"{', '.join(f'{a}..{b}' for a, b in missing)}")
+            return len(fetched)
+
+    def missing_ranges(self, symbol: str, start: date, end: date) -> List[Tuple[date, date]]:
+        meta = self.meta(symbol)
+        if meta is None:
+            return [(start, end)]
+        covered_start, covered_end = date.fromisoformat(meta["start"]), date.fromisoformat(meta["end"])
+        # The covered range stays contiguous: a request beyond either edge also fills the gap up to it
+        missing = []
+        if start < covered_start:
+            missing.append((start, covered_start - timedelta(days=1)))
+        recently_updated = time.time() - meta["updated"] < self.tail_ttl
+        if end > covered_end and not (covered_end >= date.today() - timedelta(days=1) and recently_updated):
+            missing.append((covered_end + timedelta(days=1), end))
+        return missing
+
+    def query(self, symbol: str, start: date, end: date, interval: str = "1day") -> Dict[str, np.ndarray]:
+        """Stored bars with start <= date <= end, resampled to interval (views into the memory map for 1day)"""
+        start_time = time.perf_counter()
+        columns = self._load(symbol)
+        if columns is None:
+            result = {name: np.array([], dtype="datetime64[D]" if name == "date" else np.float64)
+                      for name in ("date",) + COLUMNS}
+        else:
+            lo = np.searchsorted(columns["date"], _day(start), side="left")
+            hi = np.searchsorted(columns["date"], _day(end), side="right")
+            result = resample({name: values[lo:hi] for name, values in columns.items()}, interval)
+        self.counts["queries"] += 1
+        self.query_seconds += time.perf_counter() - start_time
+        return result
+
+    def meta(self, symbol: str) -> Optional[Dict[str, Any]]:
+        if symbol not in self._meta:
+            path = os.path.join(self._directory(symbol), "meta.json")
+            if not os.path.exists(path):
+                return None
+            with open(path) as f:
+                self._meta[symbol] = json.load(f)
+        return self._meta[symbol]
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if SYMBOL_PATTERN.fullmatch(name) and os.path.exists(os.path.join(self.root, name, "meta.json")))
+
+    def stats(self) -> Dict[str, Any]:
+        per_symbol, total_bytes = {}, 0
+        for symbol in self.symbols():
+            directory = self._directory(symbol)
+            size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+            total_bytes += size
+            meta = self.meta(symbol)
+            per_symbol[symbol] = {"bars": meta["bars"], "start": meta["start"], "end": meta["end"], "bytes": size}
+        queries = self.counts["queries"]
+        return {
+            "root": self.root,
+            "symbols": len(per_symbol),
+            "bytes": total_bytes,
+            **self.counts,
+            "avg_query_us": round(self.query_seconds / queries * 1e6, 1) if queries else None,
+            "per_symbol": per_symbol,
+        }
+
+    def _spans(self, start: date, end: date):
+        """Split a range so no single upstream request asks for more than max_span_days"""
+        while start <= end:
+            span_end = min(end, start + timedelta(days=self.max_span_days - 1))
+            yield start, span_end
+            start = span_end + timedelta(days=1)
+
+    def _directory(self, symbol: str) -> str:
+        return os.path.join(self.root, validate_symbol(symbol))
+
+    def _load(self, symbol: str) -> Optional[Dict[str, np.ndarray]]:
+        if symbol not in self._columns:
+            directory = self._directory(symbol)
+            if not os.path.exists(os.path.join(directory, "date.npy")):
+                return None
+            self._columns[symbol] = {
+                name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in ("date",) + COLUMNS
+            }
+        return self._columns[symbol]
+
+    def _write(self, symbol: str, new: Optional[Dict[str, np.ndarray]], covered_start: date, covered_end: date):
+        """Merge new bars (newer values win for the same date) and replace the symbol's files atomically"""
+        existing = self._load(symbol)
+        if existing is not None and new is not None:
+            merged = {name: np.concatenate([new[name], existing[name]]) for name in new}
+        else:
+            merged = new if new is not None else existing
+        if merged is not None:
+            # np.unique keeps the first occurrence, which is the newly fetched bar
+            _, first = np.unique(merged["date"], return_index=True)
+            merged = {name: np.ascontiguousarray(values[first]) for name, values in merged.items()}
+
+        directory = self._directory(symbol)
+        staging = directory + ".tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging, exist_ok=True)
+        if merged is not None:
+            for name, values in merged.items():
+                np.save(os.path.join(staging, f"{name}.npy"), values)
+        meta = {
+            "start": covered_start.isoformat(),
+            "end": covered_end.isoformat(),
+            "bars": int(len(merged["date"])) if merged is not None else 0,
+            "updated": time.time(),
+        }
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        # Drop the memory maps before replacing the files they map (required on Windows)
+        self._columns.pop(symbol, None)
+        existing = merged = None
+        backup = directory + ".old"
+        shutil.rmtree(backup, ignore_errors=True)
+        if os.path.exists(directory):
+            os.replace(directory, backup)
+        os.replace(staging, directory)
+        shutil.rmtree(backup, ignore_errors=True)
+        self._meta[symbol] = meta
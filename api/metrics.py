@@ -0,0 +1,211 @@
+# Prometheus-format metrics for the API server: request and upstream latency histograms, gauges, loop lag
+
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; covers cache hits (sub-millisecond) up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _series(name: str, labels: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{label}="{_escape(value)}"' for label, value in zip(labels, values)]
+    if extra:
+        pairs.append(extra)
+    return f"{name}{{{','.join(pairs)}}}" if pairs else name
+
+
+class Counter:
+    """Monotonic counter per label combination. Updates are plain dict operations
+    (no locks): the API server records metrics from a single event loop.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1.0):
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        for label_values, value in self.values.items():
+            yield f"{_series(self.name, self.labels, label_values)} {value:g}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values):
+        self.values[label_values] = value
+
+    def dec(self, *label_values, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+
+class CallbackMetric:
+    """Gauge or counter read at scrape time from existing state, e.g. cache or quota stats"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], read: Callable[[], Dict[Tuple, float]],
+                 kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> Iterable[str]:
+        for label_values, value in self.read().items():
+            if value is not None:
+                yield f"{_series(self.name, self.labels, label_values)} {value:g}"
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is one bisect and two additions"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self.series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> Iterable[str]:
+        for label_values, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket = _series(self.name + "_bucket", self.labels, label_values, f'le="{le}"')
+                yield f"{bucket} {cumulative}"
+            yield f"{_series(self.name + '_sum', self.labels, label_values)} {total:.6f}"
+            yield f"{_series(self.name + '_count', self.labels, label_values)} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class ApiMetrics:
+    """The API server's metrics: per-route requests, per-provider upstream calls, event-loop lag"""
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        register = self.registry.register
+        self.requests = register(Counter(
+            "api_requests_total", "HTTP requests handled", ("route", "method", "status")))
+        self.request_duration = register(Histogram(
+            "api_request_duration_seconds", "HTTP request latency", ("route", "method")))
+        self.in_flight = register(Gauge(
+            "api_requests_in_flight", "HTTP requests being handled"))
+        self.upstream_requests = register(Counter(
+            "upstream_requests_total", "Calls to upstream data providers", ("provider", "outcome")))
+        self.upstream_duration = register(Histogram(
+            "upstream_request_duration_seconds", "Upstream call latency, retries included", ("provider",)))
+        self.upstream_in_flight = register(Gauge(
+            "upstream_requests_in_flight", "Upstream calls in progress", ("provider",)))
+        self.loop_lag = register(Histogram(
+            "event_loop_lag_seconds", "How late the event loop ran a timer", buckets=LOOP_LAG_BUCKETS))
+        self.in_flight.set(0)
+        self._monitor: Optional[asyncio.Task] = None
+
+    def collect(self, name: str, help: str, labels: Tuple[str, ...], read: Callable[[], Dict[Tuple, float]],
+                kind: str = "gauge"):
+        """Expose existing state as a metric computed at scrape time (no hot-path cost)"""
+        self.registry.register(CallbackMetric(name, help, labels, read, kind))
+
+    def upstream_started(self, provider: str) -> float:
+        self.upstream_in_flight.inc(provider)
+        return time.perf_counter()
+
+    def upstream_finished(self, provider: str, started: float, outcome: str):
+        self.upstream_in_flight.dec(provider)
+        self.upstream_duration.observe(time.perf_counter() - started, provider)
+        self.upstream_requests.inc(provider, outcome)
+
+    def start_loop_monitor(self, interval: float = 0.5):
+        """Sample event-loop lag: how much later than scheduled a sleep(interval) wakes up"""
+        async def monitor():
+            while True:
+                start_time = time.perf_counter()
+                await asyncio.sleep(interval)
+                self.loop_lag.observe(max(0.0, time.perf_counter() - start_time - interval))
+        self._monitor = asyncio.ensure_future(monitor())
+
+    async def stop_loop_monitor(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+            self._monitor = None
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request, labelled by route template
+    (/stock/{symbol}, not /stock/AAPL) so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, metrics: ApiMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        metrics = self.metrics
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight.inc()
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            metrics.request_duration.observe(time.perf_counter() - start_time, path, method)
+            metrics.requests.inc(path, method, str(status))
@@ -0,0 +1,234 @@
+# Quota-aware scheduling of upstream API calls: per-provider rate windows, priorities, early rejection
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_current_priority: ContextVar[int] = ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+class QuotaExceeded(Exception):
+    """A call would not fit the provider's quota within the caller's maximum wait"""
+
+    def __init__(self, provider: str, retry_after: int):
+        super().__init__(f"{provider} quota exhausted, retry in {retry_after}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+@contextmanager
+def background():
+    """Mark upstream calls made in this context (and tasks started from it) as background work"""
+    token = _current_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+class ProviderQuota:
+    """Sliding-window quotas for one provider (e.g. 8 per minute and 800 per day).
+
+    Calls that do not fit right away wait in a priority queue (interactive
+    before background, FIFO within a priority) or are rejected at once when
+    the wait would exceed the caller's limit. Background calls may only use
+    `background_share` of each window so interactive requests keep headroom.
+    """
+
+    def __init__(self, name: str, limits: List[Tuple[int, float]], background_share: float = 0.5,
+                 max_wait: Optional[Dict[int, float]] = None):
+        self.name = name
+        self.windows = [(limit, window, deque()) for limit, window in limits if limit > 0]
+        self.background_share = background_share
+        self.max_wait = max_wait or {INTERACTIVE: 5.0, BACKGROUND: 300.0}
+        self.blocked_until = 0.0
+        self._waiters: list = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.counts = {name: {"granted": 0, "queued": 0, "rejected": 0} for name in PRIORITY_NAMES.values()}
+        self.waited_seconds = 0.0
+
+    async def acquire(self, cost: int = 1, priority: Optional[int] = None):
+        """Wait until `cost` calls fit every window, or raise QuotaExceeded"""
+        priority = current_priority() if priority is None else priority
+        counts = self.counts[PRIORITY_NAMES[priority]]
+        delay = self._delay(cost, priority, time.monotonic())
+        if delay == 0 and not self._queued_ahead(priority):
+            self._record(cost, time.monotonic())
+            counts["granted"] += 1
+            return
+        max_wait = self.max_wait[priority]
+        if delay > max_wait:
+            counts["rejected"] += 1
+            raise QuotaExceeded(self.name, self._retry_after(delay))
+
+        counts["queued"] += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), cost, future))
+        self._dispatch()
+        start_time = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=max_wait)
+        except asyncio.TimeoutError:
+            # Granted at the last moment: go ahead rather than waste the slot
+            if future.cancel():
+                counts["rejected"] += 1
+                self._dispatch()
+                raise QuotaExceeded(self.name, self._retry_after(self._delay(cost, priority, time.monotonic())))
+        except asyncio.CancelledError:
+            # Give the slot back if it was granted just as the caller went away
+            if not future.cancel():
+                self._unrecord(cost)
+            self._dispatch()
+            raise
+        finally:
+            self.waited_seconds += time.monotonic() - start_time
+        counts["granted"] += 1
+
+    def max_cost(self, priority: Optional[int] = None) -> int:
+        """Largest single call (e.g. symbols in one batch) that can ever fit at this priority"""
+        priority = current_priority() if priority is None else priority
+        return min(self._allowed(limit, priority) for limit, _, _ in self.windows)
+
+    def block(self, seconds: float):
+        """The provider said it is rate limiting us (HTTP 429): make no calls for `seconds`"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        print(f"⏳ {self.name} rate limited upstream, pausing calls for {seconds:.0f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        windows = []
+        for limit, window, calls in self.windows:
+            self._expire(calls, window, now)
+            windows.append({
+                "limit": limit,
+                "window_seconds": window,
+                "used": len(calls),
+                "remaining": max(0, limit - len(calls)),
+                "resets_in": round(calls[0] + window - now, 1) if calls else 0.0,
+            })
+        return {
+            "windows": windows,
+            "queued": sum(1 for *_, future in self._waiters if not future.done()),
+            "blocked_for": round(max(0.0, self.blocked_until - now), 1),
+            "waited_seconds": round(self.waited_seconds, 3),
+            **self.counts,
+        }
+
+    def _delay(self, cost: int, priority: int, now: float) -> float:
+        """Seconds until `cost` more calls fit every window at this priority (inf if they never can)"""
+        delay = max(0.0, self.blocked_until - now)
+        for limit, window, calls in self.windows:
+            self._expire(calls, window, now)
+            allowed = self._allowed(limit, priority)
+            if cost > allowed:
+                return math.inf
+            excess = len(calls) + cost - allowed
+            if excess > 0:
+                delay = max(delay, calls[excess - 1] + window - now)
+        return delay
+
+    def _allowed(self, limit: int, priority: int) -> int:
+        return limit if priority == INTERACTIVE else max(1, int(limit * self.background_share))
+
+    def _retry_after(self, delay: float) -> int:
+        if math.isinf(delay):
+            delay = max(window for _, window, _ in self.windows)
+        return max(1, math.ceil(delay))
+
+    def _queued_ahead(self, priority: int) -> bool:
+        return any(waiter[0] <= priority and not waiter[3].done() for waiter in self._waiters)
+
+    def _dispatch(self):
+        """Grant queued calls in priority order as far as the windows allow, then sleep until the next slot"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            priority, _, cost, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._delay(cost, priority, time.monotonic())
+            if delay > 0:
+                if not math.isinf(delay):
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self._record(cost, time.monotonic())
+            future.set_result(None)
+
+    def _record(self, cost: int, now: float):
+        for _, _, calls in self.windows:
+            calls.extend([now] * cost)
+
+    def _unrecord(self, cost: int):
+        for _, _, calls in self.windows:
+            for _ in range(min(cost, len(calls))):
+                calls.pop()
+
+    @staticmethod
+    def _expire(calls: deque, window: float, now: float):
+        while calls and calls[0] <= now - window:
+            calls.popleft()
+
+
+class QuotaScheduler:
+    """One ProviderQuota per upstream; providers without configured limits are never throttled"""
+
+    def __init__(self, providers: Dict[str, ProviderQuota]):
+        self.providers = providers
+
+    async def acquire(self, provider: str, cost: int = 1):
+        quota = self.providers.get(provider)
+        if quota is not None:
+            await quota.acquire(cost)
+
+    def max_cost(self, provider: str, default: int) -> int:
+        quota = self.providers.get(provider)
+        return min(default, quota.max_cost()) if quota is not None else default
+
+    def block(self, provider: str, seconds: float):
+        quota = self.providers.get(provider)
+        if quota is not None:
+            quota.block(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: quota.stats() for name, quota in self.providers.items()}
+
+
+def scheduler_from_env(background_share: float) -> QuotaScheduler:
+    """Provider quotas from the environment (0 disables a window); defaults match the free plans"""
+    max_wait = {
+        INTERACTIVE: float(os.getenv("QUOTA_MAX_WAIT", "5")),
+        BACKGROUND: float(os.getenv("QUOTA_BACKGROUND_MAX_WAIT", "300")),
+    }
+    limits = {
+        "twelve_data": [(int(os.getenv("TWELVE_DATA_CREDITS_PER_MINUTE", "8")), 60),
+                        (int(os.getenv("TWELVE_DATA_CREDITS_PER_DAY", "800")), 86400)],
+        "fmp": [(int(os.getenv("FMP_CALLS_PER_MINUTE", "0")), 60),
+                (int(os.getenv("FMP_CALLS_PER_DAY", "250")), 86400)],
+        "news_api": [(int(os.getenv("NEWS_API_CALLS_PER_MINUTE", "0")), 60),
+                     (int(os.getenv("NEWS_API_CALLS_PER_DAY", "100")), 86400)],
+    }
+    providers = {}
+    for name, windows in limits.items():
+        quota = ProviderQuota(name, windows, background_share, max_wait)
+        if quota.windows:
+            providers[name] = quota
+    return QuotaScheduler(providers)
@@ -0,0 +1,240 @@
+# WebSocket price streaming: one upstream poller per subscribed symbol, fanned out to every subscriber
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from api.history_store import InvalidSymbol, validate_symbol
+
+# Fetches one symbol: ({"price": ...} or {"error": ...}, age in seconds)
+PriceFetch = Callable[[str], Awaitable[Tuple[Dict[str, Any], float]]]
+
+# Shortest poll interval the upstream quota allows for the symbols currently streamed
+MinInterval = Callable[[List[str]], float]
+
+
+class Subscriber:
+    """One WebSocket client. Updates are conflated per symbol, so a slow client
+    only ever has the latest price for each symbol waiting and never holds up
+    the broadcast to everyone else.
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable[None]]):
+        self.send = send
+        self.symbols: Set[str] = set()
+        self._pending: Dict[str, str] = {}
+        self._control: deque = deque()
+        self._ready = asyncio.Event()
+        self.sent = 0
+        self.conflated = 0
+
+    def offer(self, symbol: str, message: str):
+        """Queue an update, replacing any unsent update for the same symbol"""
+        if symbol in self._pending:
+            self.conflated += 1
+        self._pending[symbol] = message
+        self._ready.set()
+
+    def reply(self, payload: Dict[str, Any]):
+        """Queue a control message (subscription acks, errors); these are never conflated"""
+        self._control.append(json.dumps(payload))
+        self._ready.set()
+
+    async def run(self, send_timeout: float):
+        """Send queued messages until a send takes longer than send_timeout (asyncio.TimeoutError)"""
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            pending, self._pending = self._pending, {}
+            messages = list(self._control) + list(pending.values())
+            self._control.clear()
+            for message in messages:
+                await asyncio.wait_for(self.send(message), timeout=send_timeout)
+                self.sent += 1
+
+
+class PriceStreamHub:
+    """Fans price updates out to WebSocket subscribers.
+
+    The first subscriber to a symbol starts its poller and the last one to
+    leave stops it, so upstream traffic depends on the number of distinct
+    symbols watched, never on the number of clients. That number is capped
+    hub-wide, and pollers slow down to `min_interval` as symbols are added so
+    the stream stays within its share of the provider quota. Each update is
+    encoded once and broadcast only when the price changes.
+    """
+
+    def __init__(self, fetch: PriceFetch, poll_interval: Optional[float] = None,
+                 send_timeout: Optional[float] = None, max_symbols: Optional[int] = None,
+                 max_total_symbols: Optional[int] = None, min_interval: Optional[MinInterval] = None):
+        self.fetch = fetch
+        self.poll_interval = poll_interval or float(os.getenv("STREAM_POLL_INTERVAL", "15"))
+        self.send_timeout = send_timeout or float(os.getenv("STREAM_SEND_TIMEOUT", "5"))
+        self.max_symbols = max_symbols or int(os.getenv("STREAM_MAX_SYMBOLS", "50"))
+        self.max_total_symbols = max_total_symbols or int(os.getenv("STREAM_MAX_TOTAL_SYMBOLS", "20"))
+        self.min_interval = min_interval
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._latest: Dict[str, str] = {}
+        self.clients = 0
+        self.counts = {"polls": 0, "poll_errors": 0, "updates": 0, "deliveries": 0, "slow_disconnects": 0}
+
+    async def serve(self, websocket: WebSocket, symbols: str = ""):
+        """Handle one client: optional ?symbols= at connect, then subscribe/unsubscribe messages"""
+        await websocket.accept()
+        subscriber = Subscriber(websocket.send_text)
+        self.clients += 1
+        sender = asyncio.ensure_future(subscriber.run(self.send_timeout))
+        receiver = asyncio.ensure_future(self._receive(websocket, subscriber))
+        if symbols:
+            self._handle(subscriber, {"action": "subscribe", "symbols": symbols})
+        try:
+            done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if sender in done and isinstance(sender.exception(), asyncio.TimeoutError):
+                self.counts["slow_disconnects"] += 1
+                await websocket.close(code=1013, reason="Client too slow")
+        except Exception:
+            pass
+        finally:
+            sender.cancel()
+            receiver.cancel()
+            await asyncio.gather(sender, receiver, return_exceptions=True)
+            self.unsubscribe(subscriber)
+            self.clients -= 1
+
+    def subscribe(self, subscriber: Subscriber, symbols: List[str]) -> List[str]:
+        """Add symbols (up to max_symbols per client and max_total_symbols streamed in all);
+        new subscribers get the latest price right away"""
+        added = []
+        for symbol in symbols:
+            if symbol in subscriber.symbols or len(subscriber.symbols) >= self.max_symbols:
+                continue
+            if symbol not in self._subscribers and len(self._subscribers) >= self.max_total_symbols:
+                continue
+            subscriber.symbols.add(symbol)
+            self._subscribers.setdefault(symbol, set()).add(subscriber)
+            if symbol not in self._pollers:
+                self._pollers[symbol] = asyncio.ensure_future(self._poll(symbol))
+            if symbol in self._latest:
+                subscriber.offer(symbol, self._latest[symbol])
+            added.append(symbol)
+        return added
+
+    def unsubscribe(self, subscriber: Subscriber, symbols: Optional[List[str]] = None):
+        """Remove symbols (all of them by default), stopping pollers nobody listens to any more"""
+        for symbol in list(subscriber.symbols if symbols is None else symbols):
+            subscriber.symbols.discard(symbol)
+            listeners = self._subscribers.get(symbol)
+            if listeners is None:
+                continue
+            listeners.discard(subscriber)
+            if not listeners:
+                del self._subscribers[symbol]
+                self._latest.pop(symbol, None)
+                self._pollers.pop(symbol).cancel()
+
+    def publish(self, symbol: str, payload: Dict[str, Any], age: float):
+        """Encode an update once and offer it to every subscriber of the symbol"""
+        message = json.dumps({
+            "type": "error" if "error" in payload else "price",
+            "symbol": symbol,
+            **payload,
+            "age_seconds": round(age, 1),
+            "ts": time.time(),
+        })
+        self._latest[symbol] = message
+        self.counts["updates"] += 1
+        for subscriber in self._subscribers.get(symbol, ()):
+            subscriber.offer(symbol, message)
+            self.counts["deliveries"] += 1
+
+    def interval(self) -> float:
+        """Seconds between polls of each symbol: the configured interval, stretched to fit the quota"""
+        if self.min_interval is None:
+            return self.poll_interval
+        return max(self.poll_interval, self.min_interval(list(self._subscribers)))
+
+    async def close(self):
+        pollers = list(self._pollers.values())
+        for task in pollers:
+            task.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+        self._pollers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": self.clients,
+            "symbols": len(self._subscribers),
+            "subscriptions": sum(len(listeners) for listeners in self._subscribers.values()),
+            "max_total_symbols": self.max_total_symbols,
+            "poll_interval": round(self.interval(), 1),
+            **self.counts,
+        }
+
+    async def _receive(self, websocket: WebSocket, subscriber: Subscriber):
+        try:
+            while True:
+                text = await websocket.receive_text()
+                try:
+                    message = json.loads(text)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    subscriber.reply({"type": "error", "message": "Expected a JSON object"})
+                    continue
+                self._handle(subscriber, message)
+        except WebSocketDisconnect:
+            pass
+
+    def _handle(self, subscriber: Subscriber, message: Dict[str, Any]):
+        symbols = message.get("symbols", [])
+        if isinstance(symbols, str):
+            symbols = symbols.split(",")
+        if not isinstance(symbols, list):
+            subscriber.reply({"type": "error", "message": "symbols must be a list or a comma-separated string"})
+            return
+        symbols = list(dict.fromkeys(str(s).strip().upper() for s in symbols if str(s).strip()))
+        action = message.get("action")
+        if action == "subscribe":
+            # Symbols end up in upstream URLs, so anything that is not a ticker is refused here
+            valid, invalid = [], []
+            for symbol in symbols:
+                try:
+                    valid.append(validate_symbol(symbol))
+                except InvalidSymbol:
+                    invalid.append(symbol)
+            wanted = [symbol for symbol in valid if symbol not in subscriber.symbols]
+            added = self.subscribe(subscriber, wanted)
+            subscriber.reply({"type": "subscribed", "symbols": sorted(subscriber.symbols)})
+            if invalid:
+                subscriber.reply({"type": "error", "message": f"Invalid ticker symbols: {', '.join(invalid)}"})
+            if len(added) < len(wanted):
+                subscriber.reply({"type": "error", "message": f"At most {self.max_symbols} symbols per client "
+                                                              f"and {self.max_total_symbols} streamed in total"})
+        elif action == "unsubscribe":
+            self.unsubscribe(subscriber, symbols or None)
+            subscriber.reply({"type": "subscribed", "symbols": sorted(subscriber.symbols)})
+        else:
+            subscriber.reply({"type": "error", "message": "action must be 'subscribe' or 'unsubscribe'"})
+
+    async def _poll(self, symbol: str):
+        last_payload = None
+        while True:
+            started = time.monotonic()
+            try:
+                payload, age = await self.fetch(symbol)
+                self.counts["polls"] += 1
+                if payload != last_payload:
+                    last_payload = payload
+                    self.publish(symbol, payload, age)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counts["poll_errors"] += 1
+                print(f"⚠️ Price stream poll failed for {symbol}: {e}")
+            await asyncio.sleep(max(0.0, self.interval() - (time.monotonic() - started)))
@@ -0,0 +1,140 @@
+# Stale-while-revalidate store for a hot watchlist, refreshed in the background within provider quotas
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Refreshes a batch of symbols; returns {symbol: payload} for the symbols it could fetch
+RefreshFn = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+
+
+def watchlist_from_env(default: List[str]) -> List[str]:
+    """WATCHLIST=AAPL,MSFT,... overrides the default universe; WATCHLIST= (empty) disables it"""
+    value = os.getenv("WATCHLIST")
+    if value is None:
+        return list(default)
+    return [symbol.strip().upper() for symbol in value.split(",") if symbol.strip()]
+
+
+def quota_interval(symbols: int, calls_per_symbol: float, calls_allowed: float, window: float) -> float:
+    """Shortest refresh interval that keeps a full refresh of `symbols` within the provider quota"""
+    if calls_allowed <= 0:
+        return 0.0
+    return symbols * calls_per_symbol * window / calls_allowed
+
+
+class Feed:
+    """One kind of data (price, dividend yield, ...) kept warm for every watched symbol"""
+
+    def __init__(self, name: str, refresh: RefreshFn, interval: float, min_interval: float = 0.0,
+                 max_age_factor: float = 3.0):
+        self.name = name
+        self.refresh = refresh
+        # Never refresh more often than the quota allows, even when asked to
+        self.min_interval = min_interval
+        self.interval = max(interval, min_interval)
+        # Past this age (e.g. refreshes keep failing) a value is no longer served as current
+        self.max_age = self.interval * max_age_factor
+        self.values: Dict[str, Tuple[Any, float]] = {}
+        self.kick = asyncio.Event()
+        self.refreshing = False
+        self.refreshes = 0
+        self.failures = 0
+        self.last_duration: Optional[float] = None
+
+
+class WatchlistRefresher:
+    """Serves watched symbols from memory and refreshes them on a schedule.
+
+    A value older than its feed's interval is still returned (stale) and wakes
+    the feed's refresh loop early, subject to the quota-derived minimum interval.
+    A value older than the feed's max_age is not returned at all, so callers fetch it.
+    """
+
+    def __init__(self, symbols: List[str], max_age_factor: float = 3.0):
+        self.symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        self.max_age_factor = max_age_factor
+        self.feeds: Dict[str, Feed] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add_feed(self, name: str, refresh: RefreshFn, interval: float, min_interval: float = 0.0) -> Feed:
+        feed = Feed(name, refresh, interval, min_interval, self.max_age_factor)
+        self.feeds[name] = feed
+        print(f"👀 Watchlist {name}: {len(self.symbols)} symbols every {feed.interval:g}s (max age {feed.max_age:g}s)")
+        return feed
+
+    def get(self, feed_name: str, symbol: str) -> Optional[Tuple[Any, float]]:
+        """(payload, age in seconds) for a watched symbol, or None if it is not in memory or too old"""
+        feed = self.feeds.get(feed_name)
+        if feed is None:
+            return None
+        entry = feed.values.get(symbol.upper())
+        if entry is None:
+            return None
+        payload, fetched_at = entry
+        age = time.time() - fetched_at
+        if age > feed.interval and not feed.refreshing:
+            feed.kick.set()
+        if age > feed.max_age:
+            return None
+        return payload, age
+
+    def start(self):
+        """Start one refresh loop per feed on the running event loop"""
+        if not self.symbols:
+            return
+        self._tasks = [asyncio.ensure_future(self._run(feed)) for feed in self.feeds.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        feeds = {}
+        for name, feed in self.feeds.items():
+            ages = [now - fetched_at for _, fetched_at in feed.values.values()]
+            feeds[name] = {
+                "interval": feed.interval,
+                "min_interval": feed.min_interval,
+                "max_age": feed.max_age,
+                "symbols_cached": len(feed.values),
+                "symbols_expired": sum(age > feed.max_age for age in ages),
+                "oldest_age": round(max(ages), 1) if ages else None,
+                "refreshes": feed.refreshes,
+                "failures": feed.failures,
+                "last_refresh_seconds": feed.last_duration,
+            }
+        return {"symbols": self.symbols, "feeds": feeds}
+
+    async def _run(self, feed: Feed):
+        while True:
+            await self._refresh(feed)
+            feed.kick.clear()
+            await asyncio.sleep(feed.min_interval)
+            try:
+                # A stale read may wake us early, but not before min_interval has passed
+                await asyncio.wait_for(feed.kick.wait(), timeout=max(0.0, feed.interval - feed.min_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refresh(self, feed: Feed):
+        feed.refreshing = True
+        start_time = time.perf_counter()
+        try:
+            results = await feed.refresh(self.symbols)
+            fetched_at = time.time()
+            for symbol, payload in results.items():
+                feed.values[symbol] = (payload, fetched_at)
+            feed.refreshes += 1
+            if len(results) < len(self.symbols):
+                print(f"⚠️ Watchlist {feed.name}: refreshed {len(results)}/{len(self.symbols)} symbols")
+        except Exception as e:
+            feed.failures += 1
+            print(f"⚠️ Watchlist {feed.name} refresh failed: {e}")
+        finally:
+            feed.refreshing = False
+            feed.last_duration = round(time.perf_counter() - start_time, 3)
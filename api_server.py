@@ -1,21 +1,77 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi_mcp import FastApiMCP
 from pyngrok import ngrok
 from dotenv import load_dotenv
-import requests
+import httpx
+import numpy as np
 import os
 import uvicorn
+import asyncio
+import math
+import time
+from datetime import date, timedelta
 from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Tuple
 
 # Load environment variables
 load_dotenv()
+
+from analytics.indicators import align, compute, parse_indicators
+from api.cache import UpstreamCache
+from api.history_store import INTERVALS, HistoryStore, InvalidSymbol, validate_symbol
+from api.metrics import CONTENT_TYPE, ApiMetrics, MetricsMiddleware
+from api.quota import QuotaExceeded, background, scheduler_from_env
+from api.streaming import PriceStreamHub
+from api.watchlist import WatchlistRefresher, quota_interval, watchlist_from_env
+from api.wire import CompressionMiddleware, FastJSONResponse, respond
+from financial_downloader import TARGET_TICKERS
+from tools.http_client import RETRY_STATUSES, http_client, retry_after_seconds
+
 # Get API keys from environment
 TWELVE_DATA_API_KEY = os.getenv("TWELVE_DATA_API_KEY")
 FMP_API_KEY = os.getenv("FMP_API_KEY")
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 NGROK_AUTH_TOKEN = os.getenv("NGROK_AUTH_TOKEN")
 
+# Per-upstream timeouts in seconds (requests share tools/http_client.py's async connection pool)
+UPSTREAM_TIMEOUTS = {
+    "twelve_data": float(os.getenv("TWELVE_DATA_TIMEOUT", "10")),
+    "fmp": float(os.getenv("FMP_TIMEOUT", "10")),
+    "news_api": float(os.getenv("NEWS_API_TIMEOUT", "10")),
+}
+
+# Batch quotes: symbols per Twelve Data request, and per /stocks call
+TWELVE_DATA_BATCH_SIZE = int(os.getenv("TWELVE_DATA_BATCH_SIZE", "50"))
+MAX_BATCH_SYMBOLS = int(os.getenv("MAX_BATCH_SYMBOLS", "200"))
+
+# Watchlist kept warm in the background: refresh intervals and the share of each provider quota it may use
+WATCHLIST_PRICE_INTERVAL = float(os.getenv("WATCHLIST_PRICE_INTERVAL", "60"))
+WATCHLIST_DIVIDEND_INTERVAL = float(os.getenv("WATCHLIST_DIVIDEND_INTERVAL", "21600"))
+WATCHLIST_QUOTA_SHARE = float(os.getenv("WATCHLIST_QUOTA_SHARE", "0.5"))
+# Part of that background share set aside for price stream polls of symbols not on the watchlist
+STREAM_QUOTA_SHARE = min(float(os.getenv("STREAM_QUOTA_SHARE", "0.1")), WATCHLIST_QUOTA_SHARE / 2)
+WATCHLIST_MAX_AGE_FACTOR = float(os.getenv("WATCHLIST_MAX_AGE_FACTOR", "3"))
+TWELVE_DATA_CREDITS_PER_MINUTE = float(os.getenv("TWELVE_DATA_CREDITS_PER_MINUTE", "8"))
+TWELVE_DATA_CREDITS_PER_DAY = float(os.getenv("TWELVE_DATA_CREDITS_PER_DAY", "800"))
+FMP_CALLS_PER_MINUTE = float(os.getenv("FMP_CALLS_PER_MINUTE", "0"))
+FMP_CALLS_PER_DAY = float(os.getenv("FMP_CALLS_PER_DAY", "250"))
+
+# Local store of daily bars behind /history: location, how often today's bar is refetched, default range
+HISTORY_STORE_DIR = os.getenv("HISTORY_STORE_DIR", os.path.join("data", "history"))
+HISTORY_TAIL_TTL = float(os.getenv("HISTORY_TAIL_TTL", "900"))
+HISTORY_DEFAULT_DAYS = int(os.getenv("HISTORY_DEFAULT_DAYS", "365"))
+
+# /indicators: calendar days of history loaded before `end` (long EMAs need time to settle), default set, and
+# symbols per request (each may need a backfill from Twelve Data)
+INDICATOR_LOOKBACK_DAYS = int(os.getenv("INDICATOR_LOOKBACK_DAYS", "730"))
+DEFAULT_INDICATORS = os.getenv("DEFAULT_INDICATORS", "sma_50,sma_200,rsi,macd,bollinger,atr,volatility")
+INDICATOR_MAX_SYMBOLS = int(os.getenv("INDICATOR_MAX_SYMBOLS", "25"))
+
+# Responses of at least this many bytes are gzip/brotli-compressed when the client accepts it
+COMPRESSION_MIN_SIZE = int(os.getenv("API_COMPRESSION_MIN_SIZE", "1024"))
+
 # Application settings
 APPLICATION_PORT = int(os.getenv("API_PORT", "8000"))
 HOST = os.getenv("API_HOST", "0.0.0.0")
@@ -51,9 +107,28 @@ async def lifespan(app: FastAPI):
         print(f"📊 API Documentation: http://localhost:{APPLICATION_PORT}/docs")
         print(f"🔗 MCP Server: http://localhost:{APPLICATION_PORT}/mcp")
     
+    # Keep the watchlist warm (Twelve Data bills one credit per symbol, FMP one call per symbol),
+    # no faster than the tighter of each provider's per-minute and per-day limits allows
+    symbols = len(watchlist.symbols)
+    if TWELVE_DATA_API_KEY:
+        price_share = WATCHLIST_QUOTA_SHARE - STREAM_QUOTA_SHARE
+        watchlist.add_feed("stock", refresh_watchlist_prices, WATCHLIST_PRICE_INTERVAL, max(
+            quota_interval(symbols, 1, TWELVE_DATA_CREDITS_PER_MINUTE * price_share, 60),
+            quota_interval(symbols, 1, TWELVE_DATA_CREDITS_PER_DAY * price_share, 86400)))
+    if FMP_API_KEY:
+        watchlist.add_feed("dividend", refresh_watchlist_dividends, WATCHLIST_DIVIDEND_INTERVAL, max(
+            quota_interval(symbols, 1, FMP_CALLS_PER_MINUTE * WATCHLIST_QUOTA_SHARE, 60),
+            quota_interval(symbols, 1, FMP_CALLS_PER_DAY * WATCHLIST_QUOTA_SHARE, 86400)))
+    watchlist.start()
+    metrics.start_loop_monitor()
+    
     yield
     
     # Cleanup
+    await metrics.stop_loop_monitor()
+    await price_stream.close()
+    await watchlist.stop()
+    await http_client.aclose()
     if tunnel:
         print("🛑 Closing ngrok tunnel...")
         try:
@@ -66,7 +141,8 @@ app = FastAPI(
     title="Financial Copilot API",
     description="Real-time financial data retrieval service with MCP integration",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware for development
@@ -78,9 +154,99 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# Request counts and latency per route, upstream latency per provider, loop lag (served at /metrics)
+metrics = ApiMetrics()
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+# Upstream responses are cached per endpoint; concurrent identical misses share one fetch
+upstream_cache = UpstreamCache(max_entries=int(os.getenv("API_CACHE_MAX_ENTRIES", "2048")))
+
+# Provider quotas: calls queue when a limit is near (interactive ahead of background) or fail fast with 429
+quotas = scheduler_from_env(background_share=WATCHLIST_QUOTA_SHARE)
+
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded_handler(request: Request, exc: QuotaExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "provider": exc.provider, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+async def fetch_json(url: str, upstream: str, cost: int = 1) -> Any:
+    """GET an upstream API within its quota (cost = credits the call uses) and decode its JSON body"""
+    await quotas.acquire(upstream, cost)
+    started, outcome = metrics.upstream_started(upstream), "transport_error"
+    try:
+        # A 429 is not retried blindly: the provider is paused for Retry-After and the caller told to come back
+        response = await http_client.aget(url, timeout=UPSTREAM_TIMEOUTS[upstream],
+                                          retry_statuses=tuple(s for s in RETRY_STATUSES if s != 429))
+        outcome = "rate_limited" if response.status_code == 429 else (
+            "http_error" if response.status_code >= 400 else "success")
+    finally:
+        metrics.upstream_finished(upstream, started, outcome)
+    if response.status_code == 429:
+        delay = retry_after_seconds(response.headers.get("Retry-After")) or 60
+        quotas.block(upstream, delay)
+        raise QuotaExceeded(upstream, max(1, math.ceil(delay)))
+    response.raise_for_status()
+    try:
+        return response.json()
+    except ValueError as e:
+        # An HTML error page or truncated body is an upstream failure like any other, not a server bug
+        raise httpx.DecodingError(f"{upstream} returned a non-JSON response: {str(e)}", request=response.request)
+
+def has_rows(data: Any) -> bool:
+    return isinstance(data, list) and len(data) > 0
+
+# Hot symbols served from memory, stale-while-revalidate
+watchlist = WatchlistRefresher(watchlist_from_env(TARGET_TICKERS), WATCHLIST_MAX_AGE_FACTOR)
+
+def price_chunks(symbols: List[str]) -> List[List[str]]:
+    """Split symbols into Twelve Data batches no larger than the quota allows (one credit per symbol)"""
+    size = quotas.max_cost("twelve_data", TWELVE_DATA_BATCH_SIZE)
+    return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+async def refresh_watchlist_prices(symbols: List[str]) -> Dict[str, Any]:
+    """Watchlist price feed: batch requests, stored in the same shape as a single /price response"""
+    prices = {}
+    with background():
+        chunks = await asyncio.gather(*(fetch_price_chunk(chunk) for chunk in price_chunks(symbols)),
+                                      return_exceptions=True)
+    for chunk in chunks:
+        if isinstance(chunk, QuotaExceeded):
+            continue
+        if isinstance(chunk, Exception):
+            raise chunk
+        prices.update({symbol: {"price": result["price"]} for symbol, result in chunk[0].items() if "price" in result})
+    return prices
+
+async def refresh_watchlist_dividends(symbols: List[str]) -> Dict[str, Any]:
+    """Watchlist dividend feed: FMP key metrics per symbol, fetched concurrently"""
+    async def fetch(symbol: str):
+        url = f"https://financialmodelingprep.com/api/v3/key-metrics/{symbol}?limit=1&apikey={FMP_API_KEY}"
+        return symbol, await fetch_json(url, "fmp")
+    
+    dividend_metrics = {}
+    with background():
+        results = await asyncio.gather(*(fetch(symbol) for symbol in symbols), return_exceptions=True)
+    for result in results:
+        if not isinstance(result, Exception) and has_rows(result[1]):
+            dividend_metrics[result[0]] = result[1]
+    return dividend_metrics
+
+async def cached_upstream(endpoint: str, key: str, url: str, upstream: str, should_cache) -> Tuple[Any, float]:
+    """(payload, age in seconds) from the watchlist, the upstream cache, or a fresh upstream fetch"""
+    watched = watchlist.get(endpoint, key)
+    if watched is not None:
+        return watched
+    data = await upstream_cache.get_or_fetch(endpoint, key, lambda: fetch_json(url, upstream), should_cache=should_cache)
+    return data, upstream_cache.age(endpoint, key)
+
 # Your existing financial endpoints (minimal changes)
 @app.get("/stock/{symbol}")
-async def get_stock_price(symbol: str):
+async def get_stock_price(symbol: str, request: Request):
     """Get current stock price for a given symbol"""
     if not TWELVE_DATA_API_KEY:
         raise HTTPException(status_code=500, detail="TWELVE_DATA_API_KEY not configured")
@@ -88,27 +254,173 @@ async def get_stock_price(symbol: str):
     url = f"https://api.twelvedata.com/price?symbol={symbol}&apikey={TWELVE_DATA_API_KEY}"
     
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data, age = await cached_upstream(
+            "stock", symbol.upper(), url, "twelve_data", should_cache=lambda data: "price" in data
+        )
         
         if "price" in data:
-            return {
+            return respond(request, {
                 "symbol": symbol,
                 "price": float(data["price"]),
+                "age_seconds": round(age, 1),
                 "status": "success",
                 "source": "twelve_data"
-            }
+            }, version=data)
         else:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Price data not found for {symbol}: {data.get('message', 'Unknown error')}"
             )
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}")
 
+async def fetch_prices(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+    """One Twelve Data request for several symbols: {symbol: {"price": ...} or {"error": ...}}"""
+    url = f"https://api.twelvedata.com/price?symbol={','.join(symbols)}&apikey={TWELVE_DATA_API_KEY}"
+    data = await fetch_json(url, "twelve_data", cost=len(symbols))
+    if not isinstance(data, dict):
+        raise ValueError(f"Unexpected price response of type {type(data).__name__}")
+    
+    # A single symbol comes back unwrapped; an error for the whole request has a top-level status
+    if len(symbols) == 1:
+        data = {symbols[0]: data}
+    elif data.get("status") == "error":
+        raise ValueError(data.get("message", "Batch request rejected"))
+    
+    results = {}
+    for symbol in symbols:
+        entry = data.get(symbol)
+        if isinstance(entry, dict) and "price" in entry:
+            results[symbol] = {"price": float(entry["price"])}
+        else:
+            message = entry.get("message") if isinstance(entry, dict) else None
+            results[symbol] = {"error": message or "No price returned"}
+    return results
+
+async def fetch_price_chunk(symbols: List[str]) -> Tuple[Dict[str, Dict[str, Any]], int]:
+    """Batch request for a chunk, falling back to concurrent single-symbol requests if it fails"""
+    try:
+        return await fetch_prices(symbols), 1
+    except (httpx.HTTPError, ValueError) as e:
+        if len(symbols) == 1:
+            return {symbols[0]: {"error": f"API request failed: {str(e)}"}}, 1
+        print(f"⚠️ Batch price request failed ({e}), fetching {len(symbols)} symbols individually")
+    
+    # A symbol over quota becomes its own error instead of discarding prices already paid for
+    singles = await asyncio.gather(*(fetch_price_chunk([symbol]) for symbol in symbols), return_exceptions=True)
+    results, requests_made, rejected = {}, 1, []
+    for symbol, single in zip(symbols, singles):
+        if isinstance(single, QuotaExceeded):
+            rejected.append(single)
+            results[symbol] = {"error": str(single)}
+            continue
+        if isinstance(single, BaseException):
+            raise single
+        results.update(single[0])
+        requests_made += single[1]
+    if len(rejected) == len(symbols):
+        raise rejected[0]
+    return results, requests_made
+
+@app.get("/stocks")
+async def get_stock_prices(symbols: str, request: Request):
+    """Get current stock prices for several comma-separated symbols (e.g. AAPL,MSFT,GOOGL) in one request"""
+    if not TWELVE_DATA_API_KEY:
+        raise HTTPException(status_code=500, detail="TWELVE_DATA_API_KEY not configured")
+    
+    requested = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(requested) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SYMBOLS} symbols per request")
+    try:
+        for symbol in requested:
+            validate_symbol(symbol)
+    except InvalidSymbol as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Watched symbols and prices cached by /stock or earlier batches need no upstream request
+    prices, ages, errors, upstream_requests = {}, {}, {}, 0
+    for symbol in requested:
+        watched = watchlist.get("stock", symbol)
+        if watched is not None:
+            prices[symbol], ages[symbol] = float(watched[0]["price"]), watched[1]
+            continue
+        cached = upstream_cache.peek("stock", symbol)
+        if cached is not None:
+            prices[symbol], ages[symbol] = float(cached["price"]), upstream_cache.age("stock", symbol)
+    missing = [symbol for symbol in requested if symbol not in prices]
+    
+    chunks = price_chunks(missing)
+    rejected = None
+    outcomes = await asyncio.gather(*(fetch_price_chunk(chunk) for chunk in chunks), return_exceptions=True)
+    for chunk, outcome in zip(chunks, outcomes):
+        # Chunks over quota become per-symbol errors; the whole request is a 429 only if nothing was priced
+        if isinstance(outcome, QuotaExceeded):
+            rejected = outcome
+            errors.update({symbol: str(outcome) for symbol in chunk})
+            continue
+        if isinstance(outcome, Exception):
+            raise outcome
+        results, count = outcome
+        upstream_requests += count
+        for symbol, result in results.items():
+            if "price" in result:
+                prices[symbol], ages[symbol] = result["price"], 0.0
+                upstream_cache.put("stock", symbol, {"price": result["price"]})
+            else:
+                errors[symbol] = result["error"]
+    
+    if rejected is not None and not prices:
+        raise rejected
+    
+    ordered = {symbol: prices[symbol] for symbol in requested if symbol in prices}
+    return respond(request, {
+        "symbols": requested,
+        "prices": ordered,
+        "age_seconds": {symbol: round(ages[symbol], 1) for symbol in requested if symbol in ages},
+        "errors": errors,
+        "status": "success" if not errors else ("partial" if prices else "error"),
+        "upstream_requests": upstream_requests,
+        "cached": len(requested) - len(missing),
+        "source": "twelve_data"
+    }, version=[ordered, errors])
+
+async def poll_stream_price(symbol: str) -> Tuple[Dict[str, Any], float]:
+    """Price stream poller: watched symbols come from memory, then the upstream cache, then one upstream request"""
+    watched = watchlist.get("stock", symbol)
+    if watched is not None:
+        return {"price": float(watched[0]["price"])}, watched[1]
+    # A price another request fetched within the stock TTL costs no upstream credit
+    cached = upstream_cache.peek("stock", symbol)
+    if cached is not None:
+        return {"price": float(cached["price"])}, upstream_cache.age("stock", symbol)
+    with background():
+        results, _ = await fetch_price_chunk([symbol])
+    result = results[symbol]
+    if "price" in result:
+        upstream_cache.put("stock", symbol, {"price": result["price"]})
+    return result, 0.0
+
+def stream_min_interval(symbols: List[str]) -> float:
+    """Poll interval that keeps streamed symbols off the watchlist (one credit each) within STREAM_QUOTA_SHARE"""
+    unwatched = sum(1 for symbol in symbols if symbol not in watchlist.symbols)
+    return max(quota_interval(unwatched, 1, TWELVE_DATA_CREDITS_PER_MINUTE * STREAM_QUOTA_SHARE, 60),
+               quota_interval(unwatched, 1, TWELVE_DATA_CREDITS_PER_DAY * STREAM_QUOTA_SHARE, 86400))
+
+# Live prices over WebSocket: one poller per subscribed symbol, however many clients listen
+price_stream = PriceStreamHub(poll_stream_price, min_interval=stream_min_interval)
+
+@app.websocket("/ws/prices")
+async def stream_prices(websocket: WebSocket, symbols: str = ""):
+    """Stream price updates; subscribe with ?symbols=AAPL,MSFT or {"action": "subscribe", "symbols": [...]}"""
+    if not TWELVE_DATA_API_KEY:
+        await websocket.close(code=1011, reason="TWELVE_DATA_API_KEY not configured")
+        return
+    await price_stream.serve(websocket, symbols)
+
 @app.get("/earnings/{symbol}")
-async def get_earnings_report(symbol: str):
+async def get_earnings_report(symbol: str, request: Request):
     """Get latest earnings report for a company"""
     if not FMP_API_KEY:
         raise HTTPException(status_code=500, detail="FMP_API_KEY not configured")
@@ -116,29 +428,28 @@ async def get_earnings_report(symbol: str):
     url = f"https://financialmodelingprep.com/api/v3/income-statement/{symbol}?limit=1&apikey={FMP_API_KEY}"
     
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data, age = await cached_upstream("earnings", symbol.upper(), url, "fmp", should_cache=has_rows)
         
         if isinstance(data, list) and len(data) > 0:
             report = data[0]
-            return {
+            return respond(request, {
                 "symbol": symbol,
                 "date": report.get('date'),
                 "revenue": report.get('revenue'),
                 "net_income": report.get('netIncome'),
                 "eps": report.get('eps'),
                 "gross_profit": report.get('grossProfit'),
+                "age_seconds": round(age, 1),
                 "status": "success",
                 "source": "fmp"
-            }
+            }, version=report)
         else:
             raise HTTPException(status_code=404, detail=f"No earnings data found for {symbol}")
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}")
 
 @app.get("/news/{company}")
-async def get_company_news(company: str, limit: int = 3):
+async def get_company_news(company: str, request: Request, limit: int = 3):
     """Get latest news for a company"""
     if not NEWS_API_KEY:
         raise HTTPException(status_code=500, detail="NEWS_API_KEY not configured")
@@ -146,9 +457,9 @@ async def get_company_news(company: str, limit: int = 3):
     url = f"https://newsapi.org/v2/everything?q={company}&pageSize={limit}&sortBy=publishedAt&apiKey={NEWS_API_KEY}"
     
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data, age = await cached_upstream(
+            "news", f"{company.lower()}:{limit}", url, "news_api", should_cache=lambda data: data.get("status") == "ok"
+        )
         
         if data.get("status") == "ok":
             articles = []
@@ -161,20 +472,21 @@ async def get_company_news(company: str, limit: int = 3):
                     "source": article.get('source', {}).get('name')
                 })
             
-            return {
+            return respond(request, {
                 "company": company,
                 "articles": articles,
                 "total_results": len(articles),
+                "age_seconds": round(age, 1),
                 "status": "success",
                 "source": "news_api"
-            }
+            }, version=articles)
         else:
             raise HTTPException(status_code=404, detail=f"No news found for {company}")
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}")
 
 @app.get("/dividend/{symbol}")
-async def get_dividend_yield(symbol: str):
+async def get_dividend_yield(symbol: str, request: Request):
     """Get dividend yield for a stock"""
     if not FMP_API_KEY:
         raise HTTPException(status_code=500, detail="FMP_API_KEY not configured")
@@ -182,35 +494,180 @@ async def get_dividend_yield(symbol: str):
     url = f"https://financialmodelingprep.com/api/v3/key-metrics/{symbol}?limit=1&apikey={FMP_API_KEY}"
     
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data, age = await cached_upstream("dividend", symbol.upper(), url, "fmp", should_cache=has_rows)
         
         if isinstance(data, list) and len(data) > 0:
-            metrics = data[0]
-            dividend_yield = metrics.get("dividendYield")
+            dividend_metrics = data[0]
+            dividend_yield = dividend_metrics.get("dividendYield")
             
             if dividend_yield is not None:
-                return {
+                return respond(request, {
                     "symbol": symbol,
                     "dividend_yield": round(dividend_yield * 100, 2),
                     "dividend_yield_decimal": dividend_yield,
-                    "period": metrics.get("period"),
+                    "period": dividend_metrics.get("period"),
+                    "age_seconds": round(age, 1),
                     "status": "success",
                     "source": "fmp"
-                }
+                }, version=dividend_metrics)
             else:
-                return {
+                return respond(request, {
                     "symbol": symbol,
                     "dividend_yield": 0,
                     "message": "No dividend data available",
+                    "age_seconds": round(age, 1),
                     "status": "success",
                     "source": "fmp"
-                }
+                }, version=dividend_metrics)
         else:
             raise HTTPException(status_code=404, detail=f"No metrics found for {symbol}")
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}")
+
+async def fetch_daily_bars(symbol: str, start: date, end: date) -> List[Dict[str, Any]]:
+    """Daily OHLCV bars from Twelve Data's time_series (one credit per request, up to 5000 bars)"""
+    url = (f"https://api.twelvedata.com/time_series?symbol={symbol}&interval=1day&start_date={start}"
+           f"&end_date={end}&outputsize=5000&order=ASC&apikey={TWELVE_DATA_API_KEY}")
+    data = await fetch_json(url, "twelve_data")
+    if data.get("status") == "error":
+        # A range with no trading days (weekend, holiday) is not an error for the store
+        if "no data is available" in data.get("message", "").lower():
+            return []
+        raise ValueError(data.get("message", "Time series request rejected"))
+    return data.get("values", [])
+
+# Daily bars kept on disk; only date ranges not stored yet are fetched
+history = HistoryStore(HISTORY_STORE_DIR, fetch_daily_bars, tail_ttl=HISTORY_TAIL_TTL)
+
+@app.get("/history/{symbol}")
+async def get_price_history(symbol: str, request: Request, start: str = None, end: str = None, interval: str = "1day"):
+    """Get historical OHLCV prices for a stock (dates as YYYY-MM-DD, interval 1day, 1week or 1month)"""
+    if not TWELVE_DATA_API_KEY:
+        raise HTTPException(status_code=500, detail="TWELVE_DATA_API_KEY not configured")
+    if interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be one of {', '.join(INTERVALS)}")
+    try:
+        end_date = date.fromisoformat(end) if end else date.today()
+        start_date = date.fromisoformat(start) if start else end_date - timedelta(days=HISTORY_DEFAULT_DAYS)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be dates in YYYY-MM-DD format")
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    
+    symbol = symbol.upper()
+    try:
+        validate_symbol(symbol)
+    except InvalidSymbol as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        # Nothing to fetch for a range that starts in the future; the query below comes back empty
+        fetched = await history.ensure(symbol, start_date, min(end_date, date.today())) \
+            if start_date <= date.today() else 0
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=f"No price history for {symbol}: {str(e)}")
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}")
+    
+    start_time = time.perf_counter()
+    bars = history.query(symbol, start_date, end_date, interval)
+    query_us = (time.perf_counter() - start_time) * 1e6
+    meta = history.meta(symbol)
+    return respond(request, {
+        "symbol": symbol,
+        "interval": interval,
+        "start": start_date.isoformat(),
+        "end": end_date.isoformat(),
+        "count": len(bars["date"]),
+        "dates": np.datetime_as_string(bars["date"]).tolist(),
+        "open": bars["open"].tolist(),
+        "high": bars["high"].tolist(),
+        "low": bars["low"].tolist(),
+        "close": bars["close"].tolist(),
+        "volume": bars["volume"].tolist(),
+        "fetched_bars": fetched,
+        "query_us": round(query_us, 1),
+        "status": "success",
+        "source": "local_store" if fetched == 0 else "twelve_data"
+    }, version=[symbol, interval, start_date.isoformat(), end_date.isoformat(), meta["updated"] if meta else None])
+
+@app.get("/indicators")
+async def get_technical_indicators(symbols: str, request: Request, indicators: str = DEFAULT_INDICATORS,
+                                   start: str = None, end: str = None, points: int = 1):
+    """Get technical indicators (sma, ema, rsi, macd, bollinger, atr, volatility; optional period as in sma_50)
+    for several comma-separated symbols, computed from daily closes. Returns the last `points` values of each."""
+    if not TWELVE_DATA_API_KEY:
+        raise HTTPException(status_code=500, detail="TWELVE_DATA_API_KEY not configured")
+    requested = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(requested) > INDICATOR_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {INDICATOR_MAX_SYMBOLS} symbols per request")
+    names = [name for name in indicators.split(",") if name.strip()]
+    try:
+        for symbol in requested:
+            validate_symbol(symbol)
+        parse_indicators(names)
+        end_date = date.fromisoformat(end) if end else date.today()
+        start_date = date.fromisoformat(start) if start else end_date - timedelta(days=INDICATOR_LOOKBACK_DAYS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    # Backfill every symbol concurrently; symbols that fail become per-symbol errors
+    outcomes = await asyncio.gather(
+        *(history.ensure(symbol, start_date, min(end_date, date.today())) for symbol in requested),
+        return_exceptions=True,
+    )
+    series, errors, fetched, rejected = {}, {}, 0, None
+    for symbol, outcome in zip(requested, outcomes):
+        if isinstance(outcome, QuotaExceeded):
+            rejected = outcome
+            errors[symbol] = str(outcome)
+        elif isinstance(outcome, (ValueError, httpx.HTTPError)):
+            errors[symbol] = f"No price history: {str(outcome)}"
+        elif isinstance(outcome, Exception):
+            raise outcome
+        else:
+            fetched += outcome
+            bars = history.query(symbol, start_date, end_date)
+            if len(bars["date"]):
+                series[symbol] = bars
+            else:
+                errors[symbol] = "No price history in range"
+    if rejected is not None and not series:
+        raise rejected
+
+    start_time = time.perf_counter()
+    dates, columns = align(series)
+    results = compute(columns, names)
+    compute_us = (time.perf_counter() - start_time) * 1e6
+
+    # Trailing values per symbol and indicator; NaN (not enough history yet) becomes null
+    points = max(1, min(points, len(dates))) if len(dates) else 0
+    tail = slice(len(dates) - points, len(dates))
+    outputs = {"close": columns["close"], **results}
+    values = {
+        symbol: {
+            label: [None if math.isnan(value) else value for value in output[row, tail].tolist()]
+            for label, output in outputs.items()
+        }
+        for row, symbol in enumerate(series)
+    }
+    return respond(request, {
+        "symbols": requested,
+        "indicators": list(results),
+        "start": start_date.isoformat(),
+        "end": end_date.isoformat(),
+        "bars": len(dates),
+        "dates": np.datetime_as_string(dates[tail]).tolist(),
+        "values": values,
+        "errors": errors,
+        "fetched_bars": fetched,
+        "compute_us": round(compute_us, 1),
+        "status": "success" if not errors else ("partial" if series else "error"),
+        "source": "local_store" if fetched == 0 else "twelve_data"
+    }, version=[values, errors, np.datetime_as_string(dates[tail]).tolist()])
 
 # Health check endpoint
 @app.get("/")
@@ -224,12 +681,68 @@ async def root():
         "mcp": "/mcp",
         "endpoints": {
             "stock": "/stock/{symbol}",
+            "stocks": "/stocks?symbols=AAPL,MSFT",
             "earnings": "/earnings/{symbol}",
             "news": "/news/{company}",
-            "dividend": "/dividend/{symbol}"
-        }
+            "dividend": "/dividend/{symbol}",
+            "history": "/history/{symbol}?start=2024-01-01&interval=1week",
+            "indicators": "/indicators?symbols=AAPL,MSFT&indicators=rsi,sma_50,macd",
+            "price_stream": "/ws/prices?symbols=AAPL,MSFT"
+        },
+        "http_pool": http_client.stats()
     }
 
+# Operational metrics, hidden from the schema so it is not exposed as an MCP tool
+@app.get("/stats", include_in_schema=False)
+async def stats():
+    """Upstream cache hit ratio, quota usage, price stream fan-out and HTTP connection pool usage"""
+    return {
+        "cache": upstream_cache.stats(),
+        "watchlist": watchlist.stats(),
+        "streaming": price_stream.stats(),
+        "quotas": quotas.stats(),
+        "history": history.stats(),
+        "http_pool": http_client.stats()
+    }
+
+# Scrape-time views of the cache, quotas, watchlist and price stream
+metrics.collect("api_cache_lookups_total", "Upstream cache lookups", ("endpoint", "result"), lambda: {
+    (endpoint, result): counts[result]
+    for endpoint, counts in upstream_cache.stats()["endpoints"].items() for result in ("hits", "misses", "coalesced")
+}, kind="counter")
+metrics.collect("upstream_quota_remaining", "Calls left in each provider quota window", ("provider", "window"), lambda: {
+    (provider, f"{window['window_seconds']:g}s"): window["remaining"]
+    for provider, quota in quotas.stats().items() for window in quota["windows"]
+})
+metrics.collect("upstream_quota_queued", "Calls waiting for provider quota", ("provider",), lambda: {
+    (provider,): quota["queued"] for provider, quota in quotas.stats().items()
+})
+metrics.collect("upstream_quota_rejected_total", "Calls rejected with 429 before reaching a provider",
+                ("provider", "priority"), lambda: {
+    (provider, priority): quota[priority]["rejected"]
+    for provider, quota in quotas.stats().items() for priority in ("interactive", "background")
+}, kind="counter")
+metrics.collect("watchlist_oldest_age_seconds", "Age of the stalest watched value per feed", ("feed",), lambda: {
+    (feed,): stats["oldest_age"] for feed, stats in watchlist.stats()["feeds"].items()
+})
+metrics.collect("history_store_bytes", "Disk used by the local price history store", (), lambda: {
+    (): history.stats()["bytes"]
+})
+metrics.collect("history_store_bars_fetched_total", "Daily bars backfilled from the provider", (), lambda: {
+    (): history.counts["bars_fetched"]
+}, kind="counter")
+metrics.collect("price_stream_clients", "Connected WebSocket price stream clients", (), lambda: {
+    (): price_stream.clients
+})
+metrics.collect("price_stream_symbols", "Symbols with an active price poller", (), lambda: {
+    (): price_stream.stats()["symbols"]
+})
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text format; hidden from the schema so it is not exposed as an MCP tool"""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
 # Add MCP integration (this is the magic!)
 mcp = FastApiMCP(
     app,
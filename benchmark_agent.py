@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Agent Benchmark for Financial Copilot
+Compares latency and LLM calls of the agent modes on multi-tool queries,
+and queries per second of the async path at several concurrency levels
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    from agent.agent_executor import FinancialAgentExecutor
+except ImportError:
+    from agent_executor import FinancialAgentExecutor
+
+# Queries that need several tools across several companies
+BENCHMARK_QUERIES = [
+    "Compare Apple and Microsoft as investment opportunities using their latest prices, earnings and news",
+    "Get current prices for AAPL, MSFT, and GOOGL and compare them",
+    "Show me earnings data and the latest news for TSLA and NVDA",
+]
+
+
+def benchmark_modes(modes, queries=BENCHMARK_QUERIES, repeats: int = 1):
+    """Run every query in every mode and report latency and LLM calls per mode"""
+    print("🏁 AGENT MODE BENCHMARK")
+    print("=" * 50)
+
+    agent = FinancialAgentExecutor(warm_up=False)
+    results = {}
+
+    for mode in modes:
+        print(f"\n🧪 Mode: {mode}")
+        runs = []
+        for query in queries:
+            for _ in range(repeats):
+                # Start cold so no mode benefits from another's cached tool results
+                if agent.tool_cache:
+                    agent.tool_cache.clear()
+                agent.memory.clear()
+
+                start_time = time.time()
+                result = agent.process_query(query, mode=mode)
+                elapsed = time.time() - start_time
+                runs.append({
+                    "time": elapsed,
+                    "llm_calls": result.get("usage", {}).get("calls", 0),
+                    "tokens": result.get("usage", {}).get("total_tokens", 0),
+                    "success": result.get("status") == "success",
+                })
+                print(f"  ⏱️ {elapsed:.2f}s, {runs[-1]['llm_calls']} LLM calls - {query[:50]}...")
+        results[mode] = runs
+
+    print("\n📊 RESULTS:")
+    print("=" * 50)
+    for mode, runs in results.items():
+        count = len(runs)
+        print(f"\n{mode.upper()}:")
+        print(f"  Average Time: {sum(r['time'] for r in runs) / count:.2f}s")
+        print(f"  Average LLM Calls: {sum(r['llm_calls'] for r in runs) / count:.1f}")
+        print(f"  Average Tokens: {sum(r['tokens'] for r in runs) / count:.0f}")
+        print(f"  Success Rate: {sum(1 for r in runs if r['success']) / count * 100:.1f}%")
+    return results
+
+
+# Mixed load for the throughput benchmark: fast-path lookups, agent queries, direct LLM answers
+THROUGHPUT_QUERIES = [
+    "What is the stock price of AAPL?",
+    "Get current prices for MSFT and GOOGL",
+    "Show me the latest news for TSLA",
+    "Explain what a price-to-earnings ratio is",
+]
+
+
+async def _run_concurrently(agent, queries, concurrency: int):
+    """Answer all queries with at most `concurrency` in flight; returns per-query (latency, success)"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(query):
+        async with semaphore:
+            start_time = time.perf_counter()
+            result = await agent.aprocess_query(query)
+            return time.perf_counter() - start_time, result.get("status") == "success"
+
+    return await asyncio.gather(*(run(query) for query in queries))
+
+
+def benchmark_throughput(levels, queries=THROUGHPUT_QUERIES, total: int = 40):
+    """Queries per second of aprocess_query on one event loop at each concurrency level"""
+    print("🏁 ASYNC THROUGHPUT BENCHMARK")
+    print("=" * 50)
+
+    agent = FinancialAgentExecutor(warm_up=False)
+    workload = [queries[i % len(queries)] for i in range(total)]
+
+    async def run_levels():
+        results = {}
+        try:
+            for concurrency in levels:
+                # Start cold so every level does the same tool work
+                if agent.tool_cache:
+                    agent.tool_cache.clear()
+                agent.memory.clear()
+
+                start_time = time.perf_counter()
+                runs = await _run_concurrently(agent, workload, concurrency)
+                elapsed = time.perf_counter() - start_time
+                latencies = sorted(latency for latency, _ in runs)
+                results[concurrency] = {
+                    "qps": len(runs) / elapsed,
+                    "p50": latencies[len(latencies) // 2],
+                    "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                    "success": sum(1 for _, ok in runs if ok) / len(runs),
+                }
+                print(f"  ⏱️ concurrency {concurrency}: {results[concurrency]['qps']:.2f} queries/s")
+        finally:
+            await agent.aclose()
+        return results
+
+    results = asyncio.run(run_levels())
+
+    print("\n📊 RESULTS:")
+    print("=" * 50)
+    print(f"{'Concurrency':>11} {'QPS':>8} {'p50 (s)':>8} {'p95 (s)':>8} {'Success':>8}")
+    for concurrency, r in results.items():
+        print(f"{concurrency:>11} {r['qps']:>8.2f} {r['p50']:>8.2f} {r['p95']:>8.2f} {r['success'] * 100:>7.1f}%")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Financial Copilot agent modes")
+    parser.add_argument("--modes", nargs="+", default=["react", "plan"],
+                        help="agent modes to compare (react, parallel, plan)")
+    parser.add_argument("--repeats", type=int, default=1, help="runs per query")
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        help="measure async queries/second at these concurrency levels instead")
+    parser.add_argument("--total", type=int, default=40, help="queries per concurrency level")
+    args = parser.parse_args()
+
+    if not (os.getenv("GOOGLE_API_KEY") or os.getenv("ANTHROPIC_API_KEY")):
+        print("❌ No API keys found. Please set GOOGLE_API_KEY or ANTHROPIC_API_KEY")
+        return
+
+    if args.concurrency:
+        benchmark_throughput(args.concurrency, total=args.total)
+    else:
+        benchmark_modes(args.modes, repeats=args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+API Benchmark for Financial Copilot
+Load tests the financial data API server at increasing concurrency levels
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import threading
+import time
+from datetime import date, timedelta
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+LOAD_PATHS = ["/stock/AAPL", "/earnings/MSFT", "/news/Tesla", "/dividend/KO"]
+# Distinct symbols per request, so concurrent requests are not coalesced into one upstream call
+MOCK_LOAD_PATHS = ["/stock/S{i}", "/earnings/E{i}", "/news/N{i}", "/dividend/D{i}"]
+
+
+def mock_upstream(latency: float) -> httpx.MockTransport:
+    """Stand-in for Twelve Data / FMP / News API answering after `latency` seconds"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        host, path = request.url.host, request.url.path
+        if "twelvedata" in host and path.endswith("time_series"):
+            return httpx.Response(200, json=mock_time_series(request.url.params))
+        if "twelvedata" in host:
+            # Prices drift so streaming clients see updates; comma-separated symbols get a batch response
+            symbols = request.url.params.get("symbol", "").split(",")
+            quotes = {symbol: {"price": f"{100 + random.uniform(-5, 5):.2f}"} for symbol in symbols}
+            return httpx.Response(200, json=quotes if len(symbols) > 1 else quotes[symbols[0]])
+        if "newsapi" in host:
+            articles = [{
+                "title": f"Benchmark headline {i}",
+                "description": "Shares moved after the company reported quarterly revenue ahead of analyst estimates.",
+                "publishedAt": "2025-01-15T14:30:00Z",
+                "url": f"https://news.example.com/markets/{i}",
+                "source": {"name": "Example Wire"},
+            } for i in range(int(request.url.params.get("pageSize", "3")))]
+            return httpx.Response(200, json={"status": "ok", "articles": articles})
+        if "key-metrics" in path:
+            return httpx.Response(200, json=[{"dividendYield": 0.0051, "period": "FY"}])
+        return httpx.Response(200, json=[{"date": "2024-12-31", "revenue": 1000, "netIncome": 100, "eps": 1.5}])
+    return httpx.MockTransport(handler)
+
+
+def mock_time_series(params) -> dict:
+    """Daily bars on weekdays between start_date and end_date, as Twelve Data's time_series returns them"""
+    start, end = date.fromisoformat(params["start_date"]), date.fromisoformat(params["end_date"])
+    values, day = [], start
+    while day <= end:
+        if day.weekday() < 5:
+            close = 100 + 10 * math.sin(day.toordinal() / 30)
+            values.append({"datetime": day.isoformat(), "open": f"{close - 0.5:.2f}", "high": f"{close + 1:.2f}",
+                           "low": f"{close - 1:.2f}", "close": f"{close:.2f}", "volume": "1000000"})
+        day += timedelta(days=1)
+    if not values:
+        return {"status": "error", "code": 400, "message": "No data is available on the specified dates."}
+    return {"status": "ok", "values": values}
+
+
+def make_client(base_url: str, upstream_latency: float = None, cache: bool = True) -> httpx.AsyncClient:
+    """Client for a running server, or for api_server in-process with mocked upstream APIs"""
+    if upstream_latency is None:
+        return httpx.AsyncClient(base_url=base_url, timeout=60,
+                                 limits=httpx.Limits(max_connections=None, max_keepalive_connections=None))
+    api_server = load_mocked_api_server(upstream_latency)
+    if not cache:
+        api_server.upstream_cache.ttls = {}  # TTL 0: nothing is stored, every request reaches the mock
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api_server.app), base_url="http://api", timeout=60)
+
+
+def load_mocked_api_server(upstream_latency: float):
+    """Import api_server with placeholder API keys and its upstream calls routed to mock_upstream"""
+    for key in ("TWELVE_DATA_API_KEY", "FMP_API_KEY", "NEWS_API_KEY"):
+        os.environ.setdefault(key, "benchmark")
+    import api_server
+    from tools.http_client import http_client
+    api_server.TWELVE_DATA_API_KEY = api_server.TWELVE_DATA_API_KEY or "benchmark"
+    api_server.FMP_API_KEY = api_server.FMP_API_KEY or "benchmark"
+    api_server.NEWS_API_KEY = api_server.NEWS_API_KEY or "benchmark"
+    http_client.async_transport = mock_upstream(upstream_latency)
+    api_server.quotas.providers.clear()  # The mock has no rate limits
+    return api_server
+
+
+async def _load_level(client: httpx.AsyncClient, paths, total: int, concurrency: int):
+    """Send `total` requests with `concurrency` in flight; returns (elapsed, latencies, errors)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(index: int):
+        nonlocal errors
+        async with semaphore:
+            start_time = time.perf_counter()
+            try:
+                # "{i}" in a path becomes the request number, so each request can ask for a different symbol
+                response = await client.get(paths[index % len(paths)].replace("{i}", str(index)))
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start_time, sorted(latencies), errors
+
+
+def benchmark_load(base_url: str, paths, levels, total: int, upstream_latency: float = None):
+    """Throughput and latency per concurrency level; ideally throughput grows with concurrency"""
+    print("🏁 API LOAD TEST")
+    print("=" * 50)
+    target = f"in-process api_server, mocked upstream {upstream_latency * 1000:.0f}ms, upstream cache off" \
+        if upstream_latency is not None else base_url
+    print(f"🎯 Target: {target} ({', '.join(paths)})")
+
+    async def run_levels():
+        results = {}
+        # Mocked runs measure concurrent upstream calls, so cache hits must not answer them
+        async with make_client(base_url, upstream_latency, cache=False) as client:
+            for concurrency in levels:
+                elapsed, latencies, errors = await _load_level(client, paths, total, concurrency)
+                results[concurrency] = {
+                    "rps": total / elapsed,
+                    "p50": latencies[len(latencies) // 2],
+                    "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                    "errors": errors,
+                }
+                print(f"  ⏱️ concurrency {concurrency}: {results[concurrency]['rps']:.1f} req/s")
+        return results
+
+    results = asyncio.run(run_levels())
+
+    print("\n📊 RESULTS:")
+    print("=" * 50)
+    baseline = next(iter(results.values()))["rps"]
+    print(f"{'Concurrency':>11} {'Req/s':>9} {'Speedup':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'Errors':>7}")
+    for concurrency, r in results.items():
+        print(f"{concurrency:>11} {r['rps']:>9.1f} {r['rps'] / baseline:>7.1f}x "
+              f"{r['p50'] * 1000:>9.1f} {r['p95'] * 1000:>9.1f} {r['errors']:>7}")
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(upstream_latency: float, poll_interval: float):
+    """api_server on its own thread and event loop (one worker), upstream APIs mocked; returns (ws_url, server)"""
+    import uvicorn
+    os.environ["WATCHLIST"] = ""  # every poll should reach the (mocked) upstream
+    api_server = load_mocked_api_server(upstream_latency)
+    api_server.upstream_cache.ttls = {}  # nor be answered from the upstream cache
+    api_server.price_stream.poll_interval = poll_interval
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(api_server.app, host="127.0.0.1", port=port,
+                                           log_level="warning", backlog=4096))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"ws://127.0.0.1:{port}", server
+
+
+def benchmark_stream(base_url: str, clients: int, symbols, duration: float,
+                     upstream_latency: float = None, poll_interval: float = 1.0):
+    """Connect many subscribers to /ws/prices and measure delivered updates, fan-out lag and upstream polls"""
+    from websockets.asyncio.client import connect
+
+    print("📡 PRICE STREAM TEST")
+    print("=" * 50)
+    server = None
+    if upstream_latency is not None:
+        base_url, server = start_mock_server(upstream_latency, poll_interval)
+        print(f"🎯 Target: in-process api_server, mocked upstream {upstream_latency * 1000:.0f}ms, "
+              f"polling every {poll_interval:g}s")
+    else:
+        print(f"🎯 Target: {base_url}")
+    print(f"👥 {clients} clients over {len(symbols)} symbols for {duration:g}s")
+
+    received, lags, failures = [0], [], [0]
+
+    async def client(index: int, ready: asyncio.Event):
+        symbol = symbols[index % len(symbols)]
+        try:
+            async with connect(f"{base_url}/ws/prices?symbols={symbol}", open_timeout=60,
+                               ping_interval=None, max_queue=None) as websocket:
+                ready.set()
+                while True:
+                    message = json.loads(await websocket.recv())
+                    if message.get("type") == "price":
+                        received[0] += 1
+                        lags.append(time.time() - message["ts"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            failures[0] += 1
+            ready.set()
+
+    async def run():
+        start_time = time.perf_counter()
+        ready = [asyncio.Event() for _ in range(clients)]
+        tasks = []
+        for index in range(clients):
+            tasks.append(asyncio.ensure_future(client(index, ready[index])))
+            if index % 200 == 199:
+                await asyncio.sleep(0)
+        await asyncio.gather(*(event.wait() for event in ready))
+        connect_time = time.perf_counter() - start_time
+        print(f"  🔌 {clients - failures[0]} connected in {connect_time:.1f}s")
+        received[0] = 0
+        lags.clear()
+        await asyncio.sleep(duration)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(run())
+
+    stream_stats = None
+    if server is not None:
+        import api_server
+        stream_stats = api_server.price_stream.stats()
+        server.should_exit = True
+    else:
+        try:
+            stats_url = base_url.replace("ws", "http", 1) + "/stats"
+            stream_stats = httpx.get(stats_url, timeout=10).json().get("streaming")
+        except (httpx.HTTPError, ValueError):
+            pass
+
+    lags.sort()
+    print("\n📊 RESULTS:")
+    print("=" * 50)
+    print(f"Connected clients:     {clients - failures[0]}/{clients}")
+    print(f"Price updates received: {received[0]} ({received[0] / duration:.0f}/s)")
+    if lags:
+        print(f"Fan-out lag p50/p95/p99: {lags[len(lags) // 2] * 1000:.1f} / "
+              f"{lags[int(len(lags) * 0.95)] * 1000:.1f} / {lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000:.1f} ms")
+    if stream_stats:
+        print(f"Upstream polls:        {stream_stats['polls']} for {len(symbols)} symbols "
+              f"(slow clients disconnected: {stream_stats['slow_disconnects']})")
+        if server is not None:
+            print(f"Polling clients would need ~{int(clients * duration / poll_interval)} requests")
+    return {"received": received[0], "failures": failures[0], "lags": lags, "stream": stream_stats}
+
+
+def benchmark_wire(paths, iterations: int = 2000):
+    """Bytes on the wire (identity, gzip, br, 304 revalidation) and JSON serialization CPU per response"""
+    from fastapi.encoders import jsonable_encoder
+    from api import wire
+
+    print("📦 WIRE FORMAT TEST")
+    print("=" * 50)
+    print(f"🎯 Target: in-process api_server, mocked upstream "
+          f"(serializer: {'orjson' if wire.orjson else 'json'}, brotli: {'yes' if wire.brotli else 'not installed'})")
+
+    def stdlib_render(content):
+        # What FastAPI's default JSONResponse does for a returned dict
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                          indent=None, separators=(",", ":")).encode("utf-8")
+
+    def cpu_per_call(function, content) -> float:
+        start_time = time.process_time()
+        for _ in range(iterations):
+            function(content)
+        return (time.process_time() - start_time) / iterations
+
+    async def measure(client, path):
+        identity = await client.get(path, headers={"Accept-Encoding": "identity"})
+        sizes = {"identity": identity.num_bytes_downloaded}
+        for encoding in ("gzip", "br"):
+            response = await client.get(path, headers={"Accept-Encoding": encoding})
+            if response.headers.get("content-encoding") == encoding:
+                sizes[encoding] = response.num_bytes_downloaded
+        etag = identity.headers.get("etag")
+        if etag:
+            revalidated = await client.get(path, headers={"If-None-Match": etag})
+            if revalidated.status_code == 304:
+                sizes["304"] = revalidated.num_bytes_downloaded
+        content = identity.json()
+        return sizes, cpu_per_call(stdlib_render, content), cpu_per_call(wire.dumps, content)
+
+    async def run():
+        async with make_client("http://api", 0) as client:
+            return {path: await measure(client, path) for path in paths}
+
+    results = asyncio.run(run())
+
+    print("\n📊 RESULTS (body bytes per response; serialization CPU per response):")
+    print("=" * 50)
+    print(f"{'Path':<32} {'JSON':>7} {'gzip':>7} {'br':>7} {'304':>5} {'json+encoder':>13} {'fast':>9}")
+    for path, (sizes, before, after) in results.items():
+        column = lambda key: str(sizes[key]) if key in sizes else "-"
+        label = path if len(path) <= 32 else path[:29] + "..."
+        print(f"{label:<32} {column('identity'):>7} {column('gzip'):>7} {column('br'):>7} {column('304'):>5} "
+              f"{before * 1e6:>11.1f}us {after * 1e6:>7.1f}us")
+    return results
+
+
+def benchmark_indicators(symbols: int, years: float, names, repeats: int = 3, sample: int = 20):
+    """Indicator engine on synthetic random-walk bars: one vectorized call for all symbols vs one call per symbol"""
+    import numpy as np
+    from analytics.indicators import compute
+
+    days = int(years * 252)
+    print("📈 TECHNICAL INDICATOR TEST")
+    print("=" * 50)
+    print(f"🎯 {symbols} symbols x {days} daily bars ({symbols * days / 1e6:.1f}M bars), "
+          f"indicators: {', '.join(names)}")
+
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, (symbols, days)), axis=1))
+    spread = np.abs(rng.normal(0, 0.01, (symbols, days)))
+    # A quarter of the symbols have shorter histories (NaN before their first bar), as after align()
+    listed = rng.integers(0, days // 2, symbols // 4)
+    close[:symbols // 4][np.arange(days) < listed[:, None]] = np.nan
+    bars = {"close": close, "high": close * (1 + spread), "low": close * (1 - spread)}
+
+    def best_of(function) -> float:
+        timings = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start_time)
+        return min(timings)
+
+    timings = {name: best_of(lambda: compute(bars, [name])) for name in names}
+    total = best_of(lambda: compute(bars, names))
+    rows = range(min(sample, symbols))
+    per_symbol = best_of(lambda: [compute({key: values[row] for key, values in bars.items()}, names)
+                                  for row in rows]) / len(rows) * symbols
+
+    print(f"\n📊 RESULTS (best of {repeats}):")
+    print("=" * 50)
+    for name, seconds in timings.items():
+        print(f"{name:<12} {seconds * 1000:>8.1f} ms")
+    print(f"{'all':<12} {total * 1000:>8.1f} ms  ({symbols * days / total / 1e6:.1f}M bars/s)")
+    print(f"One call per symbol (extrapolated from {len(rows)}): {per_symbol * 1000:.0f} ms "
+          f"({per_symbol / total:.1f}x slower)")
+    return {"indicators": timings, "all": total, "per_symbol": per_symbol}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Financial Copilot API server")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    load = subcommands.add_parser("load", help="throughput and latency at increasing concurrency")
+    load.add_argument("--url", default=os.getenv("EXTERNAL_API_URL", "http://localhost:8000"),
+                      help="base URL of a running API server")
+    load.add_argument("--paths", nargs="+", help="paths to request in turn; {i} is replaced by the request number "
+                      "(default: fixed symbols, or a new symbol per request with --mock-upstream)")
+    load.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    load.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    load.add_argument("--mock-upstream", type=float, metavar="SECONDS",
+                      help="run api_server in-process with upstream APIs mocked at this latency")
+
+    stream = subcommands.add_parser("stream", help="WebSocket price stream fan-out to many subscribers")
+    stream.add_argument("--url", default=os.getenv("EXTERNAL_API_URL", "http://localhost:8000").replace("http", "ws", 1),
+                        help="base ws:// URL of a running API server")
+    stream.add_argument("--clients", type=int, default=2000)
+    stream.add_argument("--symbols", nargs="+", default=["AAPL", "MSFT", "GOOG", "AMZN", "TSLA",
+                                                         "NVDA", "META", "JPM", "V", "UNH"])
+    stream.add_argument("--duration", type=float, default=15, help="seconds to listen after connecting")
+    stream.add_argument("--poll-interval", type=float, default=1.0,
+                        help="server poll interval with --mock-upstream (STREAM_POLL_INTERVAL otherwise)")
+    stream.add_argument("--mock-upstream", type=float, metavar="SECONDS",
+                        help="run api_server in-process with upstream APIs mocked at this latency")
+
+    wire = subcommands.add_parser("wire", help="response size with compression / 304s, and serialization CPU")
+    wire.add_argument("--paths", nargs="+", default=["/news/Tesla?limit=50", "/stocks?symbols=" + ",".join(
+        f"S{i}" for i in range(40)), "/earnings/MSFT", "/stock/AAPL"])
+    wire.add_argument("--iterations", type=int, default=2000, help="serializations timed per response")
+
+    indicators = subcommands.add_parser("indicators", help="vectorized technical indicators over many symbols")
+    indicators.add_argument("--symbols", type=int, default=2000)
+    indicators.add_argument("--years", type=float, default=10, help="years of daily bars per symbol")
+    indicators.add_argument("--indicators", nargs="+",
+                            default=["sma", "ema", "rsi", "macd", "bollinger", "atr", "volatility"])
+    indicators.add_argument("--repeats", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.command == "load":
+        paths = args.paths or (MOCK_LOAD_PATHS if args.mock_upstream is not None else LOAD_PATHS)
+        benchmark_load(args.url, paths, args.concurrency, args.requests, args.mock_upstream)
+    elif args.command == "wire":
+        benchmark_wire(args.paths, args.iterations)
+    elif args.command == "indicators":
+        benchmark_indicators(args.symbols, args.years, args.indicators, args.repeats)
+    elif args.command == "stream":
+        benchmark_stream(args.url, args.clients, [s.upper() for s in args.symbols], args.duration,
+                         args.mock_upstream, args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
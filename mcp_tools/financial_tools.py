@@ -1,6 +1,7 @@
 from dotenv import load_dotenv
 import os
-import requests
+
+from tools.http_client import http_client
 
 TWELVE_DATA_API_KEY = os.getenv("TWELVE_DATA_API_KEY")
 FMP_API_KEY = os.getenv("FMP_API_KEY")
@@ -8,7 +9,7 @@ NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 
 def get_stock_price(symbol: str) -> str:
     url = f"https://api.twelvedata.com/price?symbol={symbol}&apikey={TWELVE_DATA_API_KEY}"
-    response = requests.get(url)
+    response = http_client.get(url)
     data = response.json()
 
     if "price" in data:
@@ -18,7 +19,7 @@ def get_stock_price(symbol: str) -> str:
 
 def get_earnings_report(symbol: str) -> str:
     url = f"https://financialmodelingprep.com/api/v3/income-statement/{symbol}?limit=1&apikey={FMP_API_KEY}"
-    response = requests.get(url)
+    response = http_client.get(url)
     data = response.json()
 
     if isinstance(data, list) and len(data) > 0:
@@ -39,7 +40,7 @@ def get_company_news(company: str) -> list:
         f"https://newsapi.org/v2/everything?"
         f"q={company}&pageSize=5&sortBy=publishedAt&apiKey={NEWS_API_KEY}"
     )
-    response = requests.get(url)
+    response = http_client.get(url)
     data = response.json()
 
     if data.get("status") == "ok":
@@ -58,7 +59,7 @@ def get_company_news(company: str) -> list:
 
 def get_dividend_yield(symbol: str) -> str:
     url = f"https://financialmodelingprep.com/api/v3/key-metrics/{symbol}?limit=1&apikey={FMP_API_KEY}"
-    response = requests.get(url)
+    response = http_client.get(url)
     data = response.json()
 
     if isinstance(data, list) and len(data) > 0:
@@ -3,6 +3,10 @@ from typing import Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_anthropic import ChatAnthropic
 
+from models.model_router import MODEL_TIERS, ModelRouter
+from models.rate_limiter import RateLimitedChatModel, get_rate_limiter
+from models.usage_tracker import UsageCallbackHandler, usage_tracker
+
 
 def get_google_api_key():
     """Get API key from Colab secrets or fallback"""
@@ -13,12 +17,22 @@ def get_google_api_key():
         # Fallback to environment variable
         return os.getenv('GOOGLE_API_KEY')
 
+class RateLimitedChatGoogleGenerativeAI(RateLimitedChatModel, ChatGoogleGenerativeAI):
+    """Gemini client whose upstream calls hold a shared rate-limiter slot"""
+
+
+class RateLimitedChatAnthropic(RateLimitedChatModel, ChatAnthropic):
+    """Claude client whose upstream calls hold a shared rate-limiter slot"""
+
+
 class HybridModelProvider:
     """Provides unified interface for Gemini and Claude models"""
     
     def __init__(self):
-        self.backend = os.getenv("LLM_BACKEND", "gemini").lower()
+        self.backend = os.getenv("LLM_BACKEND", "gemini").strip().lower()
         self.model_cache = {}
+        self.router = ModelRouter(backend=self.backend)
+        self.rate_limiting = os.getenv("LLM_RATE_LIMITING", "true").lower() == "true"
 
     def get_llm(self, backend: Optional[str] = None, **kwargs):
         """Get LLM instance based on backend selection"""
@@ -31,22 +45,36 @@ class HybridModelProvider:
         else:
             raise ValueError(f"Unsupported backend: {backend}. Use 'gemini' or 'claude'")
 
+    def get_llm_for_query(self, query: str, backend: Optional[str] = None, needs_tools: bool = False):
+        """Route a query to the fast or strong tier and return (llm, decision)"""
+        backend = backend or self.backend
+        decision = self.router.route(query, backend, needs_tools)
+        return self.get_cached_llm(backend, decision.model), decision
+
+    def get_cached_llm(self, backend: str, model_name: str):
+        """Reuse one client per (backend, model) pair"""
+        key = (backend, model_name)
+        if key not in self.model_cache:
+            self.model_cache[key] = self.get_llm(backend, model_name=model_name)
+        return self.model_cache[key]
+
     def _get_gemini_llm(self, **kwargs):
         """Initialize Google Gemini model with Colab secrets support"""
         api_key = get_google_api_key()
         if not api_key:
             raise ValueError("Google API key not found in Colab secrets or environment")
         
-        model_name = kwargs.get("model_name", "gemini-2.5-flash")
+        model_name = kwargs.get("model_name", MODEL_TIERS["gemini"]["fast"])
         temperature = kwargs.get("temperature", 0.1)
         
         print(f"🚀 Loading Gemini model: {model_name}")
         
-        return ChatGoogleGenerativeAI(
+        return RateLimitedChatGoogleGenerativeAI(
             model=model_name,
             temperature=temperature,
             google_api_key=api_key,
-            convert_system_message_to_human=True
+            convert_system_message_to_human=True,
+            **self._get_instrumentation("gemini", model_name, kwargs)
         )
 
     def _get_claude_llm(self, **kwargs):
@@ -54,20 +82,34 @@ class HybridModelProvider:
         if not api_key:
             raise RuntimeError("ANTHROPIC_API_KEY not set")
 
-        model = kwargs.get("model_name", "claude-3-haiku-20240307")   # safe default
+        model = kwargs.get("model_name", MODEL_TIERS["claude"]["fast"])   # safe default
         temperature = kwargs.get("temperature", 0.1)
 
         # NEVER pass 'tools' here – LangChain adds them later
-        return ChatAnthropic(
+        return RateLimitedChatAnthropic(
             anthropic_api_key=api_key,
             model=model,
             temperature=temperature,
             max_tokens=1024,
+            **self._get_instrumentation("claude", model, kwargs),
         )
 
+    def _get_instrumentation(self, backend: str, model: str, kwargs):
+        """Usage accounting and shared rate limiting for a new LLM client"""
+        callbacks = [UsageCallbackHandler(usage_tracker, backend, model)]
+        instrumentation = {}
+        if self.rate_limiting:
+            instrumentation["slot_limiter"] = get_rate_limiter(backend, model)
+        instrumentation["callbacks"] = callbacks + list(kwargs.get("callbacks") or [])
+        return instrumentation
+
 # Global instance for easy access
 model_provider = HybridModelProvider()
 
 def get_llm(backend: Optional[str] = None, **kwargs):
     """Convenience function to get LLM instance"""
-    return model_provider.get_llm(backend, **kwargs)
\ No newline at end of file
+    return model_provider.get_llm(backend, **kwargs)
+
+def get_llm_for_query(query: str, backend: Optional[str] = None, needs_tools: bool = False):
+    """Convenience function to get a routed LLM and its RoutingDecision"""
+    return model_provider.get_llm_for_query(query, backend, needs_tools)
@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional
+
+from tools.entities import count_entities
+
+# Fast tier keeps the existing defaults; strong tier is used for complex analyses
+MODEL_TIERS = {
+    "gemini": {
+        "fast": os.getenv("GEMINI_FAST_MODEL", "gemini-2.5-flash"),
+        "strong": os.getenv("GEMINI_STRONG_MODEL", "gemini-2.5-pro"),
+    },
+    "claude": {
+        "fast": os.getenv("CLAUDE_FAST_MODEL", "claude-3-haiku-20240307"),
+        "strong": os.getenv("CLAUDE_STRONG_MODEL", "claude-3-5-sonnet-20241022"),
+    },
+}
+
+ANALYSIS_KEYWORDS = [
+    "analyze", "analyse", "analysis", "compare", "comparison", "evaluate", "versus", " vs ",
+    "strategy", "portfolio", "risk", "pros and cons", "outlook", "forecast", "recommend",
+    "should i", "why", "impact", "diversif", "valuation", "overvalued", "undervalued",
+    "invest", "opportunit", "factor", "volatil", "sentiment", "moat", "interpret",
+]
+
+
+@dataclass
+class RoutingDecision:
+    """A routing choice and, once recorded, its outcome"""
+    backend: str
+    tier: str
+    model: str
+    score: float
+    features: Dict[str, Any]
+    timestamp: float = field(default_factory=time.time)
+    latency: Optional[float] = None
+    success: Optional[bool] = None
+    answer_length: Optional[int] = None
+
+
+class ModelRouter:
+    """Scores queries locally and picks a fast or strong model tier per backend"""
+
+    def __init__(self, threshold: Optional[float] = None, max_decisions: int = 500, backend: Optional[str] = None):
+        # Check the configured backend once here rather than failing every query in route()
+        if backend is not None and backend not in MODEL_TIERS:
+            raise ValueError(f"Unsupported LLM_BACKEND '{backend}'. Use one of: {', '.join(MODEL_TIERS)}")
+        self.threshold = threshold if threshold is not None else float(os.getenv("MODEL_ROUTING_THRESHOLD", "0.5"))
+        self.decisions = deque(maxlen=max_decisions)
+        self.log_path = os.getenv("MODEL_ROUTING_LOG")
+        self._lock = threading.Lock()
+
+    def score(self, query: str, needs_tools: bool = False) -> Dict[str, Any]:
+        """Cheap complexity features and a 0-1 score; no LLM call involved"""
+        query_lower = query.lower()
+        words = len(query.split())
+        entities = count_entities(query)
+        analysis_hits = sum(1 for keyword in ANALYSIS_KEYWORDS if keyword in query_lower)
+
+        score = min(words / 40, 1.0) * 0.3
+        score += min(analysis_hits / 2, 1.0) * 0.4
+        score += min(max(entities - 1, 0) / 2, 1.0) * 0.2
+        # Analysis that also needs live data means multi-step reasoning
+        score += 0.1 if needs_tools and analysis_hits else 0.0
+
+        return {
+            "words": words,
+            "entities": entities,
+            "analysis_keywords": analysis_hits,
+            "needs_tools": needs_tools,
+            "score": round(min(score, 1.0), 3),
+        }
+
+    def route(self, query: str, backend: str, needs_tools: bool = False) -> RoutingDecision:
+        """Choose the model tier for a query"""
+        if backend not in MODEL_TIERS:
+            raise ValueError(f"Unsupported backend: {backend}. Use 'gemini' or 'claude'")
+        features = self.score(query, needs_tools)
+        tier = "strong" if features["score"] >= self.threshold else "fast"
+        decision = RoutingDecision(
+            backend=backend,
+            tier=tier,
+            model=MODEL_TIERS[backend][tier],
+            score=features.pop("score"),
+            features=features,
+        )
+        with self._lock:
+            self.decisions.append(decision)
+        return decision
+
+    def record_outcome(self, decision: RoutingDecision, latency: float, success: bool, answer: str = ""):
+        """Attach latency and quality outcome to a decision and log it"""
+        decision.latency = round(latency, 3)
+        decision.success = success
+        decision.answer_length = len(answer or "")
+        print(f"🧭 Routed to {decision.tier} tier ({decision.model}, score {decision.score}) "
+              f"in {decision.latency:.2f}s")
+        if self.log_path:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(asdict(decision)) + "\n")
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-tier counts, success rate and average latency"""
+        with self._lock:
+            decisions = list(self.decisions)
+        tiers: Dict[str, Dict[str, Any]] = {}
+        for decision in decisions:
+            stats = tiers.setdefault(decision.tier, {"queries": 0, "completed": 0, "successes": 0, "latency": 0.0})
+            stats["queries"] += 1
+            if decision.latency is not None:
+                stats["completed"] += 1
+                stats["latency"] += decision.latency
+                stats["successes"] += 1 if decision.success else 0
+        for stats in tiers.values():
+            completed = stats.pop("completed")
+            stats["avg_latency"] = round(stats.pop("latency") / completed, 3) if completed else 0.0
+            stats["success_rate"] = round(stats.pop("successes") / completed, 3) if completed else 0.0
+        return {"threshold": self.threshold, "tiers": tiers}
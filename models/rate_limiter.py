@@ -0,0 +1,241 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+from langchain_core.rate_limiters import BaseRateLimiter
+from pydantic import Field
+
+# Per-backend defaults; override with e.g. GEMINI_RPM, CLAUDE_TPM, GEMINI_MAX_IN_FLIGHT
+DEFAULT_LIMITS = {
+    "gemini": {"rpm": 60, "tpm": 250_000, "max_in_flight": 8},
+    "claude": {"rpm": 50, "tpm": 50_000, "max_in_flight": 4},
+}
+
+# Reserved per request before the real usage is known, then corrected on completion
+ESTIMATED_TOKENS_PER_REQUEST = int(os.getenv("LLM_ESTIMATED_TOKENS_PER_REQUEST", "1500"))
+
+# Set while a call holds a slot, so a sync _generate run by the default _agenerate does not take a second one
+_holding_slot: ContextVar[bool] = ContextVar("holding_rate_limit_slot", default=False)
+
+
+class TokenBucket:
+    """Continuously refilling bucket; callers must hold the owning limiter's lock"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self.refill()
+        # Never ask for more than a full bucket, or large requests would wait forever
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+
+class BackendRateLimiter(BaseRateLimiter):
+    """Requests-per-minute, tokens-per-minute and max-in-flight governor for one backend/model.
+
+    Waiters are served strictly in arrival order (FIFO tickets), whether they wait
+    from a thread via acquire() or from an asyncio task via aacquire().
+    """
+
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int,
+                 max_in_flight: int, estimated_tokens: int = ESTIMATED_TOKENS_PER_REQUEST):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self.estimated_tokens = estimated_tokens
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._queue = deque()
+        self._tickets = itertools.count()
+        self.stats = {"acquired": 0, "rejected": 0, "total_wait": 0.0, "max_wait": 0.0}
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        """Block the calling thread until this request may be sent"""
+        start = time.monotonic()
+        with self._lock:
+            ticket = self._enqueue()
+            try:
+                while True:
+                    delay = self._try_acquire(ticket, start)
+                    if delay is None:
+                        return True
+                    if not blocking:
+                        self.stats["rejected"] += 1
+                        return False
+                    self._changed.wait(timeout=delay)
+            finally:
+                self._dequeue(ticket)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        """Wait without blocking the event loop until this request may be sent"""
+        start = time.monotonic()
+        with self._lock:
+            ticket = self._enqueue()
+        try:
+            while True:
+                with self._lock:
+                    delay = self._try_acquire(ticket, start)
+                    if delay is None:
+                        return True
+                    if not blocking:
+                        self.stats["rejected"] += 1
+                        return False
+                await asyncio.sleep(min(delay, 0.05))
+        finally:
+            with self._lock:
+                self._dequeue(ticket)
+
+    def release(self, actual_tokens: Optional[int] = None):
+        """Free an in-flight slot and correct the token reservation with real usage"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if actual_tokens is not None:
+                self.tokens.refill()
+                # Over-use drives the bucket negative, delaying the next requests
+                self.tokens.tokens -= actual_tokens - self.estimated_tokens
+            self._changed.notify_all()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            self.requests.refill()
+            self.tokens.refill()
+            acquired = self.stats["acquired"]
+            return {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queued": len(self._queue),
+                "requests_available": round(self.requests.tokens, 1),
+                "tokens_available": round(self.tokens.tokens),
+                "acquired": acquired,
+                "rejected": self.stats["rejected"],
+                "avg_queue_wait": round(self.stats["total_wait"] / acquired, 4) if acquired else 0.0,
+                "max_queue_wait": round(self.stats["max_wait"], 4),
+            }
+
+    def _enqueue(self) -> int:
+        ticket = next(self._tickets)
+        self._queue.append(ticket)
+        return ticket
+
+    def _dequeue(self, ticket: int):
+        try:
+            self._queue.remove(ticket)
+        except ValueError:
+            pass
+        self._changed.notify_all()
+
+    def _try_acquire(self, ticket: int, start: float) -> Optional[float]:
+        """Take a slot if it's this ticket's turn; otherwise return how long to wait"""
+        if self._queue[0] != ticket:
+            return 0.05
+        if self.in_flight >= self.max_in_flight:
+            # Woken by release(); the timeout is only a safety net
+            return 1.0
+        delay = max(self.requests.wait_time(1), self.tokens.wait_time(self.estimated_tokens))
+        if delay > 0:
+            return delay
+        self.requests.tokens -= 1
+        self.tokens.tokens -= self.estimated_tokens
+        self.in_flight += 1
+        waited = time.monotonic() - start
+        self.stats["acquired"] += 1
+        self.stats["total_wait"] += waited
+        self.stats["max_wait"] = max(self.stats["max_wait"], waited)
+        return None
+
+
+def _total_tokens(result: Optional[ChatResult]) -> Optional[int]:
+    """Real token usage reported by the provider, or None if unknown"""
+    if result is None:
+        return None
+    total = 0
+    for generation in result.generations:
+        usage = getattr(generation.message, "usage_metadata", None)
+        if usage:
+            total += usage.get("total_tokens", 0)
+    return total or None
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """Chat model base whose upstream calls each hold one slot of `slot_limiter`.
+
+    The slot is taken and given back around _generate/_agenerate in try/finally,
+    so a call that fails or is cancelled (e.g. by a request deadline) frees it,
+    and LLM-cache hits, which never reach _generate, never take one. Combine with
+    a provider class: class RateLimitedChatAnthropic(RateLimitedChatModel, ChatAnthropic).
+    """
+
+    slot_limiter: Optional[BackendRateLimiter] = Field(default=None, exclude=True)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.slot_limiter is None or _holding_slot.get():
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self.slot_limiter.acquire()
+        token, result = _holding_slot.set(True), None
+        try:
+            result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return result
+        finally:
+            _holding_slot.reset(token)
+            self.slot_limiter.release(_total_tokens(result))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.slot_limiter is None or _holding_slot.get():
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        await self.slot_limiter.aacquire()
+        token, result = _holding_slot.set(True), None
+        try:
+            result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return result
+        finally:
+            _holding_slot.reset(token)
+            self.slot_limiter.release(_total_tokens(result))
+
+
+_limiters: Dict[Tuple[str, str], BackendRateLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def _limit_from_env(backend: str, key: str) -> int:
+    default = DEFAULT_LIMITS.get(backend, DEFAULT_LIMITS["gemini"])[key]
+    return int(os.getenv(f"{backend.upper()}_{key.upper()}", str(default)))
+
+
+def get_rate_limiter(backend: str, model: str) -> BackendRateLimiter:
+    """Shared limiter for a backend/model pair, created on first use"""
+    key = (backend, model)
+    with _registry_lock:
+        if key not in _limiters:
+            _limiters[key] = BackendRateLimiter(
+                name=f"{backend}:{model}",
+                requests_per_minute=_limit_from_env(backend, "rpm"),
+                tokens_per_minute=_limit_from_env(backend, "tpm"),
+                max_in_flight=_limit_from_env(backend, "max_in_flight"),
+            )
+        return _limiters[key]
+
+
+def rate_limit_summary() -> Dict[str, Any]:
+    """Queue and quota state for every limiter in use"""
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.summary() for limiter in limiters}
@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# USD per 1M tokens as (prompt, completion). Unknown models are costed at 0.
+MODEL_PRICING = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+    "claude-sonnet-4-20250514": (3.00, 15.00),
+}
+
+# Query the current thread/task is working on (set by UsageTracker.track_query)
+_current_query: ContextVar[Optional[str]] = ContextVar("current_query", default=None)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) for providers that omit usage"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate the USD cost of a call from the pricing table"""
+    prompt_price, completion_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class UsageTracker:
+    """Thread-safe accounting of LLM tokens, latency and cost per call, query and backend"""
+
+    def __init__(self, max_calls: int = 1000, max_queries: int = 200):
+        self._lock = threading.Lock()
+        self.calls = deque(maxlen=max_calls)
+        self.queries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_queries = max_queries
+        self.backends: Dict[str, Dict[str, Any]] = {}
+        self.log_path = os.getenv("LLM_USAGE_LOG")
+
+    @contextmanager
+    def track_query(self, query: str):
+        """Attribute every LLM call made inside the block to one query"""
+        query_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self.queries[query_id] = {
+                "query_id": query_id,
+                "query": query[:200],
+                "started_at": time.time(),
+                **self._empty_totals(),
+            }
+            while len(self.queries) > self.max_queries:
+                self.queries.popitem(last=False)
+        token = _current_query.set(query_id)
+        try:
+            yield query_id
+        finally:
+            _current_query.reset(token)
+
+    def record(self, backend: str, model: str, prompt_tokens: int, completion_tokens: int,
+               latency: float, estimated: bool = False, error: Optional[str] = None) -> Dict[str, Any]:
+        """Record one finished LLM call"""
+        record = {
+            "timestamp": time.time(),
+            "query_id": _current_query.get(),
+            "backend": backend,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "latency": round(latency, 4),
+            "cost": estimate_cost(model, prompt_tokens, completion_tokens),
+            "estimated": estimated,
+            "error": error,
+        }
+        with self._lock:
+            self.calls.append(record)
+            self._add(self.backends.setdefault(backend, self._empty_totals()), record)
+            query = self.queries.get(record["query_id"]) if record["query_id"] else None
+            if query is not None:
+                self._add(query, record)
+        if self.log_path:
+            self._append_jsonl(self.log_path, [record])
+        return record
+
+    def query_usage(self, query_id: str) -> Dict[str, Any]:
+        """Totals for a single tracked query"""
+        with self._lock:
+            return dict(self.queries.get(query_id, {}))
+
+    def summary(self) -> Dict[str, Any]:
+        """Rolling aggregates for get_status()"""
+        with self._lock:
+            calls = list(self.calls)
+            backends = {name: dict(totals) for name, totals in self.backends.items()}
+            queries = list(self.queries.values())
+        latencies = [c["latency"] for c in calls]
+        return {
+            "calls": len(calls),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+            "completion_tokens": sum(c["completion_tokens"] for c in calls),
+            "cost": round(sum(c["cost"] for c in calls), 6),
+            "latency_p50": round(_percentile(latencies, 50), 3),
+            "latency_p95": round(_percentile(latencies, 95), 3),
+            "avg_tokens_per_query": round(
+                sum(q["total_tokens"] for q in queries) / len(queries), 1
+            ) if queries else 0,
+            "backends": backends,
+        }
+
+    def export_jsonl(self, path: str) -> int:
+        """Write the retained call records as JSON lines; returns the number written"""
+        with self._lock:
+            calls = list(self.calls)
+        self._append_jsonl(path, calls, mode="w")
+        return len(calls)
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.queries.clear()
+            self.backends.clear()
+
+    @staticmethod
+    def _empty_totals() -> Dict[str, Any]:
+        return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "total_tokens": 0, "latency": 0.0, "cost": 0.0, "errors": 0}
+
+    @staticmethod
+    def _add(totals: Dict[str, Any], record: Dict[str, Any]):
+        totals["calls"] += 1
+        totals["prompt_tokens"] += record["prompt_tokens"]
+        totals["completion_tokens"] += record["completion_tokens"]
+        totals["total_tokens"] += record["total_tokens"]
+        totals["latency"] = round(totals["latency"] + record["latency"], 4)
+        totals["cost"] = round(totals["cost"] + record["cost"], 8)
+        if record["error"]:
+            totals["errors"] += 1
+
+    @staticmethod
+    def _append_jsonl(path: str, records: List[Dict[str, Any]], mode: str = "a"):
+        with open(path, mode, encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """LangChain callback that feeds every call of one LLM into a UsageTracker"""
+
+    def __init__(self, tracker: UsageTracker, backend: str, model: str):
+        self.tracker = tracker
+        self.backend = backend
+        self.model = model
+        self._runs: Dict[Any, Dict[str, Any]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt = "\n".join(str(m.content) for batch in messages for m in batch)
+        self._runs[run_id] = {"start": time.perf_counter(), "prompt": prompt}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._runs[run_id] = {"start": time.perf_counter(), "prompt": "\n".join(prompts)}
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        prompt_tokens, completion_tokens = self._extract_usage(response)
+        estimated = prompt_tokens is None
+        if estimated:
+            completion_text = "".join(
+                g.text for generations in response.generations for g in generations
+            )
+            prompt_tokens = estimate_tokens(run["prompt"])
+            completion_tokens = estimate_tokens(completion_text)
+        self.tracker.record(self.backend, self.model, prompt_tokens, completion_tokens,
+                            time.perf_counter() - run["start"], estimated=estimated)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        self.tracker.record(self.backend, self.model, estimate_tokens(run["prompt"]), 0,
+                            time.perf_counter() - run["start"], estimated=True, error=str(error))
+
+    @staticmethod
+    def _extract_usage(response):
+        """Read provider-reported usage from the generations or llm_output"""
+        prompt_tokens = completion_tokens = 0
+        found = False
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+                    found = True
+        if not found and response.llm_output:
+            usage = response.llm_output.get("usage") or response.llm_output.get("token_usage") or {}
+            if usage:
+                prompt_tokens = usage.get("input_tokens", usage.get("prompt_tokens", 0))
+                completion_tokens = usage.get("output_tokens", usage.get("completion_tokens", 0))
+                found = True
+        return (prompt_tokens, completion_tokens) if found else (None, None)
+
+
+# Global instance shared by every LLM created through get_llm
+usage_tracker = UsageTracker()
@@ -11,7 +11,7 @@ from dotenv import load_dotenv
 # Configuration
 PDF_DIR = os.getenv("PDF_DIR", "./data/financial_docs")  # Use local path instead of Google Drive
 VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "./faiss_index")
-LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").strip().lower()
 
 def get_embeddings():
     """Get appropriate embeddings based on LLM backend"""
@@ -105,15 +105,34 @@ def setup_rag_pipeline():
     print("✅ RAG pipeline setup complete")
     return qa_chain
 
-def search_financial_documents(query: str, qa_chain) -> Tuple[str, List]:
-    """Search documents using RAG chain"""
+def search_financial_documents(query: str, qa_chain, callbacks: Optional[List] = None) -> Tuple[str, List]:
+    """Search documents using RAG chain (callbacks receive retrieval and LLM events)"""
     if qa_chain is None:
         raise ValueError("RAG chain not initialized")
     
     print(f"🔍 Searching for: '{query}'")
     
     try:
-        response = qa_chain.invoke({"query": query})
+        response = qa_chain.invoke({"query": query}, config={"callbacks": callbacks} if callbacks else None)
+        answer = response["result"]
+        source_documents = response["source_documents"]
+        
+        print("✅ Search completed successfully")
+        return answer, source_documents
+        
+    except Exception as e:
+        print(f"❌ Search failed: {e}")
+        raise
+
+async def asearch_financial_documents(query: str, qa_chain, callbacks: Optional[List] = None) -> Tuple[str, List]:
+    """Async search_financial_documents: retrieval and answer generation without blocking the event loop"""
+    if qa_chain is None:
+        raise ValueError("RAG chain not initialized")
+    
+    print(f"🔍 Searching for: '{query}'")
+    
+    try:
+        response = await qa_chain.ainvoke({"query": query}, config={"callbacks": callbacks} if callbacks else None)
         answer = response["result"]
         source_documents = response["source_documents"]
         
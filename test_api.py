@@ -9,6 +9,7 @@ def test_api():
     tests = [
         ("Health Check", f"{base_url}/"),
         ("Stock Price", f"{base_url}/stock/AAPL"),
+        ("Batch Stock Prices", f"{base_url}/stocks?symbols=AAPL,MSFT,GOOGL"),
         ("Earnings", f"{base_url}/earnings/MSFT"),
         ("News", f"{base_url}/news/Tesla?limit=2"),
         ("Dividend", f"{base_url}/dividend/AAPL")
@@ -92,6 +92,410 @@ def test_agent_initialization():
         print(f"  ❌ Agent initialization failed: {e}")
         return False
 
+def test_fast_path():
+    """Test which queries the fast path answers directly (no LLM or API needed)"""
+    print("\n⚡ Testing fast path routing...")
+    
+    from agent.fast_path import FastPathDispatcher
+    dispatcher = FastPathDispatcher()
+    cases = [
+        ("What is the price of AAPL?", ("price", "StockPrice", "AAPL")),
+        ("Latest news about Tesla", ("news", "CompanyNews", "Tesla")),
+        # A company named both ways is still one entity
+        ("What is Apple (AAPL) trading at?", ("price", "StockPrice", "AAPL")),
+        ("What's the RSI of NVDA?", ("indicators", "TechnicalIndicators", "NVDA")),
+        # Past points in time: the tools only return current values
+        ("What was AAPL's price yesterday?", None),
+        ("AAPL price last year", None),
+        ("MSFT price 3 months ago", None),
+        ("TSLA price in 2021", None),
+        ("AAPL price on 2024-03-01", None),
+        ("AAPL price on 3/1", None),
+        ("Previous close price of AAPL", None),
+        ("AAPL historical price", None),
+        # Forward-looking questions: today's quote does not answer them
+        ("AAPL price target", None),
+        ("Will AAPL price go up?", None),
+        ("AAPL price next week", None),
+        ("AAPL price tomorrow", None),
+        ("AAPL price outlook", None),
+        ("Analyst estimate for AAPL price", None),
+        # Reasoning or several tickers go to the agent
+        ("Why did the price of AAPL drop?", None),
+        ("Price of AAPL and MSFT", None),
+    ]
+    
+    failures = 0
+    for query, expected in cases:
+        match = dispatcher.match(query)
+        if match != expected:
+            failures += 1
+            print(f"  ❌ {query!r}: expected {expected}, got {match}")
+    if failures:
+        return False
+    print(f"  ✅ {len(cases)} routing cases")
+    return True
+
+def test_quota_scheduler():
+    """Test provider quota priorities, rejection, cancellation and 429 pauses (no API keys needed)"""
+    print("\n🚦 Testing upstream quota scheduler...")
+    
+    import asyncio
+    import time
+    from api.quota import BACKGROUND, INTERACTIVE, ProviderQuota, QuotaExceeded
+    
+    async def priorities():
+        # One call per 0.2s: a background call queued first still goes after an interactive one
+        quota = ProviderQuota("test", [(1, 0.2)], background_share=1.0)
+        await quota.acquire(priority=INTERACTIVE)
+        order = []
+        async def call(name, priority):
+            await quota.acquire(priority=priority)
+            order.append(name)
+        await asyncio.gather(call("background", BACKGROUND), call("interactive", INTERACTIVE))
+        return order == ["interactive", "background"], f"grant order {order}"
+    
+    async def rejection():
+        # The next slot is a minute away, far past the interactive max_wait
+        quota = ProviderQuota("test", [(1, 60)], max_wait={INTERACTIVE: 1.0, BACKGROUND: 1.0})
+        await quota.acquire(priority=INTERACTIVE)
+        started = time.monotonic()
+        try:
+            await quota.acquire(priority=INTERACTIVE)
+            return False, "second call was not rejected"
+        except QuotaExceeded as e:
+            waited = time.monotonic() - started
+            ok = 59 <= e.retry_after <= 60 and waited < 0.5
+            return ok, f"retry_after={e.retry_after}, rejected after {waited:.2f}s"
+    
+    async def cancellation():
+        quota = ProviderQuota("test", [(1, 60)])
+        await quota.acquire(priority=INTERACTIVE)
+        first = asyncio.ensure_future(quota.acquire(priority=BACKGROUND))
+        second = asyncio.ensure_future(quota.acquire(priority=BACKGROUND))
+        await asyncio.sleep(0)
+        # A waiter cancelled while queued must not take the slot from the one behind it
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        quota.windows[0][2].clear()
+        quota._dispatch()
+        # Cancelled just as it is granted: the slot stays used only if acquire() still returned
+        second.cancel()
+        outcome = (await asyncio.gather(second, return_exceptions=True))[0]
+        used = quota.stats()["windows"][0]["used"]
+        ok = first.cancelled() and used == (0 if isinstance(outcome, asyncio.CancelledError) else 1)
+        return ok, f"used={used} after cancelling a queued and a just-granted waiter"
+    
+    async def blocked():
+        quota = ProviderQuota("test", [(100, 60)], max_wait={INTERACTIVE: 1.0, BACKGROUND: 1.0})
+        quota.block(0.2)
+        started = time.monotonic()
+        await quota.acquire(priority=INTERACTIVE)
+        paused = time.monotonic() - started
+        quota.block(30)
+        try:
+            await quota.acquire(priority=INTERACTIVE)
+            return False, "call went through a 30s pause"
+        except QuotaExceeded as e:
+            ok = paused >= 0.19 and e.retry_after == 30
+            return ok, f"paused {paused:.2f}s, retry_after={e.retry_after}"
+    
+    failures = 0
+    for name, check in [("priorities", priorities), ("max_wait rejection", rejection),
+                        ("cancelled waiter", cancellation), ("block after 429", blocked)]:
+        ok, detail = asyncio.run(check())
+        print(f"  {'✅' if ok else '❌'} {name}: {detail}")
+        failures += 0 if ok else 1
+    return failures == 0
+
+def test_upstream_cache():
+    """Test single-flight coalescing and failure handling of the API server's upstream cache"""
+    print("\n🗄️ Testing upstream cache...")
+    
+    import asyncio
+    from api.cache import UpstreamCache
+    
+    async def coalescing():
+        cache = UpstreamCache(ttls={"stock": 60})
+        calls = []
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"price": 1.0}
+        waiters = [asyncio.ensure_future(cache.get_or_fetch("stock", "AAPL", fetch)) for _ in range(10)]
+        await asyncio.sleep(0)
+        # A client that disconnects mid-fetch must not cancel the fetch for everyone else
+        waiters[0].cancel()
+        results = await asyncio.gather(*waiters[1:])
+        ok = len(calls) == 1 and all(r == {"price": 1.0} for r in results) \
+            and cache.peek("stock", "AAPL") == {"price": 1.0}
+        return ok, f"{len(calls)} fetch for 10 concurrent misses"
+    
+    async def failures():
+        cache = UpstreamCache(ttls={"stock": 60})
+        calls = []
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+        outcomes = await asyncio.gather(*(cache.get_or_fetch("stock", "AAPL", failing) for _ in range(3)),
+                                        return_exceptions=True)
+        # Neither a failure nor a response rejected by should_cache is served to the next caller
+        rejected = await cache.get_or_fetch("stock", "MSFT", lambda: asyncio.sleep(0, {"message": "err"}),
+                                            should_cache=lambda data: "price" in data)
+        async def recovered():
+            calls.append(1)
+            return {"price": 2.0}
+        value = await cache.get_or_fetch("stock", "AAPL", recovered)
+        ok = all(isinstance(o, RuntimeError) for o in outcomes) and len(calls) == 2 \
+            and value == {"price": 2.0} and rejected == {"message": "err"} and cache.peek("stock", "MSFT") is None
+        return ok, f"{len(calls)} fetches after a failed one, nothing cached from the failure"
+    
+    failed = 0
+    for name, check in [("single-flight", coalescing), ("failed fetch", failures)]:
+        ok, detail = asyncio.run(check())
+        print(f"  {'✅' if ok else '❌'} {name}: {detail}")
+        failed += 0 if ok else 1
+    return failed == 0
+
+def test_indicators():
+    """Test the vectorized indicators against plain per-bar loops, including gaps in the data"""
+    print("\n📈 Testing technical indicators...")
+    
+    import math
+    import numpy as np
+    from analytics.indicators import ema, rsi, sma
+    
+    def loop_sma(row, period):
+        return [sum(row[t - period + 1:t + 1]) / period
+                if t >= period - 1 and not any(math.isnan(v) for v in row[t - period + 1:t + 1]) else math.nan
+                for t in range(len(row))]
+    
+    def loop_ewm(row, alpha, warmup):
+        # Starts at the first valid value; gaps carry the average forward
+        state, seen, out = math.nan, 0, []
+        for v in row:
+            if not math.isnan(v):
+                state = v if math.isnan(state) else state + alpha * (v - state)
+                seen += 1
+            out.append(state if seen >= warmup else math.nan)
+        return out
+    
+    def loop_rsi(row, period):
+        changes = [math.nan] + [b - a for a, b in zip(row, row[1:])]
+        gains = loop_ewm([max(c, 0.0) if not math.isnan(c) else c for c in changes], 1 / period, period)
+        losses = loop_ewm([max(-c, 0.0) if not math.isnan(c) else c for c in changes], 1 / period, period)
+        return [math.nan if math.isnan(g + l) else 50.0 if g + l == 0 else 100 * g / (g + l)
+                for g, l in zip(gains, losses)]
+    
+    rng = np.random.default_rng(7)
+    prices = 100 + np.cumsum(rng.normal(0, 1, (3, 80)), axis=-1)
+    # Shorter histories (leading NaNs) alone take a different path than internal gaps
+    leading = prices.copy()
+    leading[0, :5] = np.nan
+    leading[2, :30] = np.nan
+    gaps = leading.copy()
+    gaps[1, [20, 21, 50]] = np.nan
+    flat = np.full((1, 40), 25.0)
+    
+    failures = 0
+    for label, close in [("full", prices), ("leading NaNs", leading), ("internal gaps", gaps), ("flat", flat)]:
+        for name, vectorized, loop in [
+            ("sma_10", lambda x: sma(x, 10), lambda row: loop_sma(row, 10)),
+            ("ema_10", lambda x: ema(x, 10), lambda row: loop_ewm(row, 2 / 11, 10)),
+            ("rsi_14", lambda x: rsi(x, 14), lambda row: loop_rsi(row, 14)),
+        ]:
+            expected = np.array([loop(row.tolist()) for row in close])
+            if not np.allclose(vectorized(close), expected, equal_nan=True):
+                failures += 1
+                print(f"  ❌ {name} differs from the loop on {label} series")
+    if rsi(flat, 14)[0, -1] != 50.0:
+        failures += 1
+        print("  ❌ rsi of a flat series should be 50")
+    if failures:
+        return False
+    print("  ✅ sma, ema and rsi match plain loops on full, shorter, gapped and flat series")
+    return True
+
+def test_history_store():
+    """Test incremental backfill and atomic file replacement of the local price history store"""
+    print("\n🗃️ Testing history store...")
+    
+    import asyncio
+    import os
+    import tempfile
+    from datetime import date, timedelta
+    from api.history_store import HistoryStore
+    
+    requests_made = []
+    async def fetch(symbol, start, end):
+        requests_made.append((start, end))
+        days = (end - start).days + 1
+        # Closes encode the request number, so re-fetched bars show which request they came from
+        return [{"datetime": (start + timedelta(days=i)).isoformat(), "open": 1, "high": 2, "low": 0.5,
+                 "close": len(requests_made), "volume": 10} for i in range(days)]
+    
+    async def run(root):
+        store = HistoryStore(root, fetch)
+        checks = []
+        first = await store.ensure("AAPL", date(2024, 1, 10), date(2024, 1, 20))
+        again = await store.ensure("AAPL", date(2024, 1, 12), date(2024, 1, 18))
+        checks.append(("stored range served locally", first == 11 and again == 0 and len(requests_made) == 1))
+        checks.append(("missing ranges on both sides", store.missing_ranges("AAPL", date(2024, 1, 5), date(2024, 1, 25))
+                       == [(date(2024, 1, 5), date(2024, 1, 9)), (date(2024, 1, 21), date(2024, 1, 25))]))
+        await store.ensure("AAPL", date(2024, 1, 5), date(2024, 1, 25))
+        bars = store.query("AAPL", date(2024, 1, 1), date(2024, 1, 31))
+        dates = [str(d) for d in bars["date"]]
+        checks.append(("backfill merged in order", dates == [f"2024-01-{d:02d}" for d in range(5, 26)]
+                       and store.meta("AAPL")["start"] == "2024-01-05" and store.meta("AAPL")["end"] == "2024-01-25"))
+        checks.append(("earlier bars kept", bars["close"][5] == 1.0 and requests_made[1:] ==
+                       [(date(2024, 1, 5), date(2024, 1, 9)), (date(2024, 1, 21), date(2024, 1, 25))]))
+        checks.append(("no staging or backup left", sorted(os.listdir(root)) == ["AAPL"]))
+        future = date.today() + timedelta(days=30)
+        checks.append(("future range not recorded", await store.ensure("MSFT", future, future) == 0
+                       and store.meta("MSFT") is None and await store.ensure("AAPL", future, future) == 0
+                       and store.meta("AAPL")["end"] == "2024-01-25"))
+        return checks
+    
+    with tempfile.TemporaryDirectory() as root:
+        checks = asyncio.run(run(root))
+    for name, ok in checks:
+        print(f"  {'✅' if ok else '❌'} {name}")
+    return all(ok for _, ok in checks)
+
+def test_rate_limiter():
+    """Test FIFO slot grants, the in-flight cap and slot release on cancellation (no API keys needed)"""
+    print("\n⏱️ Testing LLM rate limiter...")
+    
+    import asyncio
+    import threading
+    import time
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from models.rate_limiter import BackendRateLimiter, RateLimitedChatModel
+    
+    checks = []
+    
+    # Threads queue one at a time behind a held slot and must be served in arrival order, one at a time
+    limiter = BackendRateLimiter("test", requests_per_minute=6000, tokens_per_minute=10_000_000, max_in_flight=1)
+    limiter.acquire()
+    order, active, peak, lock = [], [0], [0], threading.Lock()
+    def worker(n):
+        limiter.acquire()
+        with lock:
+            order.append(n)
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        limiter.release()
+    threads = []
+    for n in range(5):
+        threads.append(threading.Thread(target=worker, args=(n,)))
+        threads[-1].start()
+        while limiter.summary()["queued"] < n + 1:
+            time.sleep(0.001)
+    limiter.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    checks.append(("FIFO grants", order == list(range(5)), f"order {order}"))
+    checks.append(("in-flight cap", peak[0] == 1, f"at most {peak[0]} in flight"))
+    
+    class SlowChat(BaseChatModel):
+        @property
+        def _llm_type(self) -> str:
+            return "slow"
+    
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+    
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            await asyncio.sleep(10)
+            return self._generate(messages)
+    
+    class LimitedSlowChat(RateLimitedChatModel, SlowChat):
+        pass
+    
+    async def cancelled_call():
+        limiter = BackendRateLimiter("test", requests_per_minute=6000, tokens_per_minute=10_000_000, max_in_flight=1)
+        model = LimitedSlowChat(slot_limiter=limiter)
+        call = asyncio.ensure_future(model.ainvoke("hi"))
+        while limiter.summary()["in_flight"] == 0:
+            await asyncio.sleep(0.001)
+        # e.g. a request deadline expiring mid-call
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+        return limiter.summary()["in_flight"], limiter.acquire(blocking=False)
+    
+    in_flight, reacquired = asyncio.run(cancelled_call())
+    checks.append(("cancelled call frees its slot", in_flight == 0 and reacquired,
+                   f"{in_flight} in flight after cancelling"))
+    
+    for name, ok, detail in checks:
+        print(f"  {'✅' if ok else '❌'} {name}: {detail}")
+    return all(ok for _, ok, _ in checks)
+
+def test_plan_execute():
+    """Test plan parsing and DAG scheduling of plan-and-execute mode with stub tools (no LLM needed)"""
+    print("\n🗺️ Testing plan-and-execute scheduler...")
+    
+    import asyncio
+    import json
+    import threading
+    from agent.plan_execute import PlanExecuteAgent
+    
+    class StubTool:
+        def __init__(self, name):
+            self.name, self.description, self.calls = name, f"{name} stub", []
+            self._lock = threading.Lock()
+    
+        def invoke(self, tool_input, config=None):
+            with self._lock:
+                self.calls.append(tool_input)
+            return f"{self.name[0]}({tool_input})"
+    
+        async def ainvoke(self, tool_input, config=None):
+            return self.invoke(tool_input, config)
+    
+    def plan(*steps):
+        return json.dumps({"steps": list(steps)})
+    
+    checks = []
+    for mode in ("threads", "async"):
+        price, echo = StubTool("StockPrice"), StubTool("Echo")
+        agent = PlanExecuteAgent(llm=None, tools=[price, echo])
+        execute = agent.execute if mode == "threads" else lambda steps: asyncio.run(agent.aexecute(steps))
+        
+        # The same id twice: both steps run and keep their own results
+        steps = agent._parse_plan(plan({"id": "s1", "tool": "StockPrice", "input": "AAPL"},
+                                       {"id": "s1", "tool": "StockPrice", "input": "MSFT"}))
+        results = execute(steps)
+        checks.append((f"duplicate ids ({mode})", len({s["id"] for s in steps}) == 2
+                       and sorted(price.calls) == ["AAPL", "MSFT"]
+                       and [results[s["id"]] for s in steps] == ["S(AAPL)", "S(MSFT)"]))
+        
+        # A string depends_on, and a placeholder with no depends_on at all, both wait for s1
+        steps = agent._parse_plan(plan({"id": "s1", "tool": "StockPrice", "input": "NVDA"},
+                                       {"id": "s2", "tool": "Echo", "input": "{s1}", "depends_on": "s1"},
+                                       {"id": "s3", "tool": "Echo", "input": "after {s2}"}))
+        results = execute(steps)
+        checks.append((f"dependency order ({mode})", [s["depends_on"] for s in steps] == [[], ["s1"], ["s2"]]
+                       and results["s3"] == "E(after E(S(NVDA)))"))
+        
+        # A cycle is reported for its steps without holding up the rest
+        steps = agent._parse_plan(plan({"id": "a", "tool": "Echo", "input": "{b}"},
+                                       {"id": "b", "tool": "Echo", "input": "{a}"},
+                                       {"id": "c", "tool": "StockPrice", "input": "TSLA"}))
+        results = execute(steps)
+        checks.append((f"dependency cycle ({mode})", results["c"] == "S(TSLA)"
+                       and all("dependency cycle" in results[step_id] for step_id in ("a", "b"))))
+    
+    for name, ok in checks:
+        print(f"  {'✅' if ok else '❌'} {name}")
+    return all(ok for _, ok in checks)
+
 def test_simple_query():
     """Test a simple query"""
     print("\n💬 Testing simple query...")
@@ -122,6 +526,13 @@ def main():
     tests = [
         ("Imports", test_imports),
         ("Environment", test_environment),
+        ("Fast Path", test_fast_path),
+        ("Quota Scheduler", test_quota_scheduler),
+        ("Upstream Cache", test_upstream_cache),
+        ("Indicators", test_indicators),
+        ("History Store", test_history_store),
+        ("Rate Limiter", test_rate_limiter),
+        ("Plan and Execute", test_plan_execute),
         ("Agent Initialization", test_agent_initialization),
         ("Simple Query", test_simple_query)
     ]
@@ -0,0 +1,35 @@
+# tools/entities.py
+# Ticker and company-name extraction shared by the model router and the fast path
+
+import re
+from typing import Dict, Optional
+
+COMPANY_TICKERS = {
+    "apple": "AAPL", "microsoft": "MSFT", "google": "GOOGL", "alphabet": "GOOGL",
+    "amazon": "AMZN", "tesla": "TSLA", "nvidia": "NVDA", "meta": "META", "facebook": "META",
+    "netflix": "NFLX", "jpmorgan": "JPM", "visa": "V", "unitedhealth": "UNH", "berkshire": "BRK.B",
+}
+
+# 1-5 uppercase letters, optionally prefixed with $ (e.g. AAPL, $TSLA)
+TICKER_PATTERN = re.compile(r"\$?\b([A-Z]{1,5})\b")
+
+# Uppercase words in financial questions that are not tickers
+NON_TICKERS = {"I", "A", "AI", "CEO", "CFO", "USD", "EPS", "PE", "P", "E", "ETF", "IPO", "GDP", "US", "OK",
+               "TTM", "YTD", "RSI", "MACD", "SMA", "EMA", "ATR"}
+
+
+def find_entities(query: str) -> Dict[str, Optional[str]]:
+    """Distinct tickers a query refers to, mapped to the company name used for them (None if only the ticker)"""
+    entities: Dict[str, Optional[str]] = {
+        ticker: None for ticker in TICKER_PATTERN.findall(query) if ticker not in NON_TICKERS
+    }
+    query_lower = query.lower()
+    for name, ticker in COMPANY_TICKERS.items():
+        if re.search(rf"\b{name}\b", query_lower):
+            entities[ticker] = name.title()
+    return entities
+
+
+def count_entities(query: str) -> int:
+    """Count distinct companies mentioned in a query, by ticker or by name"""
+    return len(find_entities(query))
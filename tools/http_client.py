@@ -0,0 +1,242 @@
+# tools/http_client.py
+# Shared pooled HTTP clients (sync requests.Session and async httpx.AsyncClient) with keep-alive and retries
+
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Throttling and transient upstream failures worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class JitteredRetry(Retry):
+    """urllib3 Retry with full-jitter exponential backoff; Retry-After still takes precedence, up to a cap"""
+
+    def __init__(self, *args, max_retry_after: Optional[float] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kwargs):
+        # urllib3 rebuilds the Retry on every attempt from its own parameters only
+        retry = super().new(**kwargs)
+        retry.max_retry_after = self.max_retry_after
+        return retry
+
+    def get_retry_after(self, response) -> Optional[float]:
+        # A quota window's Retry-After can be a day; never park a worker thread that long
+        retry_after = super().get_retry_after(response)
+        if retry_after is None or self.max_retry_after is None:
+            return retry_after
+        return min(retry_after, self.max_retry_after)
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+    def increment(self, *args, **kwargs):
+        retry = super().increment(*args, **kwargs)
+        http_client.count("retries")
+        return retry
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class PooledHTTPClient:
+    """Keep-alive connection pools shared by every module that calls HTTP APIs.
+
+    Sync callers use get() (one requests.Session per retry policy), coroutines use
+    aget() (one httpx.AsyncClient per event loop). Both retry connection errors and
+    `retry_statuses` (RETRY_STATUSES by default) with jittered exponential backoff,
+    honoring Retry-After up to backoff_max.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20, timeout: float = 10,
+                 max_retries: int = 2, backoff_factor: float = 0.5, backoff_max: float = 30):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        # One session per set of retried statuses; all share the pool sizes and counters
+        self._sessions: Dict[Tuple[int, ...], requests.Session] = {}
+        self._adapters: Dict[Tuple[int, ...], HTTPAdapter] = {}
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_client_loop = None
+        self._async_client_closer = None
+        # Optional httpx transport for the async client (e.g. httpx.MockTransport in load tests)
+        self.async_transport: Optional[httpx.AsyncBaseTransport] = None
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "async_requests": 0, "async_new_connections": 0, "retries": 0}
+
+    @classmethod
+    def from_env(cls) -> "PooledHTTPClient":
+        return cls(
+            pool_connections=int(os.getenv("HTTP_POOL_HOSTS", "10")),
+            pool_maxsize=int(os.getenv("HTTP_POOL_PER_HOST", "20")),
+            timeout=float(os.getenv("HTTP_TIMEOUT", "10")),
+            max_retries=int(os.getenv("HTTP_MAX_RETRIES", "2")),
+            backoff_factor=float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5")),
+        )
+
+    @property
+    def session(self) -> requests.Session:
+        """The shared requests.Session with the default retry policy, created on first use"""
+        return self._session_for(RETRY_STATUSES)
+
+    def _session_for(self, retry_statuses) -> requests.Session:
+        key = tuple(retry_statuses)
+        with self._lock:
+            if key not in self._sessions:
+                retry = JitteredRetry(
+                    total=self.max_retries,
+                    backoff_factor=self.backoff_factor,
+                    status_forcelist=key,
+                    allowed_methods=frozenset(["GET", "HEAD"]),
+                    respect_retry_after_header=True,
+                    max_retry_after=self.backoff_max,
+                    raise_on_status=False,  # Hand the last response back instead of raising
+                )
+                adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                      pool_maxsize=self.pool_maxsize, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._adapters[key] = adapter
+                self._sessions[key] = session
+            return self._sessions[key]
+
+    def get(self, url: str, retry_statuses=RETRY_STATUSES, **kwargs) -> requests.Response:
+        """requests.get over the shared pool, retrying only `retry_statuses`"""
+        kwargs.setdefault("timeout", self.timeout)
+        self.count("requests")
+        return self._session_for(retry_statuses).get(url, **kwargs)
+
+    def async_client(self) -> httpx.AsyncClient:
+        """One AsyncClient per event loop; connections are reused by every coroutine on it"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._async_client is None or self._async_client_loop is not loop:
+                if self._async_client is not None:
+                    self._discard_async_client(self._async_client, self._async_client_loop)
+                self._async_client = httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=self.pool_connections * self.pool_maxsize,
+                                        max_keepalive_connections=self.pool_maxsize),
+                    transport=self.async_transport,
+                )
+                self._async_client_loop = loop
+                # Started here and left suspended: asyncio.run() finalizes it while the loop is still running
+                self._async_client_closer = self._close_at_loop_shutdown(self._async_client)
+                loop.create_task(self._async_client_closer.__anext__())
+            return self._async_client
+
+    @staticmethod
+    async def _close_at_loop_shutdown(client: httpx.AsyncClient):
+        """Async generator that closes `client` when its loop shuts down async generators"""
+        try:
+            yield
+        finally:
+            await client.aclose()
+
+    @staticmethod
+    def _discard_async_client(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+        """Close a client created on another event loop, on that loop (its connections belong to it)"""
+        if client.is_closed:
+            return
+        if loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            print("⚠️ Dropping an HTTP client whose event loop closed without shutting down async generators")
+
+    async def aget(self, url: str, retry_statuses=RETRY_STATUSES, **kwargs) -> httpx.Response:
+        """Async GET over the shared AsyncClient with the same retry policy as get()"""
+        client = self.async_client()
+        # httpcore reports a new TCP connection through the trace extension; reused ones are silent
+        kwargs.setdefault("extensions", {})["trace"] = self._trace
+        for attempt in range(self.max_retries + 1):
+            self.count("async_requests")
+            try:
+                response = await client.get(url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError):
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code not in retry_statuses or attempt == self.max_retries:
+                    return response
+                delay = retry_after_seconds(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = self._backoff(attempt)
+            self.count("retries")
+            await asyncio.sleep(min(delay, self.backoff_max))
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def stats(self) -> Dict[str, Any]:
+        """Request, retry and connection reuse counts for both pools"""
+        hosts = {}
+        with self._lock:
+            counters = dict(self._counters)
+            adapters = list(self._adapters.values())
+        for adapter in adapters:
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    host = hosts.setdefault(f"{pool.scheme}://{pool.host}:{pool.port}",
+                                            {"requests": 0, "new_connections": 0, "idle_connections": 0})
+                    host["requests"] += pool.num_requests
+                    host["new_connections"] += pool.num_connections
+                    # The pool queue is pre-filled with None placeholders for unopened slots
+                    host["idle_connections"] += sum(1 for conn in list(pool.pool.queue) if conn is not None) \
+                        if pool.pool else 0
+        sync_requests = sum(h["requests"] for h in hosts.values())
+        sync_connections = sum(h["new_connections"] for h in hosts.values())
+        return {
+            **counters,
+            "connection_reuse_rate": round(1 - sync_connections / sync_requests, 3) if sync_requests else 0.0,
+            "async_connection_reuse_rate": round(
+                1 - counters["async_new_connections"] / counters["async_requests"], 3
+            ) if counters["async_requests"] else 0.0,
+            "hosts": hosts,
+        }
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, self.backoff_factor * (2 ** attempt))
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        if event_name == "connection.connect_tcp.complete":
+            self.count("async_new_connections")
+
+
+# Global client shared by the agent tools, mcp_tools and the API server
+http_client = PooledHTTPClient.from_env()